@@ -0,0 +1,310 @@
+"""Best moves and values for large batches of positions.
+
+``analyze_positions`` takes any iterable of boards (or ``(board, to_move)``
+pairs) and yields ``(position, best_move, value)`` for each one as its result
+becomes available.  It reads the input lazily and never holds more than
+``max_pending`` positions in memory, so it can take millions of positions
+from a generator such as ``positions_from_records``.
+
+Every position is reduced to a canonical form before it is searched: the
+stones are written from the side to move's point of view (as in tablebase.py)
+and the board is rotated or mirrored to whichever symmetry gives the smallest
+key.  Duplicates and symmetric images of a position are searched only once,
+and the move found is mapped back onto each board that asked for it.
+
+Searches run on a process pool in chunks of ``chunk_size`` positions.  Their
+results are stored in an SQLite file (``cache``, default DEFAULT_CACHE), so a
+later run over the same positions with the same search settings reads them
+back instead of searching again.
+
+``python analysis.py games.ttr`` analyses every position of a game record
+file (see gamelog.py) and prints a summary.
+"""
+
+import argparse
+import os
+import sqlite3
+import struct
+import time
+from concurrent.futures import FIRST_COMPLETED, Future, ProcessPoolExecutor, wait
+
+from bitboard import BitBoard
+from gamelog import read_games
+from search import AlphaBetaSearch, make_evaluator
+from transposition import board_symmetries
+
+DEFAULT_CACHE = os.environ.get('TICTAC_ANALYSIS_CACHE',
+                               os.path.join(os.path.dirname(os.path.abspath(__file__)), 'analysis.sqlite'))
+CHUNK_SIZE = 64  # Positions per pool task
+MAX_PENDING = 100000  # Positions read but not yet answered, duplicates included
+COMMIT_INTERVAL = 10000  # Cache rows written between commits
+KEY_HEADER = struct.Struct('<BBB')  # rows, cols, n_to_win; the two sides' stones follow
+
+_SYMMETRIES = {}  # (rows, cols) -> (cell permutations, their inverses)
+
+
+class AnalysisStats:
+    """Where the answers of one analyze_positions run came from."""
+
+    def __init__(self):
+        self.positions = 0  # Positions read from the input
+        self.finished = 0  # Games already over: answered without a search
+        self.cached = 0  # Answered from the cache file
+        self.duplicates = 0  # Answered by the search of an equal or symmetric position
+        self.searched = 0  # Positions searched
+        self.tasks = 0  # Chunks sent to the pool
+        self.elapsed = 0.0
+
+    def __str__(self):
+        rate = self.positions / self.elapsed if self.elapsed else 0.0
+        return (f"{self.positions} positions in {self.elapsed:.1f}s ({rate:.0f}/s): {self.searched} searched, "
+                f"{self.duplicates} duplicates, {self.cached} cached, {self.finished} finished games")
+
+
+class AnalysisCache:
+    """Search results on disk, keyed by the search settings and the canonical position."""
+
+    def __init__(self, path):
+        # An empty path gives SQLite's private temporary file, so even uncached runs keep results off the heap
+        self.db = sqlite3.connect(path or '')
+        self.db.execute("CREATE TABLE IF NOT EXISTS analysis (method TEXT, position BLOB, move INTEGER, value,"
+                        " PRIMARY KEY (method, position)) WITHOUT ROWID")
+        self.uncommitted = 0
+
+    def get(self, method, key):
+        """(best cell index, value) stored for a position, or None."""
+        row = self.db.execute("SELECT move, value FROM analysis WHERE method = ? AND position = ?",
+                              (method, key)).fetchone()
+        return None if row is None else (row[0], row[1])
+
+    def put(self, method, key, cell, value):
+        self.db.execute("INSERT OR REPLACE INTO analysis VALUES (?, ?, ?, ?)", (method, key, cell, value))
+        self.uncommitted += 1
+        if self.uncommitted >= COMMIT_INTERVAL:
+            self.commit()
+
+    def commit(self):
+        self.db.commit()
+        self.uncommitted = 0
+
+    def close(self):
+        self.commit()
+        self.db.close()
+
+
+def symmetries(rows, cols):
+    """The board's symmetries as cell permutations, and the inverse of each."""
+    entry = _SYMMETRIES.get((rows, cols))
+    if entry is None:
+        perms = board_symmetries(rows, cols)
+        inverses = []
+        for perm in perms:
+            inverse = [0] * len(perm)
+            for idx, image in enumerate(perm):
+                inverse[image] = idx
+            inverses.append(tuple(inverse))
+        entry = _SYMMETRIES[(rows, cols)] = (perms, inverses)
+    return entry
+
+
+def _cells(bits):
+    """Indices of the set bits."""
+    cells = []
+    while bits:
+        low = bits & -bits
+        cells.append(low.bit_length() - 1)
+        bits ^= low
+    return cells
+
+
+def canonical_position(rows, cols, mover, other):
+    """(mover, other, symmetry index) of the smallest image of a position under the board's symmetries."""
+    perms, _ = symmetries(rows, cols)
+    mover_cells = _cells(mover)
+    other_cells = _cells(other)
+    best = None
+    for t, perm in enumerate(perms):
+        image = (sum(1 << perm[idx] for idx in mover_cells), sum(1 << perm[idx] for idx in other_cells), t)
+        if best is None or image < best:
+            best = image
+    return best
+
+
+def position_key(rows, cols, n_to_win, mover, other):
+    """Cache key of a canonical position: its shape and both sides' stones."""
+    width = (rows * cols + 7) // 8
+    return KEY_HEADER.pack(rows, cols, n_to_win) + mover.to_bytes(width, 'little') + other.to_bytes(width, 'little')
+
+
+def side_to_move(board, to_move=None, symbols=('X', 'O')):
+    """(to_move, opponent) for a BitBoard; without ``to_move``, symbols[0] moves when both have as many stones.
+
+    Raises ValueError for stone counts no game could reach or a third symbol on the board.
+    """
+    present = [symbol for symbol, bits in board.bits.items() if bits]
+    if to_move is None:
+        first, second = symbols
+        lead = board.bits.get(first, 0).bit_count() - board.bits.get(second, 0).bit_count()
+        if lead not in (0, 1):
+            raise ValueError(f"{first} has {lead:+d} stones more than {second}; no game reaches that position")
+        to_move = first if lead == 0 else second
+    opponent = next((symbol for symbol in present if symbol != to_move),
+                    symbols[1] if to_move == symbols[0] else symbols[0])
+    if any(symbol not in (to_move, opponent) for symbol in present):
+        raise ValueError(f"More than two symbols on the board: {', '.join(present)}")
+    return to_move, opponent
+
+
+def _analyze_chunk(shape, positions, depth, evaluator, locality):
+    """Pool task: (best cell index, value) for the side to move in each (mover, other) position."""
+    rows, cols, n_to_win = shape
+    results = []
+    for mover, other in positions:
+        board = BitBoard(rows, cols, n_to_win)
+        board.bits = {'X': mover, 'O': other}
+        board.occupied = mover | other
+        search = AlphaBetaSearch(board, 'X', 'O', evaluator=evaluator, locality=locality)
+        move, value = search.search_root(depth)
+        results.append((move[0] * cols + move[1], value))
+    return results
+
+
+def analyze_positions(positions, depth=9, evaluator=None, workers=None, cache=DEFAULT_CACHE, symbols=('X', 'O'),
+                      locality=0, chunk_size=CHUNK_SIZE, max_pending=MAX_PENDING, stats=None):
+    """Yield (position, best_move, value) for each board in ``positions``, in the order the answers come in.
+
+    ``positions`` holds boards of any class with a ``grid``, or (board,
+    to_move) pairs; without to_move the side to move is found from the stone
+    counts (see side_to_move).  Each position is searched by alpha-beta to
+    ``depth`` with ``evaluator`` (as in search.alphabeta_move), and value is
+    that search's score for the side to move.  best_move is a (row, col) of
+    equal value to alphabeta_move's choice; it can be a mirror image of it when
+    the position is symmetric.  Finished games come back with best_move None and
+    the value of a win, a loss or 0.  Boards are yielded as given, never copied
+    or modified.
+
+    ``workers`` processes search (default: one per CPU; 1 searches in this
+    process).  ``cache`` is the SQLite file results are kept in between runs;
+    None keeps them in a temporary file for this run only.  An AnalysisStats
+    passed as stats counts where the answers came from.
+    """
+    evaluator = make_evaluator(evaluator)
+    method = f"alphabeta:{depth}:{evaluator.name}:{locality}"  # Results of other settings are not reused
+    workers = workers or os.cpu_count() or 1
+    stats = stats if stats is not None else AnalysisStats()
+    results = AnalysisCache(cache)
+    pool = ProcessPoolExecutor(max_workers=workers) if workers > 1 else None
+    pending = {}  # key -> [(position, symmetry index)] waiting for its search
+    waiting = 0  # Positions in pending, duplicates included
+    chunks = {}  # shape -> [(key, mover, other)] not yet sent to the pool
+    futures = {}  # Future -> (shape, keys)
+    start = time.perf_counter()
+
+    def submit(shape):
+        chunk = chunks.pop(shape)
+        jobs = [(mover, other) for _, mover, other in chunk]
+        if pool is None:
+            future = Future()
+            future.set_result(_analyze_chunk(shape, jobs, depth, evaluator, locality))
+        else:
+            future = pool.submit(_analyze_chunk, shape, jobs, depth, evaluator, locality)
+        futures[future] = (shape, [key for key, _, _ in chunk])
+        stats.tasks += 1
+
+    def collect(done):
+        """Store finished chunks and return the answers for every position waiting on them."""
+        nonlocal waiting
+        answers = []
+        for future in done:
+            (rows, cols, _), keys = futures.pop(future)
+            _, inverses = symmetries(rows, cols)
+            for key, (cell, value) in zip(keys, future.result()):
+                results.put(method, key, cell, value)
+                waiters = pending.pop(key)
+                waiting -= len(waiters)
+                for position, t in waiters:
+                    answers.append((position, divmod(inverses[t][cell], cols), value))
+        return answers
+
+    try:
+        for item in positions:
+            position, to_move = item if isinstance(item, tuple) else (item, None)
+            board = position if isinstance(position, BitBoard) else BitBoard.from_board(position)
+            stats.positions += 1
+            to_move, opponent = side_to_move(board, to_move, symbols)
+            if board.check_win(opponent) or board.check_win(to_move) or board.is_full():
+                stats.finished += 1
+                if board.check_win(opponent):
+                    yield position, None, -evaluator.win(0)
+                else:
+                    yield position, None, evaluator.win(0) if board.check_win(to_move) else 0
+                continue
+            rows, cols, n_to_win = shape = (board.rows, board.cols, board.n_to_win)
+            mover, other, t = canonical_position(rows, cols, board.bits.get(to_move, 0), board.bits.get(opponent, 0))
+            key = position_key(rows, cols, n_to_win, mover, other)
+            waiters = pending.get(key)
+            if waiters is not None:  # Already on its way: answered with the first copy
+                stats.duplicates += 1
+                waiters.append((position, t))
+                waiting += 1
+            else:
+                stored = results.get(method, key)
+                if stored is not None:
+                    stats.cached += 1
+                    cell, value = stored
+                    yield position, divmod(symmetries(rows, cols)[1][t][cell], cols), value
+                    continue
+                stats.searched += 1
+                pending[key] = [(position, t)]
+                waiting += 1
+                chunk = chunks.setdefault(shape, [])
+                chunk.append((key, mover, other))
+                if len(chunk) >= chunk_size:
+                    submit(shape)
+            # Bounded memory: stop reading while too many positions or chunks are in flight
+            while waiting >= max_pending or len(futures) >= 2 * workers:
+                if not futures:
+                    for shape in list(chunks):
+                        submit(shape)
+                done, _ = wait(futures, return_when=FIRST_COMPLETED)
+                yield from collect(done)
+        for shape in list(chunks):
+            submit(shape)
+        while futures:
+            done, _ = wait(futures, return_when=FIRST_COMPLETED)
+            yield from collect(done)
+    finally:
+        if pool is not None:
+            pool.shutdown(cancel_futures=True)
+        results.close()
+        stats.elapsed = time.perf_counter() - start
+
+
+def positions_from_records(path):
+    """Yield (BitBoard, to_move) for the position before every move of every game in a record file."""
+    for record in read_games(path):
+        board = BitBoard(record.rows, record.cols, record.n_to_win)
+        players = (record.first, record.second)
+        for i, idx in enumerate(record.moves):
+            yield board.copy(), players[i % 2]
+            board.make_move(idx // record.cols, idx % record.cols, players[i % 2])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Best move and value of every position in a game record file.")
+    parser.add_argument('path')
+    parser.add_argument('--depth', type=int, default=9)
+    parser.add_argument('--evaluator', default=None, help="'terminal' (default), 'heuristic' or 'learned'")
+    parser.add_argument('--workers', type=int, default=None, help="processes (default: one per CPU)")
+    parser.add_argument('--cache', default=DEFAULT_CACHE, help="SQLite file the results are kept in")
+    parser.add_argument('--no-cache', action='store_true', help="keep results for this run only")
+    args = parser.parse_args()
+    stats = AnalysisStats()
+    for _ in analyze_positions(positions_from_records(args.path), args.depth, args.evaluator, args.workers,
+                               None if args.no_cache else args.cache, stats=stats):
+        pass
+    print(stats)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,231 @@
+"""Speed benchmarks for the boards and searches, with a stored-baseline check.
+
+Measures, on fixed seeded positions and for every board implementation
+(the ``Board`` classes in tictac.py, milestone.py and ss.py, plus BitBoard):
+
+- ``check_win`` latency and ``get_empty_cells`` cost per call,
+- time-to-move of ``get_minimax_ai_move`` (plain minimax and alpha-beta) and
+  the minimax nodes searched per second,
+
+over board sizes from 3x3 to 15x15, several n_to_win values and search
+depths.  Results are written as JSON; comparing against a saved baseline
+fails (exit status 1) when any result got worse by more than the threshold::
+
+    python bench.py --quick --save-baseline bench_baseline.json
+    python bench.py --quick --baseline bench_baseline.json --threshold 0.25
+
+The committed bench_baseline.json is the reference for the quick sweep.
+Timings only compare on the same machine, so CI runners should save their
+own baseline from the main branch first and check changes against it.
+"""
+
+import argparse
+import importlib
+import json
+import platform
+import random
+import sys
+import time
+
+from bitboard import BitBoard
+from search import alphabeta_move, count_minimax_nodes
+
+# (rows, cols, n_to_win, search depths) covered by a full run
+SWEEP = [
+    (3, 3, 3, (3, 5, 7)),
+    (4, 4, 3, (2, 3, 4)),
+    (4, 4, 4, (2, 3, 4)),
+    (5, 5, 4, (2, 3)),
+    (7, 7, 4, (2,)),
+    (9, 9, 5, (2,)),
+    (15, 15, 5, (1, 2)),
+]
+QUICK_SWEEP = [(3, 3, 3, (3, 5)), (4, 4, 3, (2,)), (7, 7, 4, (1,)), (15, 15, 5, (1,))]
+MODULES = ('tictac', 'milestone', 'ss')  # Scripts with their own Board and minimax
+POSITIONS = 32  # Seeded positions per board shape for the per-call benchmarks
+SEARCH_STONES = 2  # Stones already on the board when a search benchmark starts
+MIN_SAMPLE_TIME = 0.05  # Seconds each timing sample should last
+MIN_BASELINE_REPEAT = 5  # Fewer samples are too noisy to call a regression
+
+
+def load_modules():
+    """Import the game scripts, skipping any whose dependencies (e.g. tkinter) are missing."""
+    modules = {}
+    for name in MODULES:
+        try:
+            modules[name] = importlib.import_module(name)
+        except ImportError as exc:
+            print(f"Skipping {name}: {exc}", file=sys.stderr)
+    return modules
+
+
+def board_factories(modules):
+    """name -> function(rows, cols, n_to_win) returning an empty board of that implementation."""
+    factories = {}
+    for name, module in modules.items():
+        def make(rows, cols, n_to_win, board_class=module.Board):
+            board = board_class(rows, cols)
+            board.n_to_win = n_to_win  # The scripts' boards derive it from the size; the sweep sets it
+            return board
+        factories[f"{name}.Board"] = make
+    factories['BitBoard'] = BitBoard
+    return factories
+
+
+def random_moves(rows, cols, n_to_win, stones, seed):
+    """Seeded list of (row, col, symbol) moves that leave a game nobody has won yet."""
+    rng = random.Random(f"{rows}x{cols}:{n_to_win}:{stones}:{seed}")
+    board = BitBoard(rows, cols, n_to_win)
+    moves = []
+    cells = board.get_empty_cells()
+    rng.shuffle(cells)
+    for row, col in cells:
+        if len(moves) == stones:
+            break
+        symbol = 'XO'[len(moves) % 2]
+        board.make_move(row, col, symbol)
+        if board.last_move_won():
+            board.undo_move()  # Keep positions open so searches have work to do
+            continue
+        moves.append((row, col, symbol))
+    return moves
+
+
+def build(factory, rows, cols, n_to_win, moves):
+    board = factory(rows, cols, n_to_win)
+    for row, col, symbol in moves:
+        board.place_move(row, col, symbol)
+    return board
+
+
+def time_per_call(func, repeat=5):
+    """Best seconds per call of ``func()`` over ``repeat`` samples of at least MIN_SAMPLE_TIME."""
+    number = 1
+    while True:  # Find a loop count long enough to time reliably
+        start = time.perf_counter()
+        for _ in range(number):
+            func()
+        elapsed = time.perf_counter() - start
+        if elapsed >= MIN_SAMPLE_TIME:
+            break
+        number *= 2 if elapsed else 10
+    best = elapsed / number
+    for _ in range(repeat - 1):
+        start = time.perf_counter()
+        for _ in range(number):
+            func()
+        best = min(best, (time.perf_counter() - start) / number)
+    return best
+
+
+def run(sweep=SWEEP, name_filter=None, repeat=5):
+    """Run every benchmark in ``sweep``; returns {name: {'value', 'unit', 'better'}}."""
+    modules = load_modules()
+    factories = board_factories(modules)
+    results = {}
+
+    def record(name, value, unit, better):
+        results[name] = {'value': value, 'unit': unit, 'better': better}
+        print(f"{name:<50} {value:14.3f} {unit}", file=sys.stderr)
+
+    def wanted(name):
+        return name_filter is None or name_filter in name
+
+    for rows, cols, n_to_win, depths in sweep:
+        shape = f"{rows}x{cols}n{n_to_win}"
+        positions = [random_moves(rows, cols, n_to_win, seed % (rows * cols // 2 + 1), seed)
+                     for seed in range(POSITIONS)]
+        for impl, factory in factories.items():
+            boards = [build(factory, rows, cols, n_to_win, moves) for moves in positions]
+            name = f"check_win/{impl}/{shape}"
+            if wanted(name):
+                seconds = time_per_call(lambda: [board.check_win('X') for board in boards], repeat)
+                record(name, seconds / len(boards) * 1e9, 'ns/call', 'lower')
+            name = f"get_empty_cells/{impl}/{shape}"
+            if wanted(name):
+                seconds = time_per_call(lambda: [board.get_empty_cells() for board in boards], repeat)
+                record(name, seconds / len(boards) * 1e9, 'ns/call', 'lower')
+
+        moves = random_moves(rows, cols, n_to_win, SEARCH_STONES, 0)
+        for depth in depths:
+            nodes = count_minimax_nodes(build(BitBoard, rows, cols, n_to_win, moves), depth, 'O', 'X')
+            for module_name, module in modules.items():
+                board = build(factories[f"{module_name}.Board"], rows, cols, n_to_win, moves)
+                for algorithm in ('minimax', 'alphabeta'):
+                    name = f"time_to_move/{module_name}.{algorithm}/{shape}/d{depth}"
+                    if not wanted(name):
+                        continue
+                    seconds = time_per_call(lambda: module.get_minimax_ai_move(
+                        board, 'O', 'X', depth, algorithm, use_tablebase=False), repeat)
+                    record(name, seconds * 1e3, 'ms', 'lower')
+                    if algorithm == 'minimax':
+                        record(f"minimax_nodes_per_s/{module_name}/{shape}/d{depth}", nodes / seconds, 'nodes/s',
+                               'higher')
+            name = f"time_to_move/BitBoard.alphabeta/{shape}/d{depth}"
+            if wanted(name):
+                board = build(BitBoard, rows, cols, n_to_win, moves)
+                seconds = time_per_call(lambda: alphabeta_move(board, 'O', 'X', depth), repeat)
+                record(name, seconds * 1e3, 'ms', 'lower')
+    return results
+
+
+def compare(results, baseline, threshold=0.25):
+    """Return (name, baseline value, new value, relative change) for results worse than ``threshold``."""
+    regressions = []
+    for name, result in sorted(results.items()):
+        old = baseline.get(name)
+        if old is None or not old['value'] or not result['value']:
+            continue
+        if result['better'] == 'lower':
+            change = result['value'] / old['value'] - 1  # Positive = slower
+        else:
+            change = old['value'] / result['value'] - 1  # Positive = fewer nodes per second
+        if change > threshold:
+            regressions.append((name, old['value'], result['value'], change))
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the boards and searches.")
+    parser.add_argument('--quick', action='store_true', help="small sweep for a fast check")
+    parser.add_argument('--filter', help="only run benchmarks whose name contains this text")
+    parser.add_argument('--repeat', type=int, default=5, help="timing samples per benchmark (best is kept)")
+    parser.add_argument('--output', help="write the JSON results to this file")
+    parser.add_argument('--save-baseline', metavar='FILE', help="write the results as the new baseline")
+    parser.add_argument('--baseline', metavar='FILE', help="compare against this baseline")
+    parser.add_argument('--threshold', type=float, default=0.25,
+                        help="allowed slowdown before a result counts as a regression (default: %(default)s)")
+    args = parser.parse_args()
+    if (args.baseline or args.save_baseline) and args.repeat < MIN_BASELINE_REPEAT:
+        print(f"Using --repeat {MIN_BASELINE_REPEAT}: fewer samples are too noisy for a baseline", file=sys.stderr)
+        args.repeat = MIN_BASELINE_REPEAT
+
+    results = run(QUICK_SWEEP if args.quick else SWEEP, args.filter, args.repeat)
+    report = {
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'time': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'quick': args.quick,
+        'results': results,
+    }
+    for path in (args.output, args.save_baseline):
+        if path:
+            with open(path, 'w') as f:
+                json.dump(report, f, indent=2, sort_keys=True)
+    if not args.output and not args.save_baseline:
+        print(json.dumps(report, indent=2, sort_keys=True))
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)['results']
+        regressions = compare(results, baseline, args.threshold)
+        for name, old, new, change in regressions:
+            print(f"REGRESSION {name}: {old:.3f} -> {new:.3f} {results[name]['unit']} ({change:+.0%})",
+                  file=sys.stderr)
+        if regressions:
+            sys.exit(1)
+        print(f"No regressions beyond {args.threshold:.0%} against {args.baseline}", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,414 @@
+"""Bitboard-backed Tic-Tac-Toe board.
+
+Each player's stones are kept in one integer bitmask (bit ``row * cols + col``),
+so a win check is a few shifts and ANDs instead of rebuilding rows, columns and
+diagonals out of strings.  ``enable_hashing`` adds incrementally updated
+Zobrist hashes for the transposition table in transposition.py, and
+``enable_line_counts`` keeps open-line counts for the heuristic evaluator.
+``enable_locality`` keeps the empty cells near existing stones as a mask, so
+searches on big sparse boards only consider moves where the play is.
+The public API matches ``Board`` in tictac.py, milestone.py and ss.py, so it
+can be passed straight to ``minimax`` and ``get_minimax_ai_move``.
+"""
+
+import sys
+
+from render import board_frame
+from transposition import zobrist_keys
+
+_GEOMETRY_CACHE = {}  # (rows, cols, n_to_win) -> LineGeometry
+
+
+class LineGeometry:
+    """Winning-line masks for one (rows, cols, n_to_win), computed once and shared."""
+
+    def __init__(self, rows, cols, n_to_win):
+        self.rows = rows
+        self.cols = cols
+        self.n_to_win = n_to_win
+        self.size = rows * cols
+        self.full = (1 << self.size) - 1  # Every cell on the board
+        self.masks = []  # One mask per winning window
+        self.cell_masks = [[] for _ in range(self.size)]  # Windows through each cell
+        self.cell_windows = [[] for _ in range(self.size)]  # Indices into masks of those windows
+        # (shift, start_mask) per direction: a window starting at cell p covers p, p+shift, ...
+        self.directions = []
+        for dr, dc in ((0, 1), (1, 0), (1, 1), (1, -1)):
+            start_mask = 0
+            for r in range(rows):
+                for c in range(cols):
+                    end_r = r + dr * (n_to_win - 1)
+                    end_c = c + dc * (n_to_win - 1)
+                    if 0 <= end_r < rows and 0 <= end_c < cols:
+                        start_mask |= 1 << (r * cols + c)
+                        mask = 0
+                        for i in range(n_to_win):
+                            mask |= 1 << ((r + dr * i) * cols + c + dc * i)
+                        self.masks.append(mask)
+                        for i in range(n_to_win):
+                            self.cell_masks[(r + dr * i) * cols + c + dc * i].append(mask)
+                            self.cell_windows[(r + dr * i) * cols + c + dc * i].append(len(self.masks) - 1)
+            if start_mask:
+                self.directions.append((dr * cols + dc, start_mask))
+        self.cell_masks = [tuple(masks) for masks in self.cell_masks]
+        self.cell_windows = [tuple(windows) for windows in self.cell_windows]
+        self.coords = tuple((idx // cols, idx % cols) for idx in range(self.size))  # (row, col) per cell index
+        self._neighbourhoods = {}  # radius -> per-cell mask of the cells within that distance
+
+    def neighbourhood(self, radius):
+        """Per-cell masks of the cells at most ``radius`` rows and columns away (the cell included)."""
+        masks = self._neighbourhoods.get(radius)
+        if masks is None:
+            masks = []
+            for r, c in self.coords:
+                mask = 0
+                for nr in range(max(0, r - radius), min(self.rows, r + radius + 1)):
+                    for nc in range(max(0, c - radius), min(self.cols, c + radius + 1)):
+                        mask |= 1 << (nr * self.cols + nc)
+                masks.append(mask)
+            self._neighbourhoods[radius] = masks
+        return masks
+
+
+def geometry(rows, cols, n_to_win):
+    """Return the cached LineGeometry for a board shape."""
+    key = (rows, cols, n_to_win)
+    geo = _GEOMETRY_CACHE.get(key)
+    if geo is None:
+        geo = LineGeometry(rows, cols, n_to_win)
+        _GEOMETRY_CACHE[key] = geo
+    return geo
+
+
+class _GridRow:
+    """One row of ``BitBoard.grid``; reads and writes go straight to the bitmasks."""
+
+    def __init__(self, board, row):
+        self.board = board
+        self.row = row
+
+    def __len__(self):
+        return self.board.cols
+
+    def __getitem__(self, col):
+        if not 0 <= col < self.board.cols:
+            raise IndexError(col)
+        return self.board.symbol_at(self.row, col)
+
+    def __setitem__(self, col, symbol):
+        if not 0 <= col < self.board.cols:
+            raise IndexError(col)
+        self.board.set_cell(self.row, col, symbol)
+
+    def __iter__(self):
+        return (self.board.symbol_at(self.row, c) for c in range(self.board.cols))
+
+
+class BitBoard:
+    def __init__(self, rows=3, cols=3, n_to_win=None):
+        """Represents a Tic-Tac-Toe board as one bitmask per player."""
+        self.rows = rows  # Number of rows in the board
+        self.cols = cols  # Number of columns in the board
+        self.n_to_win = min(3, rows, cols) if n_to_win is None else n_to_win  # Number of consecutive symbols needed to win
+        self.lines = geometry(rows, cols, self.n_to_win)  # Shared precomputed line masks
+        self.bits = {}  # symbol -> bitmask of that player's stones
+        self.occupied = 0  # Bitmask of every filled cell
+        self.move_history = []  # (cell index, symbol) for every move, newest last
+        self.zobrist = None  # ZobristKeys once enable_hashing() is called
+        self.hashes = None  # One Zobrist hash per board symmetry
+        self.window_stones = None  # Stones per winning window, once enable_line_counts() is called
+        self.window_counts = None  # symbol -> that symbol's stones per winning window
+        self.open_lines = None  # symbol -> [lines holding k of its stones and no others, for k = 0..n_to_win]
+        self.near = None  # Cells within locality_radius of a stone, once enable_locality() is called
+        self.near_stack = []  # (cell index, near before that stone) per stone placed, newest last
+        self.locality_radius = None
+        self.grid = [_GridRow(self, r) for r in range(rows)]  # List-of-lists view for older callers
+
+    @classmethod
+    def from_board(cls, board):
+        """Build a BitBoard holding the same position as any board with a ``grid``."""
+        bitboard = cls(board.rows, board.cols, board.n_to_win)
+        for r in range(board.rows):
+            for c in range(board.cols):
+                symbol = board.grid[r][c]
+                if symbol != ' ':
+                    bitboard.set_cell(r, c, symbol)
+        return bitboard
+
+    def copy(self):
+        """Return an independent copy of this board."""
+        clone = BitBoard(self.rows, self.cols, self.n_to_win)
+        clone.bits = dict(self.bits)
+        clone.occupied = self.occupied
+        clone.move_history = list(self.move_history)
+        if self.hashes is not None:
+            clone.zobrist = self.zobrist
+            clone.hashes = list(self.hashes)
+        if self.open_lines is not None:
+            clone.window_stones = list(self.window_stones)
+            clone.window_counts = {symbol: list(counts) for symbol, counts in self.window_counts.items()}
+            clone.open_lines = {symbol: list(hist) for symbol, hist in self.open_lines.items()}
+        if self.near is not None:
+            clone.near = self.near
+            clone.near_stack = list(self.near_stack)
+            clone.locality_radius = self.locality_radius
+        return clone
+
+    def _stones(self):
+        """Yield (cell index, symbol) for every stone on the board."""
+        for symbol, bits in self.bits.items():
+            while bits:
+                low = bits & -bits
+                yield low.bit_length() - 1, symbol
+                bits ^= low
+
+    def enable_hashing(self):
+        """Start keeping Zobrist hashes of the position under every board symmetry."""
+        if self.hashes is not None:
+            return
+        self.zobrist = zobrist_keys(self.rows, self.cols, self.n_to_win)
+        self.hashes = [0] * len(self.zobrist.transforms)
+        for idx, symbol in self._stones():
+            self._toggle_hash(idx, symbol)
+
+    def _toggle_hash(self, idx, symbol):
+        """XOR a stone in or out of every symmetry's hash."""
+        keys = self.zobrist.cell_keys(symbol)[idx]
+        self.hashes = [h ^ k for h, k in zip(self.hashes, keys)]
+
+    def canonical_hash(self):
+        """Hash shared by this position and all its rotations and mirror images."""
+        return min(self.hashes)
+
+    def enable_line_counts(self):
+        """Start counting, per symbol, the winning windows that hold k of its stones and nothing else."""
+        if self.open_lines is not None:
+            return
+        self.window_stones = [0] * len(self.lines.masks)
+        self.window_counts = {}
+        self.open_lines = {}
+        for idx, symbol in self._stones():
+            self._count_stone(idx, symbol)
+
+    def open_line_counts(self, symbol):
+        """Histogram of ``symbol``'s open lines: entry k counts windows with k of its stones and no others."""
+        hist = self.open_lines.get(symbol)
+        if hist is None:
+            return [len(self.lines.masks) - sum(1 for stones in self.window_stones if stones)] + [0] * self.n_to_win
+        return hist
+
+    def _line_symbol(self, symbol):
+        """Per-window counts and histogram for ``symbol``, created on its first stone."""
+        counts = self.window_counts.get(symbol)
+        if counts is None:
+            counts = self.window_counts[symbol] = [0] * len(self.window_stones)
+            empty = sum(1 for stones in self.window_stones if not stones)
+            self.open_lines[symbol] = [empty] + [0] * self.n_to_win
+        return counts, self.open_lines[symbol]
+
+    def _count_stone(self, idx, symbol):
+        """Update the line counts for a stone placed on ``idx``."""
+        counts, hist = self._line_symbol(symbol)
+        stones = self.window_stones
+        for w in self.lines.cell_windows[idx]:
+            total = stones[w]
+            mine = counts[w]
+            if mine == total:  # Still only our stones (or empty): the line grows
+                hist[mine] -= 1
+                hist[mine + 1] += 1
+                if total == 0:  # An empty window was open for everyone else too
+                    for other, other_hist in self.open_lines.items():
+                        if other != symbol:
+                            other_hist[0] -= 1
+            elif mine == 0:  # We block a line that belonged to one other symbol
+                for other, other_counts in self.window_counts.items():
+                    if other != symbol and other_counts[w] == total:
+                        self.open_lines[other][total] -= 1
+                        break
+            counts[w] = mine + 1
+            stones[w] = total + 1
+
+    def _uncount_stone(self, idx, symbol):
+        """Update the line counts for a stone removed from ``idx``."""
+        counts, hist = self._line_symbol(symbol)
+        stones = self.window_stones
+        for w in self.lines.cell_windows[idx]:
+            total = stones[w] - 1
+            mine = counts[w] - 1
+            counts[w] = mine
+            stones[w] = total
+            if mine == total:
+                hist[mine + 1] -= 1
+                hist[mine] += 1
+                if total == 0:
+                    for other, other_hist in self.open_lines.items():
+                        if other != symbol:
+                            other_hist[0] += 1
+            elif mine == 0:
+                for other, other_counts in self.window_counts.items():
+                    if other != symbol and other_counts[w] == total:
+                        self.open_lines[other][total] += 1
+                        break
+
+    def enable_locality(self, radius=2):
+        """Start tracking the empty cells within ``radius`` of a stone; see ``move_mask``."""
+        if self.near is not None and self.locality_radius == radius:
+            return
+        self.locality_radius = radius
+        self._rebuild_near()
+
+    def _rebuild_near(self):
+        neighbourhood = self.lines.neighbourhood(self.locality_radius)
+        near = 0
+        for idx, _ in self._stones():
+            near |= neighbourhood[idx]
+        self.near = near
+        self.near_stack = []
+
+    def move_mask(self):
+        """Mask of the moves worth searching: empty cells near a stone with locality on, else every empty cell.
+
+        The whole board is returned for the opening, or when every nearby cell is taken.
+        """
+        empty = self.lines.full & ~self.occupied
+        if self.near is not None:
+            candidates = self.near & empty
+            if candidates:
+                return candidates
+        return empty
+
+    def _add_stone(self, idx, symbol):
+        """Put a stone on an empty cell and update every enabled tracker."""
+        bit = 1 << idx
+        self.bits[symbol] = self.bits.get(symbol, 0) | bit
+        self.occupied |= bit
+        if self.hashes is not None:
+            self._toggle_hash(idx, symbol)
+        if self.open_lines is not None:
+            self._count_stone(idx, symbol)
+        if self.near is not None:
+            self.near_stack.append((idx, self.near))
+            self.near |= self.lines.neighbourhood(self.locality_radius)[idx]
+
+    def _remove_stone(self, idx, symbol):
+        """Take ``symbol``'s stone off a cell and update every enabled tracker."""
+        bit = 1 << idx
+        self.bits[symbol] &= ~bit
+        self.occupied &= ~bit
+        if self.hashes is not None:
+            self._toggle_hash(idx, symbol)
+        if self.open_lines is not None:
+            self._uncount_stone(idx, symbol)
+        if self.near is not None:
+            if self.near_stack and self.near_stack[-1][0] == idx:
+                self.near = self.near_stack.pop()[1]  # The newest stone: restore the mask from before it
+            else:
+                self._rebuild_near()
+
+    def symbol_at(self, row, col):
+        """Return the symbol in a cell, or ' ' if it is empty."""
+        bit = 1 << (row * self.cols + col)
+        if self.occupied & bit:
+            for symbol, bits in self.bits.items():
+                if bits & bit:
+                    return symbol
+        return ' '
+
+    def set_cell(self, row, col, symbol):
+        """Overwrite a cell with ``symbol`` (or clear it with ' ') without validation.
+
+        The move history follows the write: the cell's old stone leaves it and a new
+        stone becomes the latest move, so undo_move and last_move_won stay in step.
+        """
+        idx = row * self.cols + col
+        if self.occupied >> idx & 1:
+            self._remove_stone(idx, self.symbol_at(row, col))
+            self.move_history = [move for move in self.move_history if move[0] != idx]
+        if symbol != ' ':
+            self._add_stone(idx, symbol)
+            self.move_history.append((idx, symbol))
+
+    def display(self):
+        """Displays the board with column numbers and row labels."""
+        sys.stdout.write(board_frame(self))  # The whole board in one write instead of a print per line
+
+    def place_move(self, row, col, symbol):
+        """Place a move if the cell is valid and empty."""
+        if self.is_valid_move(row, col):
+            self.make_move(row, col, symbol)
+            return True
+        return False
+
+    def make_move(self, row, col, symbol):
+        """Place a move during search without validation; undo it with undo_move."""
+        idx = row * self.cols + col
+        self._add_stone(idx, symbol)
+        self.move_history.append((idx, symbol))
+
+    def undo_move(self):
+        """Take back the most recent move."""
+        idx, symbol = self.move_history.pop()
+        self._remove_stone(idx, symbol)
+
+    def last_move(self):
+        """Return the most recent move as (row, col, symbol), or None."""
+        if not self.move_history:
+            return None
+        idx, symbol = self.move_history[-1]
+        return idx // self.cols, idx % self.cols, symbol
+
+    def last_move_won(self):
+        """Check only the winning windows through the last move's cell."""
+        if not self.move_history:
+            return False
+        idx, symbol = self.move_history[-1]
+        bits = self.bits[symbol]
+        for mask in self.lines.cell_masks[idx]:
+            if bits & mask == mask:
+                return True
+        return False
+
+    def is_valid_move(self, row, col):
+        """Check if the given move is within bounds and on an empty cell."""
+        return 0 <= row < self.rows and 0 <= col < self.cols and not self.occupied >> (row * self.cols + col) & 1
+
+    def get_empty_cells(self):
+        """Return all empty cells as (row, col) tuples, in row-major order."""
+        cells = list(self.lines.coords)
+        taken = self.occupied
+        while taken:  # Delete occupied cells from the highest index down so earlier indices stay valid
+            idx = taken.bit_length() - 1
+            del cells[idx]
+            taken ^= 1 << idx
+        return cells
+
+    def get_candidate_cells(self):
+        """Like get_empty_cells, but only the cells in ``move_mask`` (near the stones with locality on)."""
+        coords = self.lines.coords
+        free = self.move_mask()
+        cells = []
+        while free:
+            low = free & -free
+            cells.append(coords[low.bit_length() - 1])
+            free ^= low
+        return cells
+
+    def is_full(self):
+        """Return True when no empty cells are left."""
+        return self.occupied == self.lines.full
+
+    def check_win(self, symbol):
+        """Check if the given symbol has n_to_win in a row anywhere on the board."""
+        bits = self.bits.get(symbol, 0)
+        if not bits:
+            return False
+        n_to_win = self.n_to_win
+        for shift, start_mask in self.lines.directions:
+            run = bits & start_mask  # Cells that could start a winning window
+            for i in range(1, n_to_win):
+                run &= bits >> (shift * i)  # Keep starts whose i-th cell is also ours
+                if not run:
+                    break
+            if run:
+                return True
+        return False
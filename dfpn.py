@@ -0,0 +1,400 @@
+"""Depth-first proof-number search (df-pn): exact game values for boards too big for a tablebase.
+
+A proof-number search answers one yes/no question, "can the attacker force a
+win?", and always works on the position that is cheapest to settle next: a
+node's proof number counts the positions still to be won to prove it, its
+disproof number those still to be refuted.  ``ProofSolver.solve_position``
+asks the question once per side to tell wins, draws and losses apart, and
+``ProofSolver.solve`` does it for the empty board of a configuration.
+
+Positions are kept in one table keyed by their canonical Zobrist hash, so
+rotations and mirror images are solved once; the attacker's stones are always
+relabelled 'X', so an entry serves either symbol and either question.  The
+table holds at most max_entries positions: when it fills, the entries that
+took the least work to settle are dropped, unsolved ones first.  It is saved
+to a checkpoint file every checkpoint_seconds and whenever a solve stops, and
+a solver given the same file resumes where the last one stopped.
+
+The file also holds every proved position with its best move, so
+``proof_move`` (run by ``search.choose_move`` next to the tablebase) plays
+solved positions without searching.
+
+Solve a configuration with e.g. ``python dfpn.py 4 4 3``.
+"""
+
+import argparse
+import os
+import struct
+import time
+
+from bitboard import BitBoard, geometry
+from tablebase import DEFAULT_DIR
+from transposition import zobrist_keys
+
+MAGIC = b'TTPN'
+VERSION = 1
+HEADER = struct.Struct('<4sBBBB8x')  # magic, version, rows, cols, n_to_win
+ENTRY = struct.Struct('<QIIIH')  # key, proof number, disproof number, work, best move (cell in the canonical frame)
+INF = 0xFFFFFFFF  # A proof or disproof number this large means the other one is settled
+NO_MOVE = 0xFFFF  # Move field of entries without a best move
+ATTACKER, DEFENDER = 'X', 'O'  # Symbols the table is kept in, whoever plays them
+DEFAULT_MAX_ENTRIES = 2000000  # About 300 MB of table
+GC_KEEP = 0.75  # A full table is cut to this share of max_entries
+CHECKPOINT_SECONDS = 60  # Time between checkpoints in a long solve
+CHECK_INTERVAL = 1024  # Nodes between clock checks
+
+_OPEN_PROOFS = {}  # (directory, rows, cols, n_to_win) -> ProofSolver or None
+
+
+class ProofTimeout(Exception):
+    """Raised inside the search when the time or node budget runs out."""
+
+
+def proof_path(rows, cols, n_to_win, directory=DEFAULT_DIR):
+    """File name of the proof table for a board configuration."""
+    return os.path.join(directory, f"{rows}x{cols}_{n_to_win}.pns")
+
+
+def _add(a, b):
+    """Sum of two proof numbers; INF stays INF and finite sums stay below it."""
+    if a == INF or b == INF:
+        return INF
+    return min(a + b, INF - 1)
+
+
+def _relabelled(board, attacker, defender):
+    """BitBoard with the attacker's stones as ATTACKER and the defender's as DEFENDER, hashed; None if a third symbol is on the board."""
+    source = board if isinstance(board, BitBoard) else BitBoard.from_board(board)
+    work = BitBoard(source.rows, source.cols, source.n_to_win)
+    for symbol, label in ((attacker, ATTACKER), (defender, DEFENDER)):
+        bits = source.bits.get(symbol, 0)
+        while bits:
+            low = bits & -bits
+            bits ^= low
+            work.make_move(*divmod(low.bit_length() - 1, source.cols), label)
+    if work.occupied != source.occupied:
+        return None
+    work.enable_hashing()
+    return work
+
+
+class ProofSolver:
+    """df-pn search over one board configuration with a bounded, checkpointed table."""
+
+    def __init__(self, rows, cols, n_to_win, max_entries=DEFAULT_MAX_ENTRIES, checkpoint_path=None,
+                 checkpoint_seconds=CHECKPOINT_SECONDS):
+        self.rows = rows
+        self.cols = cols
+        self.n_to_win = n_to_win
+        geo = geometry(rows, cols, n_to_win)
+        self.masks = geo.masks
+        self.full = geo.full
+        keys = zobrist_keys(rows, cols, n_to_win)
+        self.side_keys = {ATTACKER: keys.side_key(ATTACKER), DEFENDER: keys.side_key(DEFENDER)}
+        self.transforms = keys.transforms  # Cell in the position -> cell in the canonical frame, per symmetry
+        self.inverses = []  # ...and back
+        for perm in self.transforms:
+            inverse = [0] * len(perm)
+            for idx, image in enumerate(perm):
+                inverse[image] = idx
+            self.inverses.append(inverse)
+        self.max_entries = max_entries
+        self.table = {}  # key -> (proof number, disproof number, work, best move)
+        self.nodes = 0  # Positions expanded, over every solve
+        self.collections = 0  # Times the table was cut back
+        self.checkpoint_path = checkpoint_path
+        self.checkpoint_seconds = checkpoint_seconds
+        self.last_checkpoint = time.perf_counter()
+        self.deadline = None  # perf_counter() time at which the current solve gives up
+        self.node_limit = None  # ...or the node count
+        if checkpoint_path is not None and os.path.exists(checkpoint_path):
+            self.load(checkpoint_path)
+
+    def _key(self, board, to_move):
+        """(table key, symmetry that maps the position onto its canonical frame)."""
+        hashes = board.hashes
+        low = min(hashes)
+        return low ^ self.side_keys[to_move], hashes.index(low)
+
+    def _completions(self, own, other):
+        """Cells that complete a line for ``own`` (as a mask)."""
+        needed = self.n_to_win - 1
+        cells = 0
+        for mask in self.masks:
+            if not other & mask and (own & mask).bit_count() == needed:
+                cells |= mask & ~own
+        return cells
+
+    def _attacker_can_win(self, defender):
+        """True while some line holds no defender stone."""
+        for mask in self.masks:
+            if not defender & mask:
+                return True
+        return False
+
+    def _store(self, key, frame, phi, delta, attacking, idx, work):
+        """Save a node given from the side to move's point of view; returns (phi, delta)."""
+        pn, dn = (phi, delta) if attacking else (delta, phi)
+        move = NO_MOVE if idx is None else self.transforms[frame][idx]
+        self.table[key] = (pn, dn, min(work, INF), move)
+        if len(self.table) > self.max_entries:
+            self._collect()
+        return phi, delta
+
+    def _collect(self):
+        """Cut the table back to GC_KEEP of max_entries, dropping the cheapest entries (unsolved first)."""
+        drop = len(self.table) - int(self.max_entries * GC_KEEP)
+        ranked = sorted(self.table.items(), key=lambda item: (item[1][0] == 0 or item[1][1] == 0, item[1][2]))
+        for key, _ in ranked[:drop]:
+            del self.table[key]
+        self.collections += 1
+
+    def _tick(self):
+        """Periodic work: enforce the budgets and write checkpoints."""
+        now = time.perf_counter()
+        if self.deadline is not None and now > self.deadline:
+            raise ProofTimeout
+        if self.node_limit is not None and self.nodes >= self.node_limit:
+            raise ProofTimeout
+        if self.checkpoint_path is not None and now - self.last_checkpoint > self.checkpoint_seconds:
+            self.save()
+
+    def _mid(self, board, to_move, phi_limit, delta_limit):
+        """Search until the node's (phi, delta) reaches a limit; returns (phi, delta).
+
+        phi and delta are the proof and disproof numbers seen from the side to
+        move: phi is 0 when that side gets its way (the attacker wins, or the
+        defender stops it), delta is 0 when it does not.
+        """
+        self.nodes += 1
+        if self.nodes % CHECK_INTERVAL == 0:
+            self._tick()
+        start = self.nodes
+        key, frame = self._key(board, to_move)
+        attacking = to_move == ATTACKER
+        opponent = DEFENDER if attacking else ATTACKER
+        mover = board.bits.get(to_move, 0)
+        other = board.bits.get(opponent, 0)
+        wins = self._completions(mover, other)
+        if wins:  # Winning on the spot settles the question either way
+            return self._store(key, frame, 0, INF, attacking, (wins & -wins).bit_length() - 1, 1)
+        free = self.full & ~board.occupied
+        if not self._attacker_can_win(board.bits.get(DEFENDER, 0)):
+            # Every line is blocked (a full board included): at best a draw for the attacker
+            if attacking:
+                return self._store(key, frame, INF, 0, True, None, 1)
+            return self._store(key, frame, 0, INF, False, (free & -free).bit_length() - 1, 1)
+        threats = self._completions(other, mover)
+        if threats & (threats - 1):  # Two lines to block: the opponent wins next move
+            return self._store(key, frame, INF, 0, attacking, None, 1)
+        if threats:  # Only the block is worth searching
+            free = threats
+        children = []
+        while free:
+            low = free & -free
+            free ^= low
+            idx = low.bit_length() - 1
+            board.make_move(idx // self.cols, idx % self.cols, to_move)
+            children.append((idx, self._key(board, opponent)[0]))
+            board.undo_move()
+        old = self.table.get(key)
+        work = old[2] if old is not None else 0
+        table = self.table
+        while True:
+            # phi is the smallest child delta, delta the sum of the child phis
+            phi, delta = INF, 0
+            best = None
+            second = INF
+            for idx, child in children:
+                entry = table.get(child)
+                if entry is None:
+                    child_phi = child_delta = 1
+                elif attacking:  # The child has the defender to move
+                    child_phi, child_delta = entry[1], entry[0]
+                else:
+                    child_phi, child_delta = entry[0], entry[1]
+                delta = _add(delta, child_phi)
+                if child_delta < phi:
+                    second = phi
+                    phi = child_delta
+                    best = (idx, child_phi)
+                elif child_delta < second:
+                    second = child_delta
+            if phi >= phi_limit or delta >= delta_limit:
+                break
+            idx, child_phi = best
+            child_phi_limit = INF if delta_limit == INF else delta_limit - delta + child_phi
+            child_delta_limit = phi_limit if second == INF else min(phi_limit, second + 1)
+            board.make_move(idx // self.cols, idx % self.cols, to_move)
+            self._mid(board, opponent, child_phi_limit, child_delta_limit)
+            board.undo_move()
+        return self._store(key, frame, phi, delta, attacking, best[0] if phi == 0 else None,
+                           work + self.nodes - start + 1)
+
+    def _prove(self, board, attacker, defender, to_move):
+        """True if ``attacker`` forces a win from the position with ``to_move`` to move."""
+        work = _relabelled(board, attacker, defender)
+        if work is None:
+            raise ValueError("the board holds symbols other than the two players'")
+        label = ATTACKER if to_move == attacker else DEFENDER
+        phi, delta = self._mid(work, label, INF, INF)
+        return (phi if label == ATTACKER else delta) == 0
+
+    def solve_position(self, board, to_move, opponent, time_budget_ms=None, node_budget=None):
+        """Game value for ``to_move`` (1 win, 0 draw, -1 loss), or None if a budget ran out first.
+
+        The table, and the checkpoint file if one is set, keep what was learned either way.
+        """
+        self.deadline = None if time_budget_ms is None else time.perf_counter() + time_budget_ms / 1000.0
+        self.node_limit = None if node_budget is None else self.nodes + node_budget
+        try:
+            if self._prove(board, to_move, opponent, to_move):
+                return 1
+            if self._prove(board, opponent, to_move, to_move):
+                return -1
+            return 0
+        except ProofTimeout:
+            return None
+        finally:
+            if self.checkpoint_path is not None:
+                self.save()
+
+    def solve(self, time_budget_ms=None, node_budget=None):
+        """Value of the configuration for the first player on the empty board (see solve_position)."""
+        return self.solve_position(BitBoard(self.rows, self.cols, self.n_to_win), 'X', 'O', time_budget_ms,
+                                   node_budget)
+
+    def _lookup(self, board, attacker, defender, to_move):
+        """(proof number, disproof number, best move as (row, col) or None) for a position, or None."""
+        work = _relabelled(board, attacker, defender)
+        if work is None:
+            return None
+        key, frame = self._key(work, ATTACKER if to_move == attacker else DEFENDER)
+        entry = self.table.get(key)
+        if entry is None:
+            return None
+        pn, dn, _, move = entry
+        if move == NO_MOVE:
+            return pn, dn, None
+        return pn, dn, divmod(self.inverses[frame][move], self.cols)
+
+    def probe(self, board, to_move, opponent):
+        """(value, (row, col)) for ``to_move`` if the table has settled the position, else None.
+
+        value is 1 for a forced win, 0 for a draw and -1 for a loss; the move
+        keeps that value (it is None for a loss, where every move loses).
+        """
+        win = self._lookup(board, to_move, opponent, to_move)
+        if win is not None and win[0] == 0:
+            return 1, win[2]
+        loss = self._lookup(board, opponent, to_move, to_move)
+        if loss is None:
+            return None
+        if loss[0] == 0:
+            return -1, None
+        if loss[1] == 0 and win is not None and win[1] == 0 and loss[2] is not None:
+            return 0, loss[2]  # Neither side can force a win; this move keeps it that way
+        return None
+
+    def safe_move(self, board, to_move, opponent):
+        """A move proved not to lose for ``to_move``, or None; it may pass up a win nobody has proved."""
+        loss = self._lookup(board, opponent, to_move, to_move)
+        if loss is not None and loss[1] == 0:
+            return loss[2]
+        return None
+
+    def save(self, path=None):
+        """Write the table to ``path`` (by default the checkpoint file)."""
+        path = path or self.checkpoint_path
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        tmp_path = path + '.tmp'
+        with open(tmp_path, 'wb') as f:
+            f.write(HEADER.pack(MAGIC, VERSION, self.rows, self.cols, self.n_to_win))
+            f.write(b''.join(ENTRY.pack(key, *entry) for key, entry in self.table.items()))
+        os.replace(tmp_path, path)  # A crash mid-write leaves the previous checkpoint intact
+        self.last_checkpoint = time.perf_counter()
+
+    def load(self, path, solved_only=False):
+        """Add the entries of a saved table; with solved_only, just the settled ones."""
+        with open(path, 'rb') as f:
+            data = f.read()
+        if len(data) < HEADER.size:
+            raise ValueError(f"{path} is not a proof table")
+        magic, version, rows, cols, n_to_win = HEADER.unpack_from(data)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError(f"{path} is not a version {VERSION} proof table")
+        if (rows, cols, n_to_win) != (self.rows, self.cols, self.n_to_win):
+            raise ValueError(f"{path} holds {rows}x{cols} ({n_to_win} in a row), not this board")
+        if (len(data) - HEADER.size) % ENTRY.size:
+            raise ValueError(f"{path} is truncated")
+        table = self.table
+        for key, pn, dn, work, move in ENTRY.iter_unpack(memoryview(data)[HEADER.size:]):
+            if not solved_only or pn == 0 or dn == 0:
+                table[key] = (pn, dn, work, move)
+        if len(table) > self.max_entries:
+            self._collect()
+
+
+def open_proofs(rows, cols, n_to_win, directory=DEFAULT_DIR):
+    """ProofSolver holding the settled positions of a configuration's proof file, or None if there is none."""
+    key = (directory, rows, cols, n_to_win)
+    if key not in _OPEN_PROOFS:
+        path = proof_path(rows, cols, n_to_win, directory)
+        solver = None
+        if os.path.exists(path):
+            solver = ProofSolver(rows, cols, n_to_win, max_entries=float('inf'))
+            solver.load(path, solved_only=True)  # Play never needs the unsettled ones
+        _OPEN_PROOFS[key] = solver
+    return _OPEN_PROOFS[key]
+
+
+def proof_move(board, ai_symbol='O', player_symbol='X', directory=DEFAULT_DIR, stats=None):
+    """Move from a proof file that keeps a won or drawn position so, or None if it has none.
+
+    Off the proved lines a move proved not to lose is still played: it beats
+    a search that cannot see to the end.
+
+    A search.SearchStats passed as stats is filled in only when the file answers.
+    """
+    solver = open_proofs(board.rows, board.cols, board.n_to_win, directory)
+    if solver is None:
+        return None
+    start = time.perf_counter()
+    result = solver.probe(board, ai_symbol, player_symbol)
+    move = solver.safe_move(board, ai_symbol, player_symbol) if result is None else result[1]
+    if move is None:
+        return None
+    if stats is not None:
+        stats.method = 'proof'
+        stats.elapsed = time.perf_counter() - start
+        stats.pv = [move]
+    return move
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Solve a board configuration by proof-number search.")
+    parser.add_argument('rows', type=int)
+    parser.add_argument('cols', type=int)
+    parser.add_argument('n_to_win', type=int)
+    parser.add_argument('--dir', default=DEFAULT_DIR, help="proof file directory (default: %(default)s)")
+    parser.add_argument('--max-entries', type=int, default=DEFAULT_MAX_ENTRIES, help="table size cap")
+    parser.add_argument('--time-limit', type=float, help="seconds to run before stopping (resume later)")
+    args = parser.parse_args()
+    path = proof_path(args.rows, args.cols, args.n_to_win, args.dir)
+    solver = ProofSolver(args.rows, args.cols, args.n_to_win, args.max_entries, checkpoint_path=path)
+    resumed = len(solver.table)
+    start = time.perf_counter()
+    value = solver.solve(None if args.time_limit is None else args.time_limit * 1000)
+    elapsed = time.perf_counter() - start
+    print(f"{solver.nodes} nodes in {elapsed:.1f}s, {len(solver.table)} positions in {path}"
+          + (f" (resumed from {resumed})" if resumed else ""))
+    if value is None:
+        print("Stopped before a result; run again to resume.")
+    else:
+        print({1: "First player wins", 0: "Draw", -1: "Second player wins"}[value])
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,184 @@
+"""Compact binary game records: an append-only writer and a streaming reader.
+
+A record file starts with an 8-byte header (magic, version) followed by one
+record per game:
+
+    rows, cols, n_to_win, result   1 byte each
+    first, second                  the two players' symbols, 1 ASCII byte each
+    move count                     2 bytes, little-endian
+    moves                          cell indices (row * cols + col) in the order
+                                   played: 1 byte each on boards of up to 256
+                                   cells, 2 bytes (little-endian) on larger ones
+
+so a 3x3 game takes 8 + 9 bytes at most.  ``result`` is one of DRAW,
+FIRST_WON, SECOND_WON or UNFINISHED.  Records are only ever appended, and
+``read_games`` walks a memory-mapped file one record at a time, so scanning
+hundreds of millions of games needs no more memory than one record.  A record
+cut short by a crash at the end of a file is skipped.
+
+The terminal games and the GUI append every finished game to the file named
+by the TICTAC_GAME_LOG environment variable; ``selfplay.py --record FILE``
+records headless games.  ``python gamelog.py FILE`` prints a summary.
+"""
+
+import argparse
+import mmap
+import os
+import struct
+import sys
+from array import array
+from collections import Counter, namedtuple
+
+MAGIC = b'TTTR'
+VERSION = 1
+FILE_HEADER = struct.Struct('<4sB3x')  # magic, version
+RECORD_HEADER = struct.Struct('<BBBBccH')  # rows, cols, n_to_win, result, first, second, move count
+DRAW, FIRST_WON, SECOND_WON, UNFINISHED = 0, 1, 2, 3
+RESULT_NAMES = {DRAW: 'draw', FIRST_WON: 'first won', SECOND_WON: 'second won', UNFINISHED: 'unfinished'}
+BYTE_MOVE_CELLS = 256  # Boards up to this many cells store one byte per move
+MAX_MOVES = 0xFFFF  # The move count field is two bytes
+GAME_LOG_PATH = os.environ.get('TICTAC_GAME_LOG')  # Where the interactive games append their records, if set
+
+
+class GameRecord(namedtuple('GameRecord', 'rows cols n_to_win result first second moves')):
+    """One game read back from a record file; ``moves`` holds the cell indices in order."""
+
+    def cells(self):
+        """The moves as (row, col) pairs."""
+        return [divmod(idx, self.cols) for idx in self.moves]
+
+    def winner(self):
+        """Symbol of the winner, or None for a draw or an unfinished game."""
+        return {FIRST_WON: self.first, SECOND_WON: self.second}.get(self.result)
+
+
+def encode_game(rows, cols, n_to_win, first, second, moves, result):
+    """The bytes of one record; ``moves`` are cell indices in the order played."""
+    if len(moves) > MAX_MOVES:
+        raise ValueError(f"a record holds at most {MAX_MOVES} moves")
+    header = RECORD_HEADER.pack(rows, cols, n_to_win, result, first.encode('ascii'), second.encode('ascii'),
+                                len(moves))
+    if rows * cols <= BYTE_MOVE_CELLS:
+        return header + bytes(moves)
+    return header + struct.pack(f'<{len(moves)}H', *moves)
+
+
+def board_record(board, first, second, result=None):
+    """Record of the game on a BitBoard (or any board with (cell, symbol) / (row, col) move_history).
+
+    The result is worked out from the last move when not given.
+    """
+    moves = []
+    for move in board.move_history:
+        if isinstance(move[1], str):  # BitBoard: (cell index, symbol)
+            moves.append(move[0])
+        else:  # List boards: (row, col)
+            moves.append(move[0] * board.cols + move[1])
+    if result is None:
+        if board.last_move_won():
+            result = FIRST_WON if len(moves) % 2 else SECOND_WON  # The first player makes the odd-numbered moves
+        elif board.is_full():
+            result = DRAW
+        else:
+            result = UNFINISHED
+    return encode_game(board.rows, board.cols, board.n_to_win, first, second, moves, result)
+
+
+class GameRecordWriter:
+    """Appends records to a file, writing the file header when the file is new."""
+
+    def __init__(self, path):
+        self.file = open(path, 'ab')
+        if self.file.tell() == 0:
+            self.file.write(FILE_HEADER.pack(MAGIC, VERSION))
+        else:
+            with open(path, 'rb') as f:
+                check_header(f.read(FILE_HEADER.size), path)
+
+    def write(self, record):
+        """Append the bytes of one or more records (from encode_game or board_record)."""
+        self.file.write(record)
+
+    def write_board(self, board, first, second, result=None):
+        self.write(board_record(board, first, second, result))
+
+    def close(self):
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def check_header(header, path):
+    if len(header) < FILE_HEADER.size:
+        raise ValueError(f"{path} is not a game record file")
+    magic, version = FILE_HEADER.unpack(header[:FILE_HEADER.size])
+    if magic != MAGIC or version != VERSION:
+        raise ValueError(f"{path} is not a version {VERSION} game record file")
+
+
+def log_game(board, first, second, path=GAME_LOG_PATH):
+    """Append a finished game to ``path`` (by default TICTAC_GAME_LOG); does nothing when no path is set."""
+    if not path:
+        return
+    with GameRecordWriter(path) as writer:  # Opened per game, so a crash never loses earlier games
+        writer.write_board(board, first, second)
+
+
+def read_games(path):
+    """Yield a GameRecord for every complete record in the file, without loading the file."""
+    with open(path, 'rb') as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            return
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            check_header(data[:FILE_HEADER.size], path)
+            offset = FILE_HEADER.size
+            end = len(data)
+            while offset + RECORD_HEADER.size <= end:
+                rows, cols, n_to_win, result, first, second, count = RECORD_HEADER.unpack_from(data, offset)
+                offset += RECORD_HEADER.size
+                width = 1 if rows * cols <= BYTE_MOVE_CELLS else 2
+                if offset + count * width > end:
+                    break  # Cut short while being written
+                if width == 1:
+                    moves = data[offset:offset + count]
+                else:
+                    moves = array('H', data[offset:offset + count * 2])
+                    if sys.byteorder == 'big':  # Stored little-endian
+                        moves.byteswap()
+                offset += count * width
+                yield GameRecord(rows, cols, n_to_win, result, first.decode('ascii'), second.decode('ascii'),
+                                 moves)
+
+
+def summarize(path):
+    """Counts per (shape, result) and per winning symbol over a whole record file."""
+    results = Counter()
+    winners = Counter()
+    games = 0
+    for record in read_games(path):
+        games += 1
+        results[(record.rows, record.cols, record.n_to_win), record.result] += 1
+        winner = record.winner()
+        if winner is not None:
+            winners[winner] += 1
+    return games, results, winners
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Summarize a game record file.")
+    parser.add_argument('path')
+    args = parser.parse_args()
+    games, results, winners = summarize(args.path)
+    print(f"{games} games")
+    for ((rows, cols, n_to_win), result), count in sorted(results.items()):
+        print(f"  {rows}x{cols} ({n_to_win} in a row) {RESULT_NAMES[result]}: {count}")
+    for symbol, count in winners.most_common():
+        print(f"  {symbol} won {count}")
+
+
+if __name__ == "__main__":
+    main()
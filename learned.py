@@ -0,0 +1,332 @@
+"""Learned evaluator: a linear model over line-pattern features, trained on self-play.
+
+``HeuristicEvaluator`` in search.py weighs an open line of k stones as 4**k.
+``LearnedEvaluator`` counts the same open lines, plus the fork cells of
+each side (where one stone makes two lines a stone short) and whether the
+opponent is forced to block, and squashes a weighted sum of them with tanh.
+The weights are fitted to self-play games with NumPy: first by ridge
+regression of each position on how its game ended for the player who had
+just moved, then by a few passes of value iteration, each regressing on the
+value the previous weights give the opponent's best reply.  Threats the
+heuristic scores exactly (a line the opponent completes next move, two lines
+we finish on different cells) are still scored that way; the weights judge
+the quiet positions.
+
+At a node whose children are all leaves, the searches hand every child to
+``score_children`` at once: the children's features are worked out from the
+parent's counts as array operations and scored with one matrix product,
+instead of making, scoring and taking back each move in turn.
+
+Weights live in a small binary file (see WEIGHTS_PATH), one model per
+n_to_win:
+
+    magic, version, model count        8-byte header
+    n_to_win, feature count            1 byte each, per model
+    weights                            float32 each, little-endian
+
+The shipped file covers n_to_win 3 to 5.  Train or retrain a model with e.g.
+``python learned.py --board 6 6 4 --games 5000``, or from recorded games
+with ``python learned.py --board 6 6 4 --records games.ttr``.
+
+NumPy is optional for the rest of the project; creating a LearnedEvaluator
+without it raises ImportError.
+"""
+
+import argparse
+import os
+import struct
+import tempfile
+
+from bitboard import BitBoard
+from gamelog import DRAW, FIRST_WON, SECOND_WON, read_games
+from npboard import np, require_numpy
+from search import MATE_SCORE, MATE_WINDOW, HeuristicEvaluator
+
+MAGIC = b'TTLW'
+VERSION = 1
+HEADER = struct.Struct('<4sBB2x')  # magic, version, model count
+MODEL_HEADER = struct.Struct('<BB')  # n_to_win, feature count
+WEIGHTS_PATH = os.environ.get('TICTAC_WEIGHTS', os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                                              'weights', 'learned.ttw'))
+SCALE = 10000  # The best quiet position scores just under this; far below the forced-win scores
+THREAT_SCALE = 2 * SCALE  # Unstoppable threats (see LearnedEvaluator) outrank every estimate
+RIDGE = 1e-3  # Regularization of the least-squares fit
+ITERATIONS = 4  # Value-iteration passes over the games after the first fit to their results
+LABEL_LIMIT = 0.96  # Labels are fitted through arctanh (the model squashes with tanh), so +-1 is capped
+DEFAULT_POLICY = 'heuristic:1@0.6'  # Self-play policy for training games: mostly random, so blunders get seen
+
+_SHAPES = {}  # (rows, cols, n_to_win) -> (cells of each window, cells x windows incidence matrix)
+
+
+def feature_count(n_to_win):
+    """Bias, open lines of 1..n_to_win-1 stones (ours) and 1..n_to_win-2 (theirs), fork cells of each side, tempo."""
+    return 2 * n_to_win + 1
+
+
+def shape_arrays(board):
+    """The board's windows as arrays: their cells (windows, n_to_win) and a (cells, windows) incidence matrix."""
+    key = (board.rows, board.cols, board.n_to_win)
+    cached = _SHAPES.get(key)
+    if cached is None:
+        lines = board.lines
+        window_cells = np.zeros((len(lines.masks), board.n_to_win), dtype=np.intp)
+        incidence = np.zeros((lines.size, len(lines.masks)), dtype=np.intp)
+        for w, mask in enumerate(lines.masks):
+            window_cells[w] = [idx for idx in range(lines.size) if mask >> idx & 1]
+            incidence[window_cells[w], w] = 1
+        cached = _SHAPES[key] = (window_cells, incidence)
+    return cached
+
+
+def board_arrays(board, symbol):
+    """``symbol``'s stones per window, all stones per window and the empty cells of a BitBoard with line counts."""
+    windows = len(board.window_stones)
+    mine = np.array(board.window_counts.get(symbol) or [0] * windows, dtype=np.intp)
+    total = np.array(board.window_stones, dtype=np.intp)
+    size = board.lines.size
+    free = board.lines.full & ~board.occupied
+    empty = np.unpackbits(np.frombuffer(free.to_bytes((size + 7) // 8, 'little'), dtype=np.uint8),
+                          bitorder='little')[:size].astype(bool)
+    return mine, total, empty
+
+
+def analyse(mine, total, empty, n_to_win, shape):
+    """Features, threats and wins of positions given as arrays with one row per position.
+
+    ``mine`` and ``total`` count the stones of the player who just moved and
+    all stones per window, ``empty`` marks the empty cells, and ``shape`` is
+    from shape_arrays.  Threats are -1 where the player to move completes a
+    line next move, 1 where we have lines a stone short finishing on two
+    different cells (they can only block one), and 0 elsewhere.
+    """
+    n = n_to_win
+    window_cells, incidence = shape
+    theirs = total - mine
+    mine_open = theirs == 0  # Windows we can still complete
+    theirs_open = mine == 0
+    x = np.empty((len(mine), feature_count(n)), dtype=np.float64)
+    x[:, 0] = 1.0
+    for k in range(1, n):
+        x[:, k] = (mine_open & (mine == k)).sum(axis=1)
+    for k in range(1, n - 1):
+        x[:, n - 1 + k] = (theirs_open & (theirs == k)).sum(axis=1)
+    # Fork cells: empty cells on two open lines two stones short, where one stone makes a double threat
+    for column, lines in ((2 * n - 2, mine_open & (mine == n - 2)), (2 * n - 1, theirs_open & (theirs == n - 2))):
+        x[:, column] = (((lines.astype(np.float32) @ incidence.T.astype(np.float32)) >= 2) & empty).sum(axis=1)
+    x[:, 2 * n] = x[:, n - 1] > 0  # Tempo: they must block our line a stone short...
+    x[:, 2 * n - 1] *= x[:, n - 1] == 0  # ...so their forks only count when we have none
+    threat = np.zeros(len(mine), dtype=np.int64)
+    short = mine_open & (mine == n - 1)
+    if short.any():
+        slot = empty[:, window_cells].argmax(axis=2)  # Where in each window an empty cell is
+        finish = window_cells[np.arange(len(window_cells))[None, :], slot]  # A short line's finishing cell
+        threat[np.where(short, finish, -1).max(axis=1) > np.where(short, finish, len(incidence)).min(axis=1)] = 1
+    threat[(theirs_open & (theirs == n - 1)).any(axis=1)] = -1
+    won = (mine == n).any(axis=1)
+    return x, threat, won
+
+
+def load_weights(path=WEIGHTS_PATH):
+    """n_to_win -> float64 weight vector, read from a weights file."""
+    with open(path, 'rb') as f:
+        data = f.read()
+    if len(data) < HEADER.size:
+        raise ValueError(f"{path} is not a weights file")
+    magic, version, count = HEADER.unpack_from(data)
+    if magic != MAGIC or version != VERSION:
+        raise ValueError(f"{path} is not a version {VERSION} weights file")
+    models = {}
+    offset = HEADER.size
+    for _ in range(count):
+        n_to_win, size = MODEL_HEADER.unpack_from(data, offset)
+        offset += MODEL_HEADER.size
+        weights = np.frombuffer(data, dtype='<f4', count=size, offset=offset)
+        offset += 4 * size
+        if size != feature_count(n_to_win):
+            raise ValueError(f"{path}: model for n_to_win={n_to_win} has {size} weights, "
+                             f"expected {feature_count(n_to_win)}")
+        models[n_to_win] = weights.astype(np.float64)
+    return models
+
+
+def save_weights(models, path=WEIGHTS_PATH):
+    """Write ``models`` (n_to_win -> weight vector) to ``path``, replacing it atomically."""
+    parts = [HEADER.pack(MAGIC, VERSION, len(models))]
+    for n_to_win in sorted(models):
+        weights = np.asarray(models[n_to_win], dtype='<f4')
+        parts.append(MODEL_HEADER.pack(n_to_win, len(weights)) + weights.tobytes())
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'wb') as f:
+        f.write(b''.join(parts))
+    os.replace(tmp_path, path)  # Searches loading the file never see half of it
+
+
+class LearnedEvaluator(HeuristicEvaluator):
+    """Scores quiet leaves with weights fitted to self-play games.
+
+    Threats are scored as by the heuristic: a line the player to move can
+    complete loses, two lines finishing on different cells win.  They count
+    THREAT_SCALE, ahead of any estimate, and wins score MATE_SCORE - ply.
+    """
+
+    name = 'learned'
+    mate_threshold = MATE_SCORE - MATE_WINDOW
+    key_salt = 0x6A09E667F3BCC909
+    batched = True
+
+    def __init__(self, models=None, path=WEIGHTS_PATH):
+        require_numpy()
+        self.models = load_weights(path) if models is None else dict(models)  # n_to_win -> weights
+
+    def _model(self, n_to_win):
+        weights = self.models.get(n_to_win)
+        if weights is None:
+            raise ValueError(f"No learned weights for n_to_win={n_to_win}; "
+                             f"train them with: python learned.py --board ROWS COLS {n_to_win}")
+        return weights
+
+    def attach(self, board):
+        self._model(board.n_to_win)  # Fail before searching, not at the first leaf
+        board.enable_line_counts()
+
+    def leaf(self, board, mover, waiting):
+        mine, total, empty = board_arrays(board, mover)
+        x, threat, _ = analyse(mine[None, :], total[None, :], empty[None, :], board.n_to_win, shape_arrays(board))
+        return int(self._values(x, threat, board.n_to_win)[0])
+
+    def score_children(self, board, cells, mover, waiting, ply, stats=None):
+        cells = np.asarray(cells, dtype=np.intp)
+        shape = shape_arrays(board)
+        mine, total, empty = board_arrays(board, mover)
+        added = shape[1][cells]  # (children, windows): 1 where the child's stone lands
+        empty = np.repeat(empty[None, :], len(cells), axis=0)
+        empty[np.arange(len(cells)), cells] = False
+        x, threat, won = analyse(mine + added, total + added, empty, board.n_to_win, shape)
+        values = self._values(x, threat, board.n_to_win)
+        values[won] = self.win(ply)
+        full = (board.lines.full & ~board.occupied).bit_count() == 1  # Each child fills the board
+        if full:
+            values[~won] = 0
+        if stats is not None:
+            stats.nodes += len(cells)
+            stats.nodes_by_depth[ply] += len(cells)
+            stats.terminal_hits += len(cells) if full else int(won.sum())
+        return values.tolist()
+
+    def _values(self, x, threat, n_to_win):
+        """Integer scores: threats as +-THREAT_SCALE, estimates squashed into (-SCALE, SCALE) in order."""
+        estimate = np.rint(np.tanh(x @ self._model(n_to_win)) * SCALE).astype(np.int64)
+        return np.where(threat != 0, threat * THREAT_SCALE, estimate)
+
+
+def game_examples(record, evaluator=None):
+    """(features, labels) for the quiet positions of a finished game, seen from the player who just moved.
+
+    Labels are how the game ended (+1 won, 0 drawn, -1 lost), or with an
+    evaluator the negated value of the opponent's best reply by its scores,
+    one ply of value iteration.  Positions scored as threats are left out.
+    """
+    board = BitBoard(record.rows, record.cols, record.n_to_win)
+    board.enable_line_counts()
+    n = record.n_to_win
+    shape = shape_arrays(board)
+    winner = {FIRST_WON: record.first, SECOND_WON: record.second}.get(record.result)
+    rows, labels = [], []
+    for ply, idx in enumerate(record.moves):
+        mover, waiting = (record.first, record.second) if ply % 2 == 0 else (record.second, record.first)
+        board.make_move(idx // record.cols, idx % record.cols, mover)
+        if board.last_move_won() or board.is_full():
+            break  # Scored as a win or a draw by the search itself
+        mine, total, empty = board_arrays(board, mover)
+        x, threat, _ = analyse(mine[None, :], total[None, :], empty[None, :], n, shape)
+        if threat[0]:
+            continue
+        if evaluator is None:
+            label = 0 if winner is None else 1 if winner == mover else -1
+        else:
+            cells = np.flatnonzero(empty)
+            best = max(evaluator.score_children(board, cells, waiting, mover, 1))
+            label = -max(-1.0, min(best / SCALE, 1.0))
+        rows.append(x[0])
+        labels.append(label)
+    if not labels:
+        return np.empty((0, feature_count(n))), np.empty(0)
+    return np.array(rows), np.array(labels, dtype=np.float64)
+
+
+def fit(record_paths, n_to_win, iterations=ITERATIONS, ridge=RIDGE):
+    """Weights for the finished ``n_to_win`` games in the record files.
+
+    The first fit regresses each position on its game's result; each of the
+    ``iterations`` passes after it regresses on the value the previous
+    weights give the best reply, which carries the results back to quieter
+    positions.  Each pass streams the files and keeps only the normal
+    equations, so any number of games can be used.
+    """
+    require_numpy()
+    weights = None
+    for _ in range(iterations + 1):
+        evaluator = None if weights is None else LearnedEvaluator({n_to_win: weights})
+        size = feature_count(n_to_win)
+        gram = np.zeros((size, size))
+        target = np.zeros(size)
+        positions = 0
+        for path in record_paths:
+            for record in read_games(path):
+                if record.n_to_win != n_to_win or record.result not in (DRAW, FIRST_WON, SECOND_WON):
+                    continue
+                x, y = game_examples(record, evaluator)
+                gram += x.T @ x
+                target += x.T @ np.arctanh(np.clip(y, -LABEL_LIMIT, LABEL_LIMIT))
+                positions += len(y)
+        if not positions:
+            raise ValueError(f"No finished games with n_to_win={n_to_win} to train on")
+        weights = np.linalg.solve(gram + ridge * positions * np.eye(size), target)
+    return weights
+
+
+def train(rows, cols, n_to_win, games=5000, policy=DEFAULT_POLICY, records=None, path=WEIGHTS_PATH, seed=None,
+          workers=None):
+    """Fit the model for ``n_to_win`` and store it in the weights file (other models are kept).
+
+    Trains on the given record files, or on ``games`` new self-play games of
+    ``policy`` against itself when there are none.  Returns the weights.
+    """
+    from selfplay import simulate  # Imports search, like this module; only needed to make new games
+    scratch = None
+    if not records:
+        fd, scratch = tempfile.mkstemp(suffix='.ttr')
+        os.close(fd)
+        os.remove(scratch)  # The writer adds the file header to a new file
+        simulate(policy, policy, games, rows, cols, n_to_win, workers=workers, seed=seed, record=scratch)
+        records = [scratch]
+    try:
+        weights = fit(records, n_to_win)
+    finally:
+        if scratch is not None:
+            os.remove(scratch)
+    models = load_weights(path) if os.path.exists(path) else {}
+    models[n_to_win] = weights
+    save_weights(models, path)
+    return weights
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Train the learned evaluator's weights on self-play games.")
+    parser.add_argument('--board', nargs=3, type=int, default=(6, 6, 4), metavar=('ROWS', 'COLS', 'N_TO_WIN'))
+    parser.add_argument('--games', type=int, default=5000, help="self-play games to train on")
+    parser.add_argument('--policy', default=DEFAULT_POLICY, help="selfplay.py policy that plays them")
+    parser.add_argument('--records', nargs='+', metavar='FILE', help="train on these game records instead")
+    parser.add_argument('--out', default=WEIGHTS_PATH, help="weights file to update (default: %(default)s)")
+    parser.add_argument('--seed', type=int, default=None)
+    parser.add_argument('--workers', type=int, default=None)
+    args = parser.parse_args()
+    rows, cols, n_to_win = args.board
+    weights = train(rows, cols, n_to_win, args.games, args.policy, args.records, args.out, args.seed, args.workers)
+    print(f"n_to_win={n_to_win}: " + ' '.join(f"{w:+.4f}" for w in weights))
+    print(f"Wrote {args.out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,139 @@
+"""Load generator for server.py: many clients playing random moves at once.
+
+Each client opens its own connection and plays game after game, choosing a
+random empty cell every turn.  At the end it prints the moves answered per
+second and the latency percentiles seen by the clients::
+
+    python loadgen.py --spawn --clients 200 --duration 10
+    python loadgen.py --unix /tmp/tictac.sock --clients 1000 --board 3 3 3
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import subprocess
+import sys
+import time
+
+BUSY_RETRY_DELAY = 0.01  # Seconds a client waits after a "busy" reply
+SHUTDOWN_TIMEOUT = 10.0  # Seconds a spawned server gets to stop before it is killed
+
+
+class LoadStats:
+    """What all clients saw, added up."""
+
+    def __init__(self):
+        self.moves = 0
+        self.games = 0
+        self.busy = 0
+        self.errors = 0
+        self.latencies = []  # Seconds per move request
+
+    def percentile(self, fraction):
+        if not self.latencies:
+            return 0.0
+        ordered = sorted(self.latencies)
+        return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+async def request(reader, writer, message):
+    writer.write(json.dumps(message).encode() + b'\n')
+    await writer.drain()
+    line = await reader.readline()
+    if not line:
+        raise ConnectionError("server closed the connection")
+    return json.loads(line)
+
+
+async def client(args, stats, deadline, rng):
+    """Play random games until ``deadline``."""
+    if args.unix:
+        reader, writer = await asyncio.open_unix_connection(args.unix)
+    else:
+        reader, writer = await asyncio.open_connection(args.host, args.port)
+    rows, cols, n_to_win = args.board
+    try:
+        while time.monotonic() < deadline:
+            reply = await request(reader, writer, {'op': 'new', 'rows': rows, 'cols': cols, 'n_to_win': n_to_win,
+                                                   'ai_first': rng.random() < 0.5, 'algorithm': args.algorithm})
+            if not reply['ok']:
+                stats.busy += reply['error'].startswith('busy')
+                stats.errors += not reply['error'].startswith('busy')
+                await asyncio.sleep(BUSY_RETRY_DELAY)
+                continue
+            session = reply['session']
+            while reply.get('status', 'playing') == 'playing' and time.monotonic() < deadline:
+                empty = [(r, c) for r, line in enumerate(reply['board']) for c, cell in enumerate(line) if cell == ' ']
+                row, col = rng.choice(empty)
+                start = time.perf_counter()
+                answer = await request(reader, writer, {'op': 'move', 'session': session, 'row': row, 'col': col})
+                if not answer['ok']:
+                    if answer['error'].startswith('busy'):
+                        stats.busy += 1
+                        await asyncio.sleep(BUSY_RETRY_DELAY)
+                    else:
+                        stats.errors += 1
+                        break
+                    continue
+                stats.latencies.append(time.perf_counter() - start)
+                stats.moves += 1
+                reply = answer
+            if reply.get('status', 'playing') != 'playing':
+                stats.games += 1
+            await request(reader, writer, {'op': 'close', 'session': session})
+    finally:
+        writer.close()
+
+
+async def run(args):
+    deadline = time.monotonic() + args.duration
+    stats = LoadStats()
+    rng = random.Random(args.seed)
+    start = time.perf_counter()
+    results = await asyncio.gather(*(client(args, stats, deadline, random.Random(rng.getrandbits(32)))
+                                     for _ in range(args.clients)), return_exceptions=True)
+    elapsed = time.perf_counter() - start
+    failed = [r for r in results if isinstance(r, Exception)]
+    print(f"{args.clients} clients, {elapsed:.2f}s: {stats.moves} moves ({stats.moves / elapsed:.0f} moves/s), "
+          f"{stats.games} games")
+    print(f"latency ms: p50 {stats.percentile(0.50) * 1000:.2f}  p90 {stats.percentile(0.90) * 1000:.2f}  "
+          f"p99 {stats.percentile(0.99) * 1000:.2f}  max {stats.percentile(1.0) * 1000:.2f}")
+    print(f"busy replies: {stats.busy}  errors: {stats.errors}  failed clients: {len(failed)}")
+    if failed:
+        print(f"first failure: {failed[0]!r}", file=sys.stderr)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark server.py with many concurrent random players.")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--unix', metavar='PATH', help="connect to a Unix socket instead of TCP")
+    parser.add_argument('--clients', type=int, default=100)
+    parser.add_argument('--duration', type=float, default=10.0, help="seconds to run")
+    parser.add_argument('--board', nargs=3, type=int, default=(3, 3, 3), metavar=('ROWS', 'COLS', 'N_TO_WIN'))
+    parser.add_argument('--algorithm', default='iterative', choices=('iterative', 'mcts'))
+    parser.add_argument('--seed', type=int, default=None)
+    parser.add_argument('--spawn', action='store_true', help="start server.py for the run and stop it afterwards")
+    args = parser.parse_args()
+    server = None
+    if args.spawn:
+        script = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'server.py')
+        command = [sys.executable, script] + (['--unix', args.unix] if args.unix else ['--port', str(args.port)])
+        server = subprocess.Popen(command, stdout=subprocess.PIPE, text=True)
+        server.stdout.readline()  # "Serving ..." once it is listening
+    try:
+        asyncio.run(run(args))
+    finally:
+        if server is not None:
+            server.terminate()  # SIGTERM: the server stops its AI workers and exits
+            try:
+                server.wait(SHUTDOWN_TIMEOUT)
+            except subprocess.TimeoutExpired:
+                server.kill()
+                server.wait()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,303 @@
+"""Monte Carlo Tree Search (UCT) for boards too large for alpha-beta.
+
+Each simulation walks down the tree by the UCT rule, adds one new position,
+plays the rest of the game out at random and backs the result up.  Playouts
+run on plain integer bitmasks with the precomputed win windows of
+bitboard.py, so they allocate almost nothing.  The move played is the root
+child visited most often.  As in search.py, big boards only expand moves near
+the stones already played; playouts still use the whole board.
+
+An ``MCTSTree`` kept for a whole game carries the subtree under the moves
+actually played over to the next search.  With ``workers`` > 1 independent
+trees are grown on the process pool from parallel.py and their root visit
+counts are added up (root parallelisation).
+"""
+
+import math
+import os
+import random
+import time
+
+from bitboard import BitBoard
+from parallel import get_pool
+from search import LOCALITY_MIN_CELLS, LOCALITY_RADIUS
+
+DEFAULT_PLAYOUTS = 2000  # Simulations per move when no budget is given
+EXPLORATION = math.sqrt(2)  # UCT exploration constant
+CHECK_INTERVAL = 64  # Simulations between clock checks
+
+
+class Node:
+    """One position in the tree, reached by ``move`` of the player who just moved."""
+
+    __slots__ = ('move', 'parent', 'children', 'untried', 'visits', 'score')
+
+    def __init__(self, move, parent, untried):
+        self.move = move  # Cell index played to get here (None at the root)
+        self.parent = parent
+        self.children = []
+        self.untried = untried  # Cell indices not expanded yet (empty once the game is over)
+        self.visits = 0
+        self.score = 0.0  # Sum of results for the player who made ``move``: 1 win, 0.5 draw
+
+    def best_child(self, log_visits):
+        """Child with the highest UCT value."""
+        best, best_value = None, -1.0
+        for child in self.children:
+            value = child.score / child.visits + EXPLORATION * math.sqrt(log_visits / child.visits)
+            if value > best_value:
+                best, best_value = child, value
+        return best
+
+
+class MCTSTree:
+    """Search tree for one side of a game; pass the same tree to every ``mcts_move``."""
+
+    def __init__(self, seed=None, locality=None):
+        self.rng = random.Random(seed)
+        self.locality = locality  # Expansion radius around the stones; None picks it from the board size
+        self.root = None
+        self.root_bits = None  # (to-move stones, opponent stones) at the root
+
+    def _reuse(self, mover, other):
+        """Move the root down to the current position if it follows from the previous one."""
+        if self.root is None:
+            return False
+        old_mover, old_other = self.root_bits
+        if old_mover & ~mover or old_other & ~other:
+            return False  # Stones disappeared: a different game
+        ours = mover & ~old_mover
+        theirs = other & ~old_other
+        if not ours and not theirs:
+            return True  # Same position
+        if ours.bit_count() != 1 or theirs.bit_count() != 1:
+            return False
+        node = self.root
+        for move in (ours.bit_length() - 1, theirs.bit_length() - 1):  # Our move, then their reply
+            node = next((child for child in node.children if child.move == move), None)
+            if node is None:
+                return False
+        node.parent = None  # Let the rest of the old tree be freed
+        self.root = node
+        self.root_bits = (mover, other)
+        return True
+
+    def search(self, board, to_move, opponent, playouts=None, time_budget_ms=None, stats=None):
+        """Grow the tree from ``board`` within the budget; returns {cell index: visits} of the root moves."""
+        geo = board.lines
+        full = geo.full
+        radius = self.locality
+        if radius is None:
+            radius = LOCALITY_RADIUS if geo.size >= LOCALITY_MIN_CELLS else 0
+        near_masks = geo.neighbourhood(radius) if radius else [full] * geo.size
+        mover = board.bits.get(to_move, 0)
+        other = board.bits.get(opponent, 0)
+        root_near = 0  # Cells near any stone of the root position
+        stones_left = board.occupied
+        while stones_left:
+            low = stones_left & -stones_left
+            root_near |= near_masks[low.bit_length() - 1]
+            stones_left ^= low
+        if not self._reuse(mover, other):
+            self.root = Node(None, None, _candidates(root_near, board.occupied, full))
+            self.root_bits = (mover, other)
+        if playouts is None and time_budget_ms is None:
+            playouts = DEFAULT_PLAYOUTS
+        deadline = None if time_budget_ms is None else time.perf_counter() + time_budget_ms / 1000.0
+        cell_masks = geo.cell_masks
+        rng = self.rng
+        root = self.root
+        done = 0
+        terminal = 0  # Simulations whose tree walk reached a finished game
+        while playouts is None or done < playouts:
+            if deadline is not None and done % CHECK_INTERVAL == 0 and time.perf_counter() >= deadline:
+                break
+            # Selection: follow UCT while every move of a node has been tried
+            node = root
+            stones = (mover, other)  # (stones of the side to move at node, the other side's)
+            near = root_near
+            depth = 0
+            winner = None  # 0 = side to move at the root, 1 = the other side
+            while not node.untried and node.children:
+                node = node.best_child(math.log(node.visits))
+                placed = stones[0] | 1 << node.move
+                stones = (stones[1], placed)
+                near |= near_masks[node.move]
+                depth += 1
+                if _wins(placed, cell_masks[node.move]):
+                    winner = (depth - 1) % 2
+                    break
+            # Expansion: one new child, unless the game already ended here
+            if winner is None and node.untried:
+                untried = node.untried
+                i = rng.randrange(len(untried))
+                move = untried[i]
+                untried[i] = untried[-1]
+                untried.pop()
+                placed = stones[0] | 1 << move
+                stones = (stones[1], placed)
+                depth += 1
+                if _wins(placed, cell_masks[move]):
+                    winner = (depth - 1) % 2
+                    child = Node(move, node, [])
+                else:
+                    child = Node(move, node, _candidates(near | near_masks[move], stones[0] | stones[1], full))
+                node.children.append(child)
+                node = child
+            # Simulation: random moves to the end of the game
+            if winner is None and stones[0] | stones[1] != full:
+                winner = _playout(stones[0], stones[1], _free_cells(stones[0] | stones[1], geo.size), cell_masks, rng)
+                if winner is not None:
+                    winner = (depth + winner) % 2
+            else:
+                terminal += 1
+            # Backpropagation: each node scores the result for the player who moved into it
+            side = (depth - 1) % 2  # Player who made node.move, counted from the root
+            while node is not None:
+                node.visits += 1
+                if winner is None:
+                    node.score += 0.5
+                elif winner == side:
+                    node.score += 1.0
+                side ^= 1
+                node = node.parent
+            done += 1
+            if stats is not None:
+                stats.reserve_depth(depth)
+                stats.nodes_by_depth[depth] += 1
+        if stats is not None:
+            stats.nodes += done
+            stats.terminal_hits += terminal
+        return {child.move: child.visits for child in root.children}
+
+    def principal_variation(self, cols):
+        """Most visited line from the root, as (row, col) pairs."""
+        line = []
+        node = self.root
+        while node is not None and node.children:
+            node = max(node.children, key=lambda child: child.visits)
+            line.append((node.move // cols, node.move % cols))
+        return line
+
+
+def _empty_cells(empty):
+    cells = []
+    while empty:
+        low = empty & -empty
+        cells.append(low.bit_length() - 1)
+        empty ^= low
+    return cells
+
+
+def _free_cells(occupied, size):
+    """List of the empty cell indices; cheaper than _empty_cells while few cells are taken."""
+    cells = list(range(size))
+    while occupied:
+        idx = occupied.bit_length() - 1
+        del cells[idx]  # Highest first, so lower indices do not move
+        occupied ^= 1 << idx
+    return cells
+
+
+def _candidates(near, occupied, full):
+    """Moves to expand: empty cells in ``near``, or every empty cell if there are none."""
+    empty = full & ~occupied
+    return _empty_cells(near & empty or empty)
+
+
+def _wins(stones, masks):
+    for mask in masks:
+        if stones & mask == mask:
+            return True
+    return False
+
+
+def _playout(to_move, other, empty, cell_masks, rng):
+    """Play random moves from a position; returns 0 if ``to_move``'s side wins, 1 if the other does, None on a draw.
+
+    ``empty`` (the list of empty cells) is shuffled in place.
+    """
+    cells = empty
+    rng.shuffle(cells)
+    stones = [to_move, other]
+    side = 0
+    for move in cells:
+        placed = stones[side] | 1 << move
+        stones[side] = placed
+        if _wins(placed, cell_masks[move]):
+            return side
+        side ^= 1
+    return None
+
+
+def _immediate_move(board, to_move, opponent):
+    """A move that wins at once, else one that stops the opponent winning at once, else None."""
+    cell_masks = board.lines.cell_masks
+    empty = _empty_cells(board.lines.full & ~board.occupied)
+    for symbol in (to_move, opponent):
+        stones = board.bits.get(symbol, 0)
+        for idx in empty:
+            if _wins(stones | 1 << idx, cell_masks[idx]):
+                return idx
+    return None
+
+
+def _worker_mcts(shape, bits, to_move, opponent, playouts, time_budget_ms, seed):
+    """Pool task: grow an independent tree and return its root visit counts."""
+    rows, cols, n_to_win = shape
+    board = BitBoard(rows, cols, n_to_win)
+    for symbol, mask in bits.items():
+        board.bits[symbol] = mask
+        board.occupied |= mask
+    return MCTSTree(seed).search(board, to_move, opponent, playouts, time_budget_ms)
+
+
+def mcts_move(board, ai_symbol='O', player_symbol='X', playouts=None, time_budget_ms=None, tree=None, workers=1,
+              stats=None, seed=None):
+    """Best move for the AI by Monte Carlo Tree Search; a drop-in alternative to get_minimax_ai_move.
+
+    The budget is ``playouts`` simulations and/or ``time_budget_ms``
+    (DEFAULT_PLAYOUTS if neither is given).  Keep one MCTSTree per game and
+    pass it as ``tree`` to reuse the subtree of the moves played since the last
+    call.  ``workers`` > 1 splits the playouts over that many processes.
+    """
+    work = board if isinstance(board, BitBoard) else BitBoard.from_board(board)
+    start = time.perf_counter()
+    if stats is not None:
+        stats.method = 'mcts'
+    if work.is_full():
+        return None
+    forced = _immediate_move(work, ai_symbol, player_symbol)
+    if forced is not None:  # No need to sample when the next move decides the game
+        move = (forced // work.cols, forced % work.cols)
+        if stats is not None:
+            stats.pv = [move]
+            stats.elapsed = time.perf_counter() - start
+        return move
+    if workers is None or workers > 1:
+        workers = workers or os.cpu_count() or 1
+        pool = get_pool(workers)
+        shape = (work.rows, work.cols, work.n_to_win)
+        share = None  # A time budget alone applies to every worker as is
+        if playouts is not None or time_budget_ms is None:
+            share = -(-(playouts or DEFAULT_PLAYOUTS) // workers)  # Playouts split evenly, rounded up
+        base_seed = random.Random(seed).getrandbits(32)
+        futures = [pool.submit(_worker_mcts, shape, dict(work.bits), ai_symbol, player_symbol, share, time_budget_ms,
+                               base_seed + i) for i in range(workers)]
+        visits = {}
+        for future in futures:
+            for move, count in future.result().items():
+                visits[move] = visits.get(move, 0) + count
+        pv = None
+        if stats is not None:
+            stats.nodes += sum(visits.values())
+    else:
+        tree = tree if tree is not None else MCTSTree(seed)
+        visits = tree.search(work, ai_symbol, player_symbol, playouts, time_budget_ms, stats)
+        pv = tree.principal_variation(work.cols)
+    best = max(sorted(visits), key=lambda move: visits[move])  # Most visited; lowest cell on a tie
+    move = (best // work.cols, best % work.cols)
+    if stats is not None:
+        stats.pv = pv if pv and pv[0] == move else [move]
+        stats.elapsed = time.perf_counter() - start
+    return move
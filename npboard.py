@@ -0,0 +1,297 @@
+"""NumPy boards: large single boards and many games at once.
+
+``NumpyBoard`` has the same public API as the ``Board`` classes and BitBoard
+but keeps its cells in one int8 array, so on large boards (50x50, 100x100)
+``check_win`` and ``get_empty_cells`` are a few array operations instead of
+per-cell Python loops.  ``check_win`` slides an n_to_win window along rows,
+columns and both diagonals (see ``line_wins``); ``check_wins`` does the same
+for many boards in one call.  ``new_board`` picks NumpyBoard or BitBoard by
+board size.
+
+``BoardBatch`` keeps a whole batch of games in one int8 array (0 = empty,
+1 = first player, 2 = second player) and checks wins for every game in one
+vectorized step: only the windows through each game's last move are looked
+at, through a precomputed (cell, window, offset) -> cell index table.
+
+NumPy is optional for the rest of the project; this module can be imported
+without it, but creating a NumpyBoard or a batch raises ImportError.
+"""
+
+import sys
+
+try:
+    import numpy as np
+except ImportError:  # Only the batched simulators need NumPy
+    np = None
+
+from bitboard import BitBoard, _GridRow, geometry
+from gamelog import DRAW, FIRST_WON, SECOND_WON, UNFINISHED, encode_game
+from render import board_frame
+
+EMPTY, FIRST, SECOND = 0, 1, 2  # Cell values in a batch array
+LARGE_BOARD_CELLS = 400  # new_board uses a NumpyBoard from this many cells on (20x20)
+DIRECTIONS = ((0, 1), (1, 0), (1, 1), (1, -1))  # Row, column and both diagonals
+
+_WINDOW_CACHE = {}  # (rows, cols, n_to_win) -> window cell table
+
+
+def require_numpy():
+    """Raise a helpful ImportError when NumPy is missing."""
+    if np is None:
+        raise ImportError("NumPy is required for batched boards: pip install numpy")
+
+
+def window_table(rows, cols, n_to_win):
+    """Return an int array [cell, window, i] of the cells of every winning window through a cell.
+
+    Cells with fewer windows than the busiest cell are padded with windows made
+    of the index ``rows * cols``, a padding column that is always empty.
+    """
+    require_numpy()
+    key = (rows, cols, n_to_win)
+    table = _WINDOW_CACHE.get(key)
+    if table is None:
+        geo = geometry(rows, cols, n_to_win)
+        size = geo.size
+        windows = []
+        for mask in geo.masks:
+            windows.append([idx for idx in range(size) if mask >> idx & 1])
+        widest = max((len(w) for w in geo.cell_windows), default=0)
+        table = np.full((size, max(widest, 1), n_to_win), size, dtype=np.intp)
+        for idx in range(size):
+            for j, w in enumerate(geo.cell_windows[idx]):
+                table[idx, j] = windows[w]
+        _WINDOW_CACHE[key] = table
+    return table
+
+
+class BoardBatch:
+    """``count`` games on one board shape, stored as rows of a NumPy array."""
+
+    def __init__(self, count, rows=3, cols=3, n_to_win=None):
+        require_numpy()
+        self.rows = rows
+        self.cols = cols
+        self.n_to_win = min(3, rows, cols) if n_to_win is None else n_to_win
+        self.size = rows * cols
+        self.windows = window_table(rows, cols, self.n_to_win)
+        self.cells = np.zeros((count, self.size + 1), dtype=np.int8)  # Last column is the always-empty pad
+        self.moves = np.zeros(count, dtype=np.intp)  # Stones placed per game
+        self.history = np.zeros((count, self.size), dtype=np.int32)  # Cells played per game, in order
+        self.winner = np.zeros(count, dtype=np.int8)  # FIRST, SECOND, or EMPTY while undecided
+        self.done = np.zeros(count, dtype=bool)
+
+    def __len__(self):
+        return len(self.cells)
+
+    def active(self):
+        """Indices of the games still in progress."""
+        return np.flatnonzero(~self.done)
+
+    def legal(self, games):
+        """Boolean array [game, cell] of the empty cells of ``games``."""
+        return self.cells[games, :self.size] == EMPTY
+
+    def play(self, games, moves, player):
+        """Place ``player``'s stone on ``moves[i]`` in game ``games[i]``; updates winner and done.
+
+        Returns a boolean array marking the games that ``player`` just won.
+        """
+        self.cells[games, moves] = player
+        self.history[games, self.moves[games]] = moves
+        self.moves[games] += 1
+        lines = self.cells[games[:, None, None], self.windows[moves]]  # [game, window, i]
+        won = (lines == player).all(axis=2).any(axis=1)
+        self.winner[games[won]] = player
+        self.done[games] = won | (self.moves[games] == self.size)
+        return won
+
+    def records(self, symbols=('X', 'O')):
+        """gamelog records of every game in the batch, as one bytes object (FIRST plays ``symbols[0]``)."""
+        results = np.where(self.winner == FIRST, FIRST_WON, np.where(self.winner == SECOND, SECOND_WON, DRAW))
+        results[~self.done] = UNFINISHED
+        first, second = symbols
+        return b''.join(encode_game(self.rows, self.cols, self.n_to_win, first, second,
+                                    self.history[game, :self.moves[game]].tolist(), int(results[game]))
+                        for game in range(len(self.cells)))
+
+    def to_bitboard(self, game, symbols=('X', 'O')):
+        """BitBoard holding game ``game``, with FIRST/SECOND shown as ``symbols``."""
+        board = BitBoard(self.rows, self.cols, self.n_to_win)
+        row = self.cells[game, :self.size]
+        for value, symbol in zip((FIRST, SECOND), symbols):
+            mask = 0
+            for idx in np.flatnonzero(row == value):
+                mask |= 1 << int(idx)
+            if mask:
+                board.bits[symbol] = mask
+                board.occupied |= mask
+        return board
+
+
+def line_wins(stones, n_to_win):
+    """For boolean stone masks shaped [..., rows, cols], whether each holds n_to_win in a row.
+
+    Each direction slides an n_to_win window over the board as n_to_win shifted
+    slices ANDed together, so the work is n_to_win array operations per
+    direction whatever the board size.  Leading axes are boards checked at once.
+    """
+    rows, cols = stones.shape[-2:]
+    won = np.zeros(stones.shape[:-2], dtype=bool)
+    for dr, dc in DIRECTIONS:
+        height = rows - dr * (n_to_win - 1)  # Window starts that fit on the board
+        width = cols - abs(dc) * (n_to_win - 1)
+        if height <= 0 or width <= 0:
+            continue
+        first_col = n_to_win - 1 if dc < 0 else 0  # Anti-diagonal windows start n_to_win - 1 columns in
+        run = stones[..., :height, first_col:first_col + width].copy()
+        for i in range(1, n_to_win):
+            run &= stones[..., dr * i:dr * i + height, first_col + dc * i:first_col + dc * i + width]
+        won |= run.any(axis=(-2, -1))
+    return won
+
+
+def check_wins(boards, symbol):
+    """``check_win(symbol)`` for many same-shaped NumpyBoards in one vectorized call; returns a bool array."""
+    require_numpy()
+    if not boards:
+        return np.zeros(0, dtype=bool)
+    stones = np.stack([board.cells == board.codes.get(symbol, -1) for board in boards])
+    return line_wins(stones, boards[0].n_to_win)
+
+
+class NumpyBoard:
+    def __init__(self, rows=3, cols=3, n_to_win=None):
+        """Represents a Tic-Tac-Toe board as one int8 NumPy array (0 = empty, else a symbol code)."""
+        require_numpy()
+        self.rows = rows  # Number of rows in the board
+        self.cols = cols  # Number of columns in the board
+        self.n_to_win = min(3, rows, cols) if n_to_win is None else n_to_win  # Number of consecutive symbols needed to win
+        self.cells = np.zeros((rows, cols), dtype=np.int8)  # Symbol code per cell
+        self.codes = {' ': EMPTY}  # symbol -> code, assigned on the symbol's first stone
+        self.symbols = [' ']  # code -> symbol
+        self.move_history = []  # Moves made so far as (row, col), newest last
+        self.grid = [_GridRow(self, r) for r in range(rows)]  # List-of-lists view for older callers
+
+    def _code(self, symbol):
+        code = self.codes.get(symbol)
+        if code is None:
+            code = self.codes[symbol] = len(self.symbols)
+            self.symbols.append(symbol)
+        return code
+
+    def copy(self):
+        """Return an independent copy of this board."""
+        clone = NumpyBoard(self.rows, self.cols, self.n_to_win)
+        clone.cells = self.cells.copy()
+        clone.codes = dict(self.codes)
+        clone.symbols = list(self.symbols)
+        clone.move_history = list(self.move_history)
+        return clone
+
+    def to_bitboard(self):
+        """BitBoard holding the same position, built from the array rather than cell by cell."""
+        board = BitBoard(self.rows, self.cols, self.n_to_win)
+        flat = self.cells.ravel()
+        for code, symbol in enumerate(self.symbols[1:], 1):
+            mask = 0
+            for idx in np.flatnonzero(flat == code).tolist():
+                mask |= 1 << idx
+            if mask:
+                board.bits[symbol] = mask
+                board.occupied |= mask
+        return board
+
+    def symbol_at(self, row, col):
+        """Return the symbol in a cell, or ' ' if it is empty."""
+        return self.symbols[self.cells[row, col]]
+
+    def set_cell(self, row, col, symbol):
+        """Overwrite a cell with ``symbol`` (or clear it with ' ') without validation.
+
+        As in BitBoard.set_cell, the move history follows the write.
+        """
+        if self.cells[row, col] != EMPTY:
+            self.move_history = [move for move in self.move_history if move != (row, col)]
+        self.cells[row, col] = self._code(symbol)
+        if symbol != ' ':
+            self.move_history.append((row, col))
+
+    def display(self):
+        """Displays the board with column numbers and row labels."""
+        sys.stdout.write(board_frame(self))  # The whole board in one write instead of a print per line
+
+    def place_move(self, row, col, symbol):
+        """Place a move if the cell is valid and empty."""
+        if self.is_valid_move(row, col):
+            self.make_move(row, col, symbol)
+            return True
+        return False
+
+    def make_move(self, row, col, symbol):
+        """Place a move during search without validation; undo it with undo_move."""
+        self.cells[row, col] = self._code(symbol)
+        self.move_history.append((row, col))
+
+    def undo_move(self):
+        """Take back the most recent move."""
+        row, col = self.move_history.pop()
+        self.cells[row, col] = EMPTY
+
+    def last_move(self):
+        """Return the most recent move as (row, col, symbol), or None."""
+        if not self.move_history:
+            return None
+        row, col = self.move_history[-1]
+        return row, col, self.symbol_at(row, col)
+
+    def last_move_won(self):
+        """Check only the four lines through the last move's cell."""
+        if not self.move_history:
+            return False
+        row, col = self.move_history[-1]
+        code = self.cells[row, col]
+        reach = self.n_to_win - 1
+        lines = (
+            (self.cells[row, max(0, col - reach):col + reach + 1], min(col, reach)),  # (cells, index of the move)
+            (self.cells[max(0, row - reach):row + reach + 1, col], min(row, reach)),
+            (self.cells.diagonal(col - row), min(row, col)),
+            (np.fliplr(self.cells).diagonal(self.cols - 1 - col - row), min(row, self.cols - 1 - col)),
+        )
+        for line, at in lines:
+            ours = (line == code).tolist()
+            start = end = at
+            while start > 0 and ours[start - 1]:
+                start -= 1
+            while end + 1 < len(ours) and ours[end + 1]:
+                end += 1
+            if end - start + 1 >= self.n_to_win:
+                return True
+        return False
+
+    def is_valid_move(self, row, col):
+        """Check if the given move is within bounds and on an empty cell."""
+        return 0 <= row < self.rows and 0 <= col < self.cols and self.cells[row, col] == EMPTY
+
+    def get_empty_cells(self):
+        """Return all empty cells as (row, col) tuples, in row-major order."""
+        rows, cols = np.nonzero(self.cells == EMPTY)
+        return list(zip(rows.tolist(), cols.tolist()))
+
+    def is_full(self):
+        """Return True when no empty cells are left."""
+        return not (self.cells == EMPTY).any()
+
+    def check_win(self, symbol):
+        """Check if the given symbol has n_to_win in a row anywhere on the board."""
+        code = self.codes.get(symbol)
+        if code is None:
+            return False
+        return bool(line_wins(self.cells == code, self.n_to_win))
+
+
+def new_board(rows=3, cols=3, n_to_win=None):
+    """An empty board of the right kind for its size: NumpyBoard for large boards (with NumPy), else BitBoard."""
+    if np is not None and rows * cols >= LARGE_BOARD_CELLS:
+        return NumpyBoard(rows, cols, n_to_win)
+    return BitBoard(rows, cols, n_to_win)
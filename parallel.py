@@ -0,0 +1,227 @@
+"""Multi-process root search.
+
+``parallel_move`` hands root moves (or root move + reply pairs, with
+``split_depth=2``) to a ProcessPoolExecutor that stays alive between moves.
+Workers share the best root score found so far through a shared-memory
+value, so tasks that start later search with a tighter window and prune more.
+
+Every root move is still searched with alpha just below the best score, so
+ties are resolved exactly as in ``search.alphabeta_move`` and the chosen move
+is the same as the sequential search's.  Like it, every empty cell is searched
+unless ``locality`` is given, so by default the move is also plain minimax's.
+"""
+
+import atexit
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+from bitboard import BitBoard
+from search import INF, AlphaBetaSearch, SearchStats, make_evaluator
+from transposition import TranspositionTable
+
+_pool = None  # Shared ProcessPoolExecutor, created on first use
+_pool_workers = 0
+_shared_best = None  # multiprocessing.Value holding the best root score of the running search
+_search_lock = threading.Lock()  # One parallel search at a time owns the shared bound
+_search_counter = 0
+
+# Worker-process state
+_worker_best = None
+_worker_table = (None, None)  # (search id, TranspositionTable) reused by tasks of one search
+
+
+class ParallelStats(SearchStats):
+    """SearchStats plus timing for a parallel search: core utilization and load balance."""
+
+    def __init__(self):
+        super().__init__()
+        self.tasks = 0  # Jobs sent to the pool
+        self.wall_time = 0.0  # Seconds from start to the chosen move
+        self.busy_time = 0.0  # Seconds spent in tasks, summed over workers
+        self.worker_times = {}  # Worker pid -> seconds spent in tasks
+
+    @property
+    def utilization(self):
+        """Worker time per wall-clock second: how many cores were kept busy.
+
+        This is not a speedup: workers also redo work a sequential search would
+        have pruned, so compare wall time against alphabeta_move for that.
+        """
+        return self.busy_time / self.wall_time if self.wall_time else 0.0
+
+    @property
+    def load_balance(self):
+        """Mean over max worker busy time; 1.0 means perfectly even work."""
+        if not self.worker_times:
+            return 0.0
+        times = list(self.worker_times.values())
+        return (sum(times) / len(times)) / max(times) if max(times) else 1.0
+
+
+def _init_worker(shared_best):
+    global _worker_best
+    _worker_best = shared_best
+
+
+def _worker_search(search_id, shape, bits, ai_symbol, player_symbol, depth, moves, evaluator, locality):
+    """Pool task: value of the root move (and reply) in ``moves`` for the AI.
+
+    Returns (score, search counters, seconds, pid).  A score at or below the alpha used
+    is only an upper bound, which is enough to rule the root move out.
+    """
+    global _worker_table
+    start = time.perf_counter()
+    rows, cols, n_to_win = shape
+    board = BitBoard(rows, cols, n_to_win)
+    for symbol, mask in bits.items():
+        board.bits[symbol] = mask
+        board.occupied |= mask
+    if _worker_table[0] != search_id:  # Fresh table per root position keeps results identical to a sequential search
+        _worker_table = (search_id, TranspositionTable())
+    search = AlphaBetaSearch(board, ai_symbol, player_symbol, table=_worker_table[1], evaluator=evaluator,
+                             locality=locality)
+    alpha = _worker_best.value - 1
+    if len(moves) == 1:
+        score = search.child_score(moves[0], depth, alpha, INF, 0, ai_symbol, player_symbol)
+    else:
+        first, reply = moves
+        board.make_move(first // cols, first % cols, ai_symbol)
+        score = -search.child_score(reply, depth - 1, -INF, -alpha, 1, player_symbol, ai_symbol)
+    if len(moves) == 1 and score > alpha:  # Exact root score: let later tasks prune against it
+        with _worker_best.get_lock():
+            if score > _worker_best.value:
+                _worker_best.value = score
+    return score, search.stats.counters(), time.perf_counter() - start, os.getpid()
+
+
+def get_pool(workers=None):
+    """Return the shared process pool, (re)creating it if the worker count changes."""
+    global _pool, _pool_workers, _shared_best
+    workers = workers or os.cpu_count() or 1
+    if _pool is None or workers != _pool_workers:
+        shutdown_pool()
+        _shared_best = multiprocessing.Value('d', -INF)
+        _pool = ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(_shared_best,))
+        _pool_workers = workers
+    return _pool
+
+
+def shutdown_pool():
+    """Stop the worker processes (they are started again on the next parallel search)."""
+    global _pool
+    if _pool is not None:
+        _pool.shutdown(cancel_futures=True)
+        _pool = None
+
+
+atexit.register(shutdown_pool)
+
+
+def parallel_move(board, ai_symbol='O', player_symbol='X', depth=9, workers=None, split_depth=1, stats=None,
+                  evaluator=None, locality=0):
+    """Best move for the AI, searching root moves on several processes.
+
+    split_depth=1 makes one task per root move; split_depth=2 one task per
+    (root move, reply) pair, which balances better when there are few root
+    moves.  Pass a ParallelStats as stats for nodes, core utilization and load balance;
+    a plain SearchStats gets the search counters only.
+    ``evaluator`` and ``locality`` are passed to every worker's search as in ``alphabeta_move``.
+    """
+    global _search_counter
+    if split_depth not in (1, 2):
+        raise ValueError("split_depth must be 1 or 2")
+    if stats is None:
+        stats = ParallelStats()
+    timed = isinstance(stats, ParallelStats)  # Only a ParallelStats has the per-worker timing fields
+    start = time.perf_counter()
+    work = board.copy() if isinstance(board, BitBoard) else BitBoard.from_board(board)
+    cols = work.cols
+    evaluator = make_evaluator(evaluator)
+    local = AlphaBetaSearch(work, ai_symbol, player_symbol, stats, evaluator=evaluator, locality=locality)
+    root_moves = local.ordered_moves(0, ai_symbol, player_symbol)
+    if not root_moves:
+        return None
+    shape = (work.rows, work.cols, work.n_to_win)
+    scores = {}  # root move -> score (exact, or an upper bound below the best)
+
+    with _search_lock:
+        pool = get_pool(workers)
+        _shared_best.value = -INF
+        _search_counter += 1
+        search_id = (os.getpid(), _search_counter)
+        pending = {}  # future -> root move
+        open_replies = {}  # root move -> replies still being searched (split_depth=2)
+        split_roots = set()  # Root moves whose score is the minimum over reply tasks
+        for idx in root_moves:
+            work.make_move(idx // cols, idx % cols, ai_symbol)
+            if work.last_move_won() or work.is_full() or depth <= 1 or split_depth == 1:
+                # Terminal or shallow root moves are settled here or as one task
+                if work.last_move_won():
+                    scores[idx] = evaluator.win(1)
+                elif work.is_full():
+                    scores[idx] = 0
+                elif depth <= 1:
+                    scores[idx] = evaluator.leaf(work, ai_symbol, player_symbol)
+                work.undo_move()
+                if idx in scores:
+                    continue
+                future = pool.submit(_worker_search, search_id, shape, dict(work.bits), ai_symbol, player_symbol,
+                                     depth, (idx,), evaluator, locality)
+                pending[future] = idx
+            else:
+                replies = local.ordered_moves(1, player_symbol, ai_symbol)
+                work.undo_move()
+                open_replies[idx] = len(replies)
+                split_roots.add(idx)
+                scores[idx] = INF
+                for reply in replies:
+                    future = pool.submit(_worker_search, search_id, shape, dict(work.bits), ai_symbol, player_symbol,
+                                         depth, (idx, reply), evaluator, locality)
+                    pending[future] = idx
+        for score in scores.values():  # Moves settled in this process tighten the bound too
+            if score != INF and score > _shared_best.value:
+                _shared_best.value = score
+        if timed:
+            stats.tasks += len(pending)
+
+        while pending:
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                idx = pending.pop(future)
+                if future.cancelled():
+                    continue
+                score, counters, seconds, pid = future.result()
+                stats.merge(counters)
+                if timed:
+                    stats.busy_time += seconds
+                    stats.worker_times[pid] = stats.worker_times.get(pid, 0.0) + seconds
+                if idx in split_roots:
+                    scores[idx] = min(scores[idx], score)  # The opponent picks the worst reply for us
+                    if idx not in open_replies:
+                        continue  # Root move already settled; a task that was running finished late
+                    open_replies[idx] -= 1
+                    if open_replies[idx] == 0 or scores[idx] <= _shared_best.value - 1:
+                        del open_replies[idx]
+                        for other, other_idx in list(pending.items()):
+                            if other_idx == idx and other.cancel():  # Root move already settled
+                                del pending[other]
+                        if scores[idx] > _shared_best.value:
+                            with _shared_best.get_lock():
+                                _shared_best.value = max(_shared_best.value, scores[idx])
+                else:
+                    scores[idx] = score
+
+    best_idx = None
+    for idx, score in scores.items():
+        if best_idx is None or score > scores[best_idx] or (score == scores[best_idx] and idx < best_idx):
+            best_idx = idx
+    move = (best_idx // cols, best_idx % cols)
+    stats.elapsed = time.perf_counter() - start
+    if timed:
+        stats.wall_time = stats.elapsed
+    stats.method = 'parallel'
+    stats.pv = [move]  # Workers only report scores, so the line ends at the root move
+    return move
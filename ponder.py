@@ -0,0 +1,136 @@
+"""Pondering: search the AI's answers to the player's likely moves while the player thinks.
+
+While a game waits for the human (``input()`` in the terminal games, a click
+in the GUI) the CPU sits idle and the AI then starts its search from scratch.
+``Ponderer.start`` uses that time: a background thread goes through the
+player's possible moves, most likely first (the search's own move ordering,
+seen from the player's side), and runs the AI's normal search on the position
+after each one.  Each reply's time budget is spent in SLICES rounds, so every
+likely reply gets some thought early instead of the first few getting all of
+it.  When the real move comes in, ``Ponderer.answer`` returns the finished
+search for it, or how long it was already searched so the game only searches
+for the rest of its budget, and drops everything else.
+
+The searches share the game's transposition table, which is what carries a
+reply's earlier slices into its later ones (and into the game's own search).
+The table is never used by two threads at once: answer() and stop() wait for
+the pondering thread before the game searches again.
+"""
+
+import threading
+import time
+
+from bitboard import BitBoard
+from search import AlphaBetaSearch
+
+SLICES = 4  # Rounds a reply's time budget is spread over
+FINISHED_SHARE = 0.9  # A slice that ends before this share of its time had nothing left to search
+
+
+class Ponderer:
+    """Searches the AI's answer to each likely reply in the background, one position at a time."""
+
+    def __init__(self, search, time_budget_ms, max_replies=None):
+        self.search = search  # search(board, time_budget_ms, cancel_event) -> result, on the position after a reply
+        self.time_budget_ms = time_budget_ms  # The AI's budget per move; a reply searched this long is done
+        self.max_replies = max_replies  # Replies pondered per turn at most (None: every empty cell)
+        self.condition = threading.Condition()  # Guards results, spent, current, session and thread
+        self.results = {}  # (row, col) of a reply -> its finished search result
+        self.spent = {}  # (row, col) of a reply -> milliseconds searched so far
+        self.current = None  # Reply being searched right now
+        self.session = 0  # Changes whenever pondering starts or stops
+        self.cancel_event = None
+        self.thread = None
+        self.hits = 0  # Moves answered from pondering
+        self.misses = 0  # Moves that still needed a search
+
+    def start(self, board, player_symbol, ai_symbol):
+        """Start pondering the position on ``board``, where ``player_symbol`` is to move."""
+        self.stop()
+        work = board.copy() if isinstance(board, BitBoard) else BitBoard.from_board(board)
+        order = AlphaBetaSearch(work.copy(), player_symbol, ai_symbol).ordered_moves(0, player_symbol, ai_symbol)
+        replies = [divmod(idx, work.cols) for idx in order[:self.max_replies]]
+        with self.condition:
+            self.cancel_event = threading.Event()
+            self.thread = threading.Thread(target=self._run, args=(work, player_symbol, replies, self.cancel_event),
+                                           daemon=True)
+            self.thread.start()
+
+    def _run(self, board, player_symbol, replies, cancel_event):
+        """Pondering thread: give each unfinished reply one slice per round until cancelled."""
+        slice_ms = self.time_budget_ms / SLICES
+        pending = list(replies)
+        while pending:
+            for reply in list(pending):
+                with self.condition:
+                    if cancel_event.is_set():
+                        return
+                    self.current = reply
+                    spent = self.spent.get(reply, 0)
+                budget = min(slice_ms, self.time_budget_ms - spent)
+                board.make_move(reply[0], reply[1], player_symbol)
+                start = time.perf_counter()
+                try:
+                    result = self.search(board.copy(), budget, cancel_event)
+                except Exception:  # The game's own search of this reply will raise it where it can be seen
+                    result = None
+                elapsed = (time.perf_counter() - start) * 1000
+                board.undo_move()
+                with self.condition:
+                    self.current = None
+                    self.condition.notify_all()
+                    if result is None or cancel_event.is_set():  # A cancelled slice stopped early
+                        return
+                    self.spent[reply] = spent + elapsed
+                    if spent + elapsed >= self.time_budget_ms or elapsed < budget * FINISHED_SHARE:
+                        self.results[reply] = result
+                        pending.remove(reply)
+
+    def ready(self, reply):
+        """True if the search for ``reply`` has finished."""
+        with self.condition:
+            return reply in self.results
+
+    def answer(self, reply):
+        """(search result, 0) for the player's actual move if pondering finished it, else (None, ms already searched).
+
+        If that move is being searched right now, this waits for the slice to
+        end.  Pondering stops and everything learned about other moves is
+        dropped (except what the transposition table keeps).  Safe to call
+        from another thread: if pondering is stopped or restarted meanwhile,
+        this returns (None, 0) and leaves the new pondering alone.
+        """
+        with self.condition:
+            session = self.session
+            while self.current == reply and self.session == session:
+                self.condition.wait()
+            if self.session != session:
+                return None, 0
+            result = self.results.get(reply)
+            spent = self.spent.get(reply, 0)
+        self._stop(session)
+        if result is None:
+            self.misses += 1
+            return None, spent
+        self.hits += 1
+        return result, 0
+
+    def stop(self):
+        """Cancel the pondering thread, wait for it, and forget its results."""
+        self._stop(None)
+
+    def _stop(self, session):
+        """stop(), unless ``session`` is given and pondering has moved on from it."""
+        with self.condition:
+            if session is not None and session != self.session:
+                return
+            self.session += 1
+            thread, self.thread = self.thread, None
+            if thread is not None:
+                self.cancel_event.set()
+            self.results = {}
+            self.spent = {}
+            self.current = None
+            self.condition.notify_all()
+        if thread is not None:
+            thread.join()  # Outside the lock: the thread takes it on its way out
@@ -0,0 +1,102 @@
+"""Terminal rendering of boards: each frame is built in one string and written at once.
+
+``board_frame`` is the text ``Board.display`` shows (column numbers, borders
+and one labelled line per row).  Every board class's ``display`` writes it
+with a single write, instead of one print per line.
+
+``Renderer`` draws the board of a running game in one of three modes:
+
+    'full'   the whole frame after every move, as display() does
+    'ansi'   the first frame at the top of the screen, then only the cells
+             that changed, by moving the cursor there (ANSI escape codes);
+             the game's messages scroll below the board
+    'quiet'  nothing, for scripted runs
+
+The game loops use RENDER_MODE, read from the TICTAC_RENDER environment
+variable.  'ansi' falls back to 'full' when the output is not a terminal or
+the board does not fit on the screen.
+"""
+
+import os
+import shutil
+import sys
+
+MODES = ('full', 'ansi', 'quiet')
+RENDER_MODE = os.environ.get('TICTAC_RENDER', 'full')  # How the game loops draw the board
+CLEAR = '\x1b[2J\x1b[H'  # Clear the screen and move to its top left corner
+SAVE_CURSOR = '\x1b7'
+RESTORE_CURSOR = '\x1b8'
+RESET_SCROLL = '\x1b[r'  # Let the whole screen scroll again (this also moves the cursor home)
+BOTTOM = '\x1b[999;1H'  # Terminals stop the cursor at their last line
+
+
+def board_frame(board):
+    """The board as display() shows it, as one string ending in a newline."""
+    border = "  +" + "---+" * board.cols
+    lines = ["    " + "   ".join(str(c) for c in range(board.cols)), border]  # Column numbers, top border
+    for r in range(board.rows):
+        lines.append(f"{r} | {' | '.join(board.grid[r])} |")  # The row with its label
+        lines.append(border)  # Row separator
+    return '\n'.join(lines) + '\n'
+
+
+def cell_position(row, col):
+    """1-based (screen line, column) of a cell's symbol in a frame drawn from the top left corner."""
+    return 3 + 2 * row, len(str(row)) + 4 + 4 * col
+
+
+class Renderer:
+    """Draws a game's board after each move; see the module docstring for the modes."""
+
+    def __init__(self, mode=RENDER_MODE, stream=None):
+        if mode not in MODES:
+            raise ValueError(f"Unknown render mode: {mode!r} (expected one of {', '.join(MODES)})")
+        self.stream = stream if stream is not None else sys.stdout
+        if mode == 'ansi' and not self.stream.isatty():  # Escape codes would only garble a file or pipe
+            mode = 'full'
+        self.mode = mode
+        self.shown = None  # ANSI mode: the cells on screen, one list of symbols per row
+
+    def render(self, board):
+        """Draw ``board``: the whole frame, only its changed cells, or nothing."""
+        if self.mode == 'quiet':
+            return
+        height = 2 * board.rows + 2
+        if self.mode == 'full' or height >= shutil.get_terminal_size().lines:  # ANSI mode needs room below the board
+            self._write(board_frame(board))
+            self.shown = None
+            return
+        grid = [list(board.grid[r]) for r in range(board.rows)]
+        if not self._can_update(grid):
+            # The board keeps the top of the screen; everything printed later scrolls below it
+            self._write(f"{CLEAR}{board_frame(board)}\x1b[{height + 1}r\x1b[{height + 1};1H")
+        else:
+            parts = [SAVE_CURSOR]
+            for r, row in enumerate(grid):
+                for c, symbol in enumerate(row):
+                    if symbol != self.shown[r][c]:
+                        line, column = cell_position(r, c)
+                        parts.append(f"\x1b[{line};{column}H{symbol}")
+            if len(parts) == 1:
+                return  # Nothing changed
+            parts.append(RESTORE_CURSOR)
+            self._write(''.join(parts))
+        self.shown = grid
+
+    def _can_update(self, grid):
+        """True if the screen holds a board of the same size whose stones are all still there."""
+        shown = self.shown
+        if shown is None or len(shown) != len(grid) or len(shown[0]) != len(grid[0]):
+            return False
+        return all(old == ' ' or old == new for old_row, new_row in zip(shown, grid)
+                   for old, new in zip(old_row, new_row))  # A new game starts over
+
+    def close(self):
+        """Give the whole screen back to scrolling text (ANSI mode) and forget what is shown."""
+        if self.mode == 'ansi' and self.shown is not None:
+            self._write(RESET_SCROLL + BOTTOM)  # Below the last message, not over the board
+        self.shown = None
+
+    def _write(self, text):
+        self.stream.write(text)
+        self.stream.flush()  # One write per frame, not one per line
@@ -0,0 +1,694 @@
+"""Alpha-beta search for the Tic-Tac-Toe AI.
+
+``alphabeta_move`` returns the same move (and move value) as the plain
+``minimax`` in tictac.py, milestone.py and ss.py, but prunes branches that
+cannot change the result.  Moves are tried in order of killer moves, history
+score and line potential, so good moves come first and cut off the rest.
+With a TranspositionTable from transposition.py, positions reached by other
+move orders (or by rotating/mirroring the board) are looked up instead of
+searched again.  Passing ``locality`` searches only the empty cells within
+that radius of a stone (see ``BitBoard.enable_locality``), which cuts the
+branching factor sharply but can miss the minimax move, so ``alphabeta_move``
+leaves it off unless asked.
+
+``iterative_move`` is the anytime mode: it deepens one ply at a time under a
+time and/or node budget and returns the deepest completed result.  It turns
+locality on by itself (LOCALITY_RADIUS on boards of LOCALITY_MIN_CELLS cells
+or more), since budgeted searches on big boards care more about depth than
+about matching minimax.
+``choose_move`` is the shared body of ``get_minimax_ai_move`` in the three
+game scripts: it picks the tablebase, a proof file or one of the searches for them.
+
+Leaves that are not game over are scored by an evaluator.  The default
+``TerminalEvaluator`` scores them 0 like ``evaluate``; ``HeuristicEvaluator``
+scores open lines from counts the BitBoard keeps up to date on every move and
+prefers faster wins and slower losses; ``learned.LearnedEvaluator`` weighs the
+same counts with weights fitted to self-play games and scores all the leaf
+children of a node in one vectorized call (``score_children``).
+"""
+
+import cProfile
+import pstats
+import time
+import tracemalloc
+from contextlib import contextmanager
+
+from bitboard import BitBoard
+from dfpn import proof_move
+from tablebase import tablebase_move
+from threats import THREAT_TIME_MS, threat_move
+from transposition import EXACT, LOWER, UPPER, TranspositionTable
+
+WIN_SCORE = 10  # Same scale as evaluate(): +10 AI win, -10 player win, 0 otherwise
+INF = float('inf')
+KILLER_BONUS = 1 << 20  # Killer moves are tried before anything else
+PV_BONUS = 1 << 21  # ...except the previous iteration's principal variation
+CHECK_INTERVAL = 512  # Most nodes between clock checks in a budgeted search
+CHECK_SECONDS = 0.001  # Checks come about this often, however slow each node is
+MATE_SCORE = 1 << 30  # Heuristic evaluator: a win at ply p scores MATE_SCORE - p
+LOCALITY_RADIUS = 2  # Moves searched on big boards are at most this far from a stone
+LOCALITY_MIN_CELLS = 36  # Boards with at least this many cells use the locality restriction when it is automatic
+LOCALITY_SALT = 0x2545F4914F6CDD1D  # Times the radius, mixed into transposition keys
+MATE_WINDOW = 1 << 10  # Scores within this of MATE_SCORE are forced wins, not heuristics
+ALGORITHMS = ('minimax', 'alphabeta', 'parallel', 'iterative', 'mcts')  # Accepted by choose_move
+
+
+class SearchTimeout(Exception):
+    """Raised inside a budgeted search when its time or node budget runs out."""
+
+
+class SearchStats:
+    """Counters for one search; pass one in to see where the time went.
+
+    Set ``profile`` to run the search under cProfile (``profile_stats`` then
+    holds a pstats.Stats) and ``trace_memory`` to record its peak allocation
+    with tracemalloc.  Both are off by default and cost nothing when off.
+    """
+
+    def __init__(self, count_baseline=False, profile=False, trace_memory=False):
+        self.nodes = 0  # Positions visited (moves made) by the search
+        self.nodes_by_depth = [0]  # Entry d counts nodes d moves below the root (root moves are depth 1)
+        self.terminal_hits = 0  # Nodes that ended the game (a win or a full board)
+        self.cutoffs = 0  # Beta cutoffs
+        self.cache_hits = 0  # Positions answered by the transposition table
+        self.completed_depth = 0  # Deepest finished iteration of an iterative search
+        self.elapsed = 0.0  # Seconds spent choosing the move
+        self.pv = []  # Principal variation: the expected line of (row, col) moves, AI move first
+        self.method = None  # What chose the move: 'minimax', 'alphabeta', 'iterative', 'parallel' or 'tablebase'
+        self.count_baseline = count_baseline  # Also count what plain minimax would visit
+        self.baseline_nodes = None  # Filled in when count_baseline is set
+        self.profile = profile
+        self.profile_stats = None  # pstats.Stats of the last search when profile is set
+        self.trace_memory = trace_memory
+        self.peak_memory = None  # Peak bytes allocated during the last search when trace_memory is set
+
+    @property
+    def nodes_saved(self):
+        """Nodes plain minimax would visit that the search skipped (None if not counted)."""
+        if self.baseline_nodes is None:
+            return None
+        return self.baseline_nodes - self.nodes
+
+    @property
+    def max_depth(self):
+        """Deepest level below the root the search visited."""
+        for depth in range(len(self.nodes_by_depth) - 1, 0, -1):
+            if self.nodes_by_depth[depth]:
+                return depth
+        return 0
+
+    @property
+    def nodes_per_second(self):
+        return self.nodes / self.elapsed if self.elapsed else 0.0
+
+    def reserve_depth(self, depth):
+        """Make room in nodes_by_depth for searches ``depth`` moves deep."""
+        if len(self.nodes_by_depth) <= depth:
+            self.nodes_by_depth.extend([0] * (depth + 1 - len(self.nodes_by_depth)))
+
+    def merge(self, counters):
+        """Add counters returned by ``counters()`` of another search (e.g. a worker process)."""
+        nodes_by_depth, terminal_hits, cutoffs, cache_hits = counters
+        self.reserve_depth(len(nodes_by_depth) - 1)
+        for depth, nodes in enumerate(nodes_by_depth):
+            self.nodes_by_depth[depth] += nodes
+        self.nodes += sum(nodes_by_depth)
+        self.terminal_hits += terminal_hits
+        self.cutoffs += cutoffs
+        self.cache_hits += cache_hits
+
+    def counters(self):
+        """Picklable snapshot of the node counters, for ``merge``."""
+        return list(self.nodes_by_depth), self.terminal_hits, self.cutoffs, self.cache_hits
+
+    def log_line(self, move):
+        """One ``key=value`` line describing the search that chose ``move``."""
+        fields = [
+            ('move', f"{move[0]},{move[1]}" if move else '-'),
+            ('method', self.method or '-'),
+            ('depth', self.completed_depth or self.max_depth),
+            ('seldepth', self.max_depth),
+            ('nodes', self.nodes),
+            ('nps', int(self.nodes_per_second)),
+            ('terminal', self.terminal_hits),
+            ('cutoffs', self.cutoffs),
+            ('cache_hits', self.cache_hits),
+            ('elapsed_ms', f"{self.elapsed * 1000:.1f}"),
+            ('pv', ' '.join(f"{r},{c}" for r, c in self.pv) or '-'),
+        ]
+        if self.peak_memory is not None:
+            fields.append(('peak_kb', self.peak_memory // 1024))
+        return 'search ' + ' '.join(f'{key}="{value}"' if ' ' in str(value) else f"{key}={value}"
+                                    for key, value in fields)
+
+
+@contextmanager
+def measure(stats, method):
+    """Time the search run inside the block into ``stats`` (a no-op when stats is None).
+
+    Also runs the profilers that ``stats.profile`` / ``stats.trace_memory`` ask for.
+    """
+    if stats is None:
+        yield
+        return
+    stats.method = method
+    profiler = cProfile.Profile() if stats.profile else None
+    tracing = stats.trace_memory and not tracemalloc.is_tracing()
+    if tracing:
+        tracemalloc.start()
+    elif stats.trace_memory:
+        tracemalloc.reset_peak()
+    if profiler is not None:
+        profiler.enable()
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        stats.elapsed = time.perf_counter() - start
+        if profiler is not None:
+            profiler.disable()
+            stats.profile_stats = pstats.Stats(profiler)
+        if stats.trace_memory:
+            stats.peak_memory = tracemalloc.get_traced_memory()[1]
+            if tracing:
+                tracemalloc.stop()
+
+
+class TerminalEvaluator:
+    """Scores like ``evaluate``: a win is WIN_SCORE, anything unfinished is 0."""
+
+    name = 'terminal'
+    mate_threshold = WIN_SCORE  # Scores this large are forced wins or losses
+    key_salt = 0  # Mixed into transposition keys so evaluators never share entries
+    batched = False  # True if score_children is faster than scoring the children one by one
+
+    def attach(self, board):
+        """Prepare ``board`` for this evaluator (nothing to track)."""
+
+    def win(self, ply):
+        """Value of a win completed on move ``ply`` of the search (ply 1 = the root move)."""
+        return WIN_SCORE
+
+    def leaf(self, board, mover, waiting):
+        """Value for ``mover``, who just moved, of an unfinished position at the depth limit."""
+        return 0
+
+    def score_children(self, board, cells, mover, waiting, ply, stats=None):
+        """Values for ``mover`` of playing each of ``cells`` (cell indices), the children being leaves at ``ply``.
+
+        Wins and full boards are scored as the searches score them; ``stats``
+        counts the children as visited nodes.
+        """
+        cols = board.cols
+        values = []
+        for idx in cells:
+            board.make_move(idx // cols, idx % cols, mover)
+            if stats is not None:
+                stats.nodes += 1
+                stats.nodes_by_depth[ply] += 1
+            if board.last_move_won() or board.is_full():
+                value = self.win(ply) if board.last_move_won() else 0
+                if stats is not None:
+                    stats.terminal_hits += 1
+            else:
+                value = self.leaf(board, mover, waiting)
+            board.undo_move()
+            values.append(value)
+        return values
+
+    def to_table(self, value, ply):
+        """Value as stored in the transposition table for a node at ``ply``."""
+        return value
+
+    def from_table(self, value, ply):
+        """Inverse of ``to_table``."""
+        return value
+
+
+class HeuristicEvaluator(TerminalEvaluator):
+    """Scores open lines: k stones in a window the opponent has not touched are worth 4**k.
+
+    An opponent line one stone short of n_to_win (they win on their move) or our
+    own such lines finishing on two different cells (only one can be blocked)
+    count almost as much as a forced result.
+    Wins score MATE_SCORE minus the ply they happen on, so quicker wins and
+    slower losses are preferred.
+    """
+
+    name = 'heuristic'
+    mate_threshold = MATE_SCORE - MATE_WINDOW
+    key_salt = 0x5DEECE66D9E3779B
+
+    def __init__(self, weights=None):
+        self.weights = weights  # Value of an open line per stone count; default 4**k
+        self._weights = {}  # n_to_win -> (weights, threat score)
+
+    def _weights_for(self, n_to_win):
+        cached = self._weights.get(n_to_win)
+        if cached is None:
+            weights = self.weights or [0] + [4 ** k for k in range(1, n_to_win)]
+            cached = self._weights[n_to_win] = (list(weights), 4 ** (n_to_win + 2))
+        return cached
+
+    def attach(self, board):
+        board.enable_line_counts()
+
+    def win(self, ply):
+        return MATE_SCORE - ply
+
+    def leaf(self, board, mover, waiting):
+        n = board.n_to_win
+        weights, threat = self._weights_for(n)
+        mine = board.open_line_counts(mover)
+        theirs = board.open_line_counts(waiting)
+        if n > 1:
+            if theirs[n - 1]:  # They complete a line on their move
+                return -threat
+            if mine[n - 1] >= 2 and self._double_threat(board, mover):  # They can only block one
+                return threat
+        score = 0
+        for k in range(1, n):
+            score += weights[k] * (mine[k] - theirs[k])
+        return score
+
+    def _double_threat(self, board, mover):
+        """True if ``mover``'s lines one stone short of a win finish on at least two different cells."""
+        n = board.n_to_win
+        own = board.bits[mover]
+        counts = board.window_counts[mover]
+        stones = board.window_stones
+        masks = board.lines.masks
+        finish = None  # Completion cell of the first such line
+        for w, total in enumerate(stones):
+            if total == n - 1 and counts[w] == total:
+                cell = masks[w] & ~own
+                if finish is None:
+                    finish = cell
+                elif cell != finish:
+                    return True
+        return False
+
+    def to_table(self, value, ply):
+        # Forced results are stored as distance from the node, not from the root
+        if value >= self.mate_threshold:
+            return value + ply
+        if value <= -self.mate_threshold:
+            return value - ply
+        return value
+
+    def from_table(self, value, ply):
+        if value >= self.mate_threshold:
+            return value - ply
+        if value <= -self.mate_threshold:
+            return value + ply
+        return value
+
+
+EVALUATORS = {'terminal': TerminalEvaluator, 'heuristic': HeuristicEvaluator}
+
+
+def make_evaluator(evaluator=None):
+    """Return an evaluator from an instance, a name in EVALUATORS or 'learned', or None for the terminal one."""
+    if evaluator is None:
+        return TerminalEvaluator()
+    if isinstance(evaluator, str):
+        if evaluator == 'learned':  # Needs NumPy and a weights file, so only loaded when asked for
+            from learned import LearnedEvaluator
+            return LearnedEvaluator()
+        if evaluator not in EVALUATORS:
+            raise ValueError(f"Unknown evaluator: {evaluator}")
+        return EVALUATORS[evaluator]()
+    return evaluator
+
+
+def count_minimax_nodes(board, depth, to_move, opponent):
+    """Count the positions plain minimax visits from ``board`` with ``to_move`` to play."""
+    empty = board.lines.full & ~board.occupied
+    nodes = 0
+    while empty:
+        low = empty & -empty
+        idx = low.bit_length() - 1
+        empty ^= low
+        board.make_move(idx // board.cols, idx % board.cols, to_move)
+        nodes += 1
+        if not board.last_move_won() and depth > 1 and not board.is_full():
+            nodes += count_minimax_nodes(board, depth - 1, opponent, to_move)
+        board.undo_move()
+    return nodes
+
+
+class AlphaBetaSearch:
+    """Negamax alpha-beta over a BitBoard, with killer and history move ordering."""
+
+    def __init__(self, board, ai_symbol, player_symbol, stats=None, table=None, evaluator=None, locality=0):
+        self.board = board  # Working BitBoard; searched with make_move/undo_move
+        self.table = table  # Optional TranspositionTable shared between searches
+        if table is not None:
+            board.enable_hashing()
+        self.evaluator = make_evaluator(evaluator)
+        self.evaluator.attach(board)
+        if locality is None:  # Automatic: only big boards are sparse enough to gain from it
+            locality = LOCALITY_RADIUS if board.rows * board.cols >= LOCALITY_MIN_CELLS else 0
+        if locality:
+            board.enable_locality(locality)
+        # Searches that skip distant cells store different values, so they get their own keys
+        self.key_salt = self.evaluator.key_salt ^ locality * LOCALITY_SALT
+        self.ai_symbol = ai_symbol
+        self.player_symbol = player_symbol
+        self.stats = stats if stats is not None else SearchStats()
+        self.stats.reserve_depth(board.rows * board.cols)
+        self.nodes_by_depth = self.stats.nodes_by_depth
+        self.killers = {}  # ply -> up to two moves that caused a cutoff there
+        size = board.rows * board.cols
+        self.history = {ai_symbol: [0] * size, player_symbol: [0] * size}  # Cutoff credit per cell
+        self.pv_line = {}  # ply -> best line found from that ply in the current iteration
+        self.pv_moves = []  # Previous iteration's best line, tried first at each ply
+        self.deadline = None  # perf_counter() time at which a budgeted search stops
+        self.node_limit = None  # Node count at which a budgeted search stops
+        self.next_check = INF  # Node count of the next budget check
+        self.last_check = None  # (perf_counter(), nodes) at the previous budget check
+        self.cancel_event = None  # threading.Event that aborts a budgeted search when set
+
+    def set_budget(self, time_budget_ms=None, node_budget=None, cancel_event=None, start=None):
+        """Limit the search by wall time and/or nodes; exceeding either raises SearchTimeout.
+
+        The time budget runs from ``start`` (a perf_counter() value, default now).
+        Setting ``cancel_event`` (a threading.Event) from another thread stops it the same way.
+        """
+        self.cancel_event = cancel_event
+        if time_budget_ms is not None:
+            self.deadline = (time.perf_counter() if start is None else start) + time_budget_ms / 1000.0
+        if node_budget is not None:
+            self.node_limit = self.stats.nodes + node_budget
+        self.next_check = self.stats.nodes
+        self.check_budget()
+
+    def check_budget(self):
+        """Raise SearchTimeout if the budget is spent, else schedule the next check."""
+        nodes = self.stats.nodes
+        if self.node_limit is not None and nodes >= self.node_limit:
+            raise SearchTimeout()
+        now = time.perf_counter()
+        if self.deadline is not None and now >= self.deadline:
+            raise SearchTimeout()
+        if self.cancel_event is not None and self.cancel_event.is_set():
+            raise SearchTimeout()
+        interval = CHECK_INTERVAL
+        if self.last_check is not None:  # Fewer nodes per check where nodes are slow (big boards)
+            seconds = now - self.last_check[0]
+            if seconds > 0:
+                interval = max(1, min(CHECK_INTERVAL, int((nodes - self.last_check[1]) * CHECK_SECONDS / seconds)))
+        self.last_check = (now, nodes)
+        self.next_check = nodes + interval
+        if self.node_limit is not None:
+            self.next_check = min(self.next_check, self.node_limit)
+        elif self.deadline is None and self.cancel_event is None:
+            self.next_check = INF
+
+    def search_root(self, depth):
+        """Return (best_move, best_score) for the AI, or (None, None) if the board is full."""
+        board = self.board
+        cols = board.cols
+        best_idx = None
+        best_score = -INF
+        for idx in self.ordered_moves(0, self.ai_symbol, self.player_symbol):
+            # A window just below the best so far keeps ties exact, so the first
+            # best move in row-major order wins exactly as in plain minimax.
+            alpha = best_score - 1
+            score = self.child_score(idx, depth, alpha, INF, 0, self.ai_symbol, self.player_symbol)
+            if score > best_score or (score == best_score and idx < best_idx):
+                best_score = score
+                best_idx = idx
+                self.pv_line[0] = [idx] + self.pv_line[1]
+        if best_idx is None:
+            return None, None
+        return (best_idx // cols, best_idx % cols), best_score
+
+    def child_score(self, idx, depth, alpha, beta, ply, to_move, opponent):
+        """Make move ``idx`` for ``to_move`` and return its value from ``to_move``'s side."""
+        board = self.board
+        board.make_move(idx // board.cols, idx % board.cols, to_move)
+        stats = self.stats
+        stats.nodes += 1
+        self.nodes_by_depth[ply + 1] += 1
+        if stats.nodes >= self.next_check:
+            self.check_budget()  # May raise SearchTimeout; the working board is then discarded
+        self.pv_line[ply + 1] = []
+        if board.last_move_won():
+            stats.terminal_hits += 1
+            score = self.evaluator.win(ply + 1)
+        elif board.is_full():
+            stats.terminal_hits += 1
+            score = 0
+        elif depth <= 1:
+            score = self.evaluator.leaf(board, to_move, opponent)
+        else:
+            score = -self.negamax(depth - 1, -beta, -alpha, ply + 1, opponent, to_move)
+        board.undo_move()
+        return score
+
+    def negamax(self, depth, alpha, beta, ply, to_move, opponent):
+        """Fail-soft alpha-beta value of the current position for ``to_move``."""
+        self.pv_line[ply] = []
+        table = self.table
+        if table is not None:
+            board = self.board
+            # Searching deeper than the empty cells changes nothing, so clamp the
+            # depth and let complete results serve any later, deeper request.
+            depth = min(depth, (board.lines.full & ~board.occupied).bit_count())
+            key = board.canonical_hash() ^ board.zobrist.side_key(to_move) ^ self.key_salt
+            entry = table.lookup(key)
+            if entry is not None and entry[1] >= depth:
+                value = self.evaluator.from_table(entry[0], ply)
+                bound = entry[2]
+                if bound == EXACT or (bound == LOWER and value >= beta) or (bound == UPPER and value <= alpha):
+                    self.stats.cache_hits += 1
+                    return value
+            alpha_orig = alpha
+        best = -INF
+        moves = self.ordered_moves(ply, to_move, opponent)
+        scores = None
+        if depth <= 1 and self.evaluator.batched and moves:  # Every child is a leaf: score them in one call
+            scores = self.evaluator.score_children(self.board, moves, to_move, opponent, ply + 1, self.stats)
+            self.pv_line[ply + 1] = []
+            if self.stats.nodes >= self.next_check:
+                self.check_budget()
+        for i, idx in enumerate(moves):
+            if scores is not None:
+                score = scores[i]
+            else:
+                score = self.child_score(idx, depth, alpha, beta, ply, to_move, opponent)
+            if score > best:
+                best = score
+                if score > alpha:
+                    alpha = score
+                    self.pv_line[ply] = [idx] + self.pv_line[ply + 1]
+                    if alpha >= beta:
+                        self.record_cutoff(idx, depth, ply, to_move)
+                        break
+        if table is not None:
+            bound = UPPER if best <= alpha_orig else LOWER if best >= beta else EXACT
+            table.store(key, self.evaluator.to_table(best, ply), depth, bound)
+        return best
+
+    def record_cutoff(self, idx, depth, ply, to_move):
+        """Remember a move that refuted the opponent's last move."""
+        self.stats.cutoffs += 1
+        self.history[to_move][idx] += depth * depth
+        killers = self.killers.setdefault(ply, [])
+        if idx not in killers:
+            killers.insert(0, idx)
+            del killers[2:]
+
+    def ordered_moves(self, ply, to_move, opponent):
+        """Candidate cells (see BitBoard.move_mask), best first: PV move, killers, then history plus line potential."""
+        board = self.board
+        own = board.bits.get(to_move, 0)
+        opp = board.bits.get(opponent, 0)
+        cell_masks = board.lines.cell_masks
+        history = self.history[to_move]
+        killers = self.killers.get(ply, ())
+        pv_idx = self.pv_moves[ply] if ply < len(self.pv_moves) else None
+        scored = []
+        empty = board.move_mask()
+        while empty:
+            low = empty & -empty
+            idx = low.bit_length() - 1
+            empty ^= low
+            potential = 0
+            for mask in cell_masks[idx]:
+                if not mask & opp:
+                    potential += 1 + (mask & own).bit_count()  # Line we can still complete
+                elif not mask & own:
+                    potential += (mask & opp).bit_count()  # Line we would block
+            priority = history[idx] + potential
+            if idx in killers:
+                priority += KILLER_BONUS
+            if idx == pv_idx:
+                priority += PV_BONUS
+            scored.append((-priority, idx))
+        scored.sort()
+        return [idx for _, idx in scored]
+
+    def pv_cells(self, line):
+        """A line of cell indices as (row, col) pairs."""
+        return [(idx // self.board.cols, idx % self.board.cols) for idx in line]
+
+
+def alphabeta_move(board, ai_symbol='O', player_symbol='X', depth=9, stats=None, table=None, evaluator=None,
+                   locality=0):
+    """Best move for the AI by alpha-beta search; same choice as minimax at the same depth.
+
+    Pass the same TranspositionTable for every move of a game to reuse earlier
+    results.  Entries searched deeper than ``depth`` are reused as well, so with a
+    table a depth-limited search can see further than plain minimax.  Pass
+    evaluator='heuristic' to score unfinished leaves instead of calling them 0.
+    ``locality`` is the radius of the moves searched around the stones: 0 (the
+    default) searches every empty cell and keeps the minimax move, None picks a
+    radius from the board size, trading that guarantee for speed on big boards.
+    """
+    # Search a private copy so the caller's board is never left mid-search
+    work = board.copy() if isinstance(board, BitBoard) else BitBoard.from_board(board)
+    search = AlphaBetaSearch(work, ai_symbol, player_symbol, stats, table, evaluator, locality)
+    with measure(stats, 'alphabeta'):
+        move, _ = search.search_root(depth)
+    search.stats.pv = search.pv_cells(search.pv_line.get(0, []))
+    if search.stats.count_baseline:
+        search.stats.baseline_nodes = count_minimax_nodes(work, depth, ai_symbol, player_symbol)
+    return move
+
+
+def iterative_move(board, ai_symbol='O', player_symbol='X', time_budget_ms=None, node_budget=None,
+                   max_depth=None, stats=None, table=None, cancel_event=None, evaluator='heuristic', locality=None):
+    """Anytime alpha-beta: deepen one ply at a time until the budget runs out.
+
+    A move is ready before the first iteration starts, and the result of the
+    deepest fully completed iteration is returned.  Without a max_depth the
+    search stops on its own once it covers every remaining empty cell.
+    Setting ``cancel_event`` ends the search early in the same way.  Budgeted
+    searches rarely reach the end of the game, so leaves are scored by the
+    heuristic evaluator unless another one is given.  ``locality`` is as for
+    ``alphabeta_move`` but defaults to None (automatic).  The time budget covers everything from the call on,
+    setup included.
+    """
+    start = time.perf_counter()
+    work = board.copy() if isinstance(board, BitBoard) else BitBoard.from_board(board)
+    if table is None:
+        table = TranspositionTable()  # Iterations share results even for a one-off search
+    search = AlphaBetaSearch(work, ai_symbol, player_symbol, stats, table, evaluator, locality)
+    cols = work.cols
+    root_moves = search.ordered_moves(0, ai_symbol, player_symbol)
+    if not root_moves:
+        return None
+    best_move = (root_moves[0] // cols, root_moves[0] % cols)  # Best guess from move ordering alone
+    empty = (work.lines.full & ~work.occupied).bit_count()
+    limit = empty if max_depth is None else min(max_depth, empty)
+    with measure(stats, 'iterative'):
+        try:
+            search.set_budget(time_budget_ms, node_budget, cancel_event, start)
+            for depth in range(1, limit + 1):
+                move, score = search.search_root(depth)
+                best_move = move
+                search.stats.completed_depth = depth
+                search.pv_moves = search.pv_line[0]  # Try this line first in the next iteration
+                if abs(score) >= search.evaluator.mate_threshold:
+                    break  # A forced win or loss will not change with more depth
+        except SearchTimeout:
+            pass  # Keep the deepest completed iteration's move
+    search.stats.pv = search.pv_cells(search.pv_moves) or [best_move]
+    return best_move
+
+
+def choose_move(board, ai_symbol, player_symbol, depth, algorithm, minimax_move, stats=None, table=None,
+                time_budget_ms=None, node_budget=None, use_tablebase=True, cancel_event=None, evaluator=None,
+                tree=None, threats=None):
+    """Pick and run the search behind ``get_minimax_ai_move``; ``minimax_move`` is the script's plain minimax.
+
+    algorithm is one of ALGORITHMS; None means 'iterative' when a budget or
+    cancel_event is given and 'minimax' otherwise.  Options that the chosen
+    algorithm cannot honour raise ValueError instead of being ignored.
+    algorithm='alphabeta' uses the pruned search above, which picks the same move as
+    minimax (it searches every empty cell; see alphabeta_move's locality);
+    pass a SearchStats as stats to see how many nodes it saved, and the same
+    TranspositionTable as table on every move to reuse earlier searches.
+    algorithm='parallel' runs that search on a process pool (parallel.py); a
+    parallel.ParallelStats passed as stats reports its core utilization and load balance.
+    algorithm='iterative' deepens one ply at a time; with time_budget_ms and/or
+    node_budget, depth is ignored and the deepest search finished within the budget
+    decides the move; setting cancel_event (a threading.Event) from another thread
+    ends it early.  Unlike the fixed-depth searches it only searches near the
+    stones on big boards, so it may not pick minimax's move there.
+    If a tablebase file (see tablebase.py) or a proof file (see dfpn.py) settles the
+    position, its move is returned without searching; pass use_tablebase=False to
+    always search.
+    evaluator ('terminal', 'heuristic', 'learned' or an evaluator instance) scores positions where a
+    search stops before the game ends, plain minimax included; budgeted searches
+    default to 'heuristic'.
+    Whichever way the move is chosen, a SearchStats passed as stats records how
+    (nodes per depth, cutoffs, principal variation, time); see SearchStats.log_line.
+    algorithm='mcts' runs Monte Carlo Tree Search (mcts.py) for boards too large for
+    minimax (also near the stones only), with node_budget playouts and/or
+    time_budget_ms; pass the same mcts.MCTSTree as tree on every move to carry the
+    search over between moves.
+    threats runs the threat-space stage (threats.py) first on boards with
+    n_to_win >= 4: forced wins by continuous fours, and blocks of the opponent's,
+    are played at once, within THREAT_TIME_MS (or a quarter of time_budget_ms,
+    taken out of the main search's budget).  None turns it on for 'iterative'
+    and 'mcts' only, so the fixed-depth searches still pick minimax's move.
+    """
+    from mcts import mcts_move  # Both modules import this one, so they are loaded on first use
+    from parallel import parallel_move
+    budgeted = time_budget_ms is not None or node_budget is not None
+    if algorithm is None:  # Budgets and cancellation need the anytime search
+        algorithm = 'iterative' if budgeted or cancel_event is not None else 'minimax'
+    if algorithm not in ALGORITHMS:  # Reject typos instead of silently using minimax
+        raise ValueError(f"Unknown search algorithm: {algorithm!r}")
+    if budgeted and algorithm not in ('iterative', 'mcts'):
+        raise ValueError(f"algorithm={algorithm!r} searches to a fixed depth; budgets need 'iterative' or 'mcts'")
+    if cancel_event is not None and algorithm != 'iterative':
+        raise ValueError("cancel_event only stops algorithm='iterative'")
+    if tree is not None and algorithm != 'mcts':
+        raise ValueError("tree is only used by algorithm='mcts'")
+    if use_tablebase:  # Solved positions need no search
+        with measure(stats, 'tablebase'):
+            move = tablebase_move(board, ai_symbol, player_symbol, stats=stats)
+        if move is not None:
+            return move
+        with measure(stats, 'proof'):
+            move = proof_move(board, ai_symbol, player_symbol, stats=stats)
+        if move is not None:
+            return move
+    if threats is None:
+        threats = algorithm in ('iterative', 'mcts')
+    if threats and board.n_to_win >= 4:  # Forcing lines run far deeper than the main search sees
+        start = time.perf_counter()
+        cap = THREAT_TIME_MS if time_budget_ms is None else min(THREAT_TIME_MS, time_budget_ms / 4)
+        with measure(stats, 'threats'):
+            move = threat_move(board, ai_symbol, player_symbol, cap, stats)
+        if move is not None:
+            return move
+        if time_budget_ms is not None:  # The whole call stays within the budget
+            time_budget_ms = max(1, time_budget_ms - (time.perf_counter() - start) * 1000)
+    if algorithm == 'mcts':  # Sampling search for boards too big for minimax
+        with measure(stats, 'mcts'):
+            return mcts_move(board, ai_symbol, player_symbol, node_budget, time_budget_ms, tree, stats=stats)
+    if algorithm == 'iterative':  # Anytime search, usually with a latency cap
+        return iterative_move(board, ai_symbol, player_symbol, time_budget_ms, node_budget,
+                              None if budgeted else depth, stats=stats, table=table, cancel_event=cancel_event,
+                              evaluator=evaluator or 'heuristic')
+    if algorithm == 'alphabeta':  # Same answer as minimax (every cell searched), far fewer positions
+        return alphabeta_move(board, ai_symbol, player_symbol, depth, stats, table, evaluator)
+    if algorithm == 'parallel':  # Same move as alphabeta and minimax, using every core
+        with measure(stats, 'parallel'):
+            return parallel_move(board, ai_symbol, player_symbol, depth, stats=stats, evaluator=evaluator)
+    with measure(stats, 'minimax'):
+        if evaluator is None:
+            move = minimax_move(board, ai_symbol, player_symbol, depth, stats=stats)
+        else:  # Evaluators read the line counts only a BitBoard keeps
+            work = board.copy() if isinstance(board, BitBoard) else BitBoard.from_board(board)
+            evaluator = make_evaluator(evaluator)
+            evaluator.attach(work)
+            move = minimax_move(work, ai_symbol, player_symbol, depth, evaluator, stats)
+    if stats is not None:
+        stats.pv = [move] if move else []  # minimax keeps no deeper line
+    return move
@@ -0,0 +1,310 @@
+"""Headless self-play: many games between two policies, no input() or print().
+
+Games are played in batches held by ``npboard.BoardBatch``: every still
+running game of a batch gets its move in the same step, so cheap policies
+such as ``RandomPolicy`` pick moves and check wins for the whole batch with a
+few NumPy operations.  Search policies go through the batch one board at a
+time and remember the moves they already worked out.
+
+``simulate`` spreads batches over a process pool and returns a
+``SelfPlayResult`` with win/draw/loss rates, confidence intervals and games
+per second.  With ``record`` every game is appended to a gamelog.py record
+file, policy A playing as 'A' and policy B as 'B'.  From the command line::
+
+    python selfplay.py random minimax:9 --board 3 3 3 --games 1000000 --record games.ttr
+"""
+
+import argparse
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from statistics import NormalDist
+
+from gamelog import GameRecordWriter
+from mcts import mcts_move
+from npboard import FIRST, SECOND, BoardBatch, np, require_numpy
+from search import alphabeta_move
+
+SYMBOLS = {FIRST: 'X', SECOND: 'O'}  # How batch players appear on a BitBoard
+
+
+class Policy:
+    """Picks moves for a batch of games; subclasses override ``select`` or ``move``."""
+
+    name = 'policy'
+
+    def select(self, batch, games, player, rng):
+        """Cell index to play in each of ``games`` for ``player`` (FIRST or SECOND)."""
+        symbol = SYMBOLS[player]
+        opponent = SYMBOLS[SECOND if player == FIRST else FIRST]
+        choices = np.empty(len(games), dtype=np.intp)
+        for i, game in enumerate(games):
+            row, col = self.move(batch.to_bitboard(game), symbol, opponent)
+            choices[i] = row * batch.cols + col
+        return choices
+
+    def move(self, board, symbol, opponent):
+        """(row, col) for ``symbol`` on one BitBoard."""
+        raise NotImplementedError
+
+    def __str__(self):
+        return self.name
+
+
+class RandomPolicy(Policy):
+    """Uniformly random empty cell, chosen for the whole batch at once."""
+
+    name = 'random'
+
+    def select(self, batch, games, player, rng):
+        legal = batch.legal(games)
+        keys = rng.random(legal.shape)
+        keys[~legal] = -1.0  # Occupied cells never win the argmax
+        return keys.argmax(axis=1)
+
+
+class SearchPolicy(Policy):
+    """Alpha-beta search to a fixed depth (same move as minimax with the terminal evaluator).
+
+    With ``epsilon`` > 0 that share of moves is played at random instead, so
+    matches between deterministic players are not all the same game.
+    """
+
+    def __init__(self, depth=9, evaluator=None, epsilon=0.0, cache_size=1 << 20):
+        self.depth = depth
+        self.evaluator = evaluator  # As for search.alphabeta_move
+        self.epsilon = epsilon
+        self.cache_size = cache_size  # Positions whose move is remembered
+        self.cache = {}  # (stones, symbol) -> cell index
+        self.name = f"{evaluator or 'minimax'}:{depth}" + (f"@{epsilon:g}" if epsilon else '')
+
+    def __getstate__(self):
+        state = dict(self.__dict__)
+        state['cache'] = {}  # Worker processes build their own
+        return state
+
+    def select(self, batch, games, player, rng):
+        choices = super().select(batch, games, player, rng)
+        if self.epsilon:
+            explore = rng.random(len(games)) < self.epsilon
+            if explore.any():
+                choices[explore] = RandomPolicy().select(batch, games[explore], player, rng)
+        return choices
+
+    def move(self, board, symbol, opponent):
+        key = (tuple(sorted(board.bits.items())), symbol)
+        idx = self.cache.get(key)
+        if idx is None:
+            row, col = alphabeta_move(board, symbol, opponent, self.depth, evaluator=self.evaluator)
+            idx = row * board.cols + col
+            if len(self.cache) < self.cache_size:
+                self.cache[key] = idx
+        return divmod(idx, board.cols)
+
+
+class MCTSPolicy(Policy):
+    """Monte Carlo Tree Search with a fixed number of playouts per move."""
+
+    def __init__(self, playouts=1000):
+        self.playouts = playouts
+        self.name = f"mcts:{playouts}"
+        self.rng = None  # Batch generator, so seeded runs repeat exactly
+
+    def select(self, batch, games, player, rng):
+        self.rng = rng
+        return super().select(batch, games, player, rng)
+
+    def move(self, board, symbol, opponent):
+        seed = int(self.rng.integers(1 << 32)) if self.rng is not None else None
+        return mcts_move(board, symbol, opponent, self.playouts, seed=seed)
+
+
+class FunctionPolicy(Policy):
+    """Wraps any ``func(board, symbol, opponent) -> (row, col)``, e.g. get_minimax_ai_move.
+
+    ``func`` must be a module-level function so it can be sent to worker processes.
+    """
+
+    def __init__(self, func, name=None):
+        self.func = func
+        self.name = name or func.__name__
+
+    def move(self, board, symbol, opponent):
+        return self.func(board, symbol, opponent)
+
+
+def make_policy(spec):
+    """Policy from an instance or a spec: 'random', 'minimax[:depth]', 'heuristic[:depth]', 'learned[:depth]'
+    or 'mcts[:playouts]'.
+
+    Search specs may end in '@epsilon' for a share of random moves, e.g. 'minimax:9@0.1'.
+    """
+    if isinstance(spec, Policy):
+        return spec
+    name, _, epsilon = spec.partition('@')
+    name, _, depth = name.partition(':')
+    if name == 'random':
+        return RandomPolicy()
+    if name == 'mcts':
+        return MCTSPolicy(int(depth) if depth else 1000)
+    if name in ('minimax', 'heuristic', 'learned'):
+        return SearchPolicy(int(depth) if depth else 9, None if name == 'minimax' else name,
+                            float(epsilon) if epsilon else 0.0)
+    raise ValueError(f"Unknown policy: {spec!r}")
+
+
+def play_games(policy_a, policy_b, count, rows=3, cols=3, n_to_win=None, rng=None, a_first=True, records=None):
+    """Play ``count`` games of policy_a against policy_b as one batch.
+
+    Returns (a wins, draws, b wins).  Pass a list as records to have the
+    batch's game records (see gamelog.py) appended to it as one bytes object.
+    """
+    rng = rng if rng is not None else np.random.default_rng()
+    batch = BoardBatch(count, rows, cols, n_to_win)
+    policies = {FIRST: policy_a, SECOND: policy_b} if a_first else {FIRST: policy_b, SECOND: policy_a}
+    player = FIRST
+    games = batch.active()
+    while len(games):
+        moves = np.asarray(policies[player].select(batch, games, player, rng), dtype=np.intp)
+        batch.play(games, moves, player)
+        player = SECOND if player == FIRST else FIRST
+        games = batch.active()
+    if records is not None:
+        records.append(batch.records(('A', 'B') if a_first else ('B', 'A')))
+    first_wins = int((batch.winner == FIRST).sum())
+    second_wins = int((batch.winner == SECOND).sum())
+    draws = count - first_wins - second_wins
+    return (first_wins, draws, second_wins) if a_first else (second_wins, draws, first_wins)
+
+
+def _play_task(policy_a, policy_b, count, shape, seed, swap_sides, record=False):
+    """Pool task: one batch, half of it with policy_b moving first when swap_sides is set.
+
+    Returns (a wins, draws, b wins) and the batch's game records (b'' unless record is set).
+    """
+    rng = np.random.default_rng(seed)
+    rows, cols, n_to_win = shape
+    records = [] if record else None
+    if not swap_sides:
+        outcome = play_games(policy_a, policy_b, count, rows, cols, n_to_win, rng, records=records)
+        return outcome, b''.join(records or [])
+    half = count // 2
+    first = (play_games(policy_a, policy_b, count - half, rows, cols, n_to_win, rng, records=records)
+             if count - half else (0, 0, 0))
+    second = (play_games(policy_a, policy_b, half, rows, cols, n_to_win, rng, a_first=False, records=records)
+              if half else (0, 0, 0))
+    return tuple(x + y for x, y in zip(first, second)), b''.join(records or [])
+
+
+class SelfPlayResult:
+    """Outcome counts of a match, seen from policy A's side."""
+
+    def __init__(self, policy_a, policy_b, shape):
+        self.policy_a = str(policy_a)
+        self.policy_b = str(policy_b)
+        self.shape = shape  # (rows, cols, n_to_win)
+        self.wins = 0
+        self.draws = 0
+        self.losses = 0
+        self.elapsed = 0.0  # Wall-clock seconds
+
+    @property
+    def games(self):
+        return self.wins + self.draws + self.losses
+
+    @property
+    def games_per_second(self):
+        return self.games / self.elapsed if self.elapsed else 0.0
+
+    def rate(self, count):
+        """Share of games, e.g. ``result.rate(result.wins)``."""
+        return count / self.games if self.games else 0.0
+
+    def confidence_interval(self, count, confidence=0.95):
+        """Wilson score interval (low, high) for the share ``count / games``."""
+        n = self.games
+        if not n:
+            return 0.0, 1.0
+        z = NormalDist().inv_cdf(0.5 + confidence / 2)
+        p = count / n
+        centre = (p + z * z / (2 * n)) / (1 + z * z / n)
+        spread = z * ((p * (1 - p) / n + z * z / (4 * n * n)) ** 0.5) / (1 + z * z / n)
+        return max(0.0, centre - spread), min(1.0, centre + spread)
+
+    def __str__(self):
+        rows, cols, n_to_win = self.shape
+        lines = [f"{self.policy_a} vs {self.policy_b} on {rows}x{cols} ({n_to_win} in a row): "
+                 f"{self.games} games in {self.elapsed:.2f}s ({self.games_per_second:.0f} games/s)"]
+        for label, count in (('win', self.wins), ('draw', self.draws), ('loss', self.losses)):
+            low, high = self.confidence_interval(count)
+            lines.append(f"  {label:<5}{self.rate(count):8.2%}  95% CI [{low:.2%}, {high:.2%}]")
+        return '\n'.join(lines)
+
+
+def simulate(policy_a, policy_b, games=10000, rows=3, cols=3, n_to_win=None, batch_size=4096, workers=None,
+             seed=None, swap_sides=True, record=None):
+    """Play ``games`` games between two policies and return a SelfPlayResult for policy_a.
+
+    Policies are Policy instances or make_policy specs.  Games are split into
+    batches of ``batch_size`` and shared out over ``workers`` processes
+    (default: one per CPU; 1 plays everything in this process).  With
+    swap_sides each policy moves first in half of the games.  A fixed seed
+    gives the same results on every run.  ``record`` names a gamelog.py file
+    that every game is appended to as its batch finishes.
+    """
+    require_numpy()
+    policy_a, policy_b = make_policy(policy_a), make_policy(policy_b)
+    n_to_win = min(3, rows, cols) if n_to_win is None else n_to_win
+    shape = (rows, cols, n_to_win)
+    result = SelfPlayResult(policy_a, policy_b, shape)
+    sizes = [batch_size] * (games // batch_size) + ([games % batch_size] if games % batch_size else [])
+    seeds = np.random.SeedSequence(seed).spawn(len(sizes))  # Independent streams per batch
+    workers = min(workers or os.cpu_count() or 1, max(len(sizes), 1))
+    writer = GameRecordWriter(record) if record else None
+    start = time.perf_counter()
+
+    def add(outcome):
+        (wins, draws, losses), records = outcome
+        result.wins += wins
+        result.draws += draws
+        result.losses += losses
+        if writer is not None:
+            writer.write(records)  # Written per batch, so memory stays bounded however many games are played
+
+    try:
+        if workers == 1:
+            for size, s in zip(sizes, seeds):
+                add(_play_task(policy_a, policy_b, size, shape, s, swap_sides, writer is not None))
+        else:
+            with ProcessPoolExecutor(max_workers=workers) as pool:
+                futures = [pool.submit(_play_task, policy_a, policy_b, size, shape, s, swap_sides, writer is not None)
+                           for size, s in zip(sizes, seeds)]
+                for future in as_completed(futures):
+                    add(future.result())
+    finally:
+        if writer is not None:
+            writer.close()
+    result.elapsed = time.perf_counter() - start
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Play headless games between two AI policies.")
+    parser.add_argument('policy_a', help="'random', 'mcts[:playouts]', or 'minimax[:depth]' / 'heuristic[:depth]' "
+                                            "/ 'learned[:depth]' with an optional '@epsilon'")
+    parser.add_argument('policy_b')
+    parser.add_argument('--board', nargs=3, type=int, default=(3, 3, 3), metavar=('ROWS', 'COLS', 'N_TO_WIN'))
+    parser.add_argument('--games', type=int, default=10000)
+    parser.add_argument('--batch-size', type=int, default=4096)
+    parser.add_argument('--workers', type=int, default=None, help="processes (default: one per CPU)")
+    parser.add_argument('--seed', type=int, default=None)
+    parser.add_argument('--no-swap', action='store_true', help="policy_a always moves first")
+    parser.add_argument('--record', metavar='FILE', help="append every game to this game record file")
+    args = parser.parse_args()
+    rows, cols, n_to_win = args.board
+    print(simulate(args.policy_a, args.policy_b, args.games, rows, cols, n_to_win, args.batch_size, args.workers,
+                   args.seed, not args.no_swap, args.record))
+
+
+if __name__ == "__main__":
+    main()
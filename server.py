@@ -0,0 +1,410 @@
+"""asyncio game server: many concurrent games over line-delimited JSON.
+
+Clients connect over TCP (``--port``) or a Unix socket (``--unix``) and send
+one JSON object per line; every request gets exactly one JSON line back::
+
+    {"op": "new", "rows": 3, "cols": 3, "n_to_win": 3, "ai_first": false}
+    -> {"ok": true, "session": "5f2c...", "board": ["   ", "   ", "   "], "status": "playing", ...}
+    {"op": "move", "session": "5f2c...", "row": 1, "col": 1}
+    -> {"ok": true, "ai_move": [0, 0], "board": [...], "status": "playing"}
+    {"op": "state", "session": ...}   {"op": "close", "session": ...}   {"op": "stats"}
+
+A request may carry an "id", which is echoed in the reply.  AI moves run on a
+bounded process pool.  When more AI moves are waiting than ``max_queue``
+the server answers "busy" instead of queueing more, and each connection is
+served one request at a time, so a client that sends faster than the server
+answers is slowed down by TCP itself.  Idle connections and sessions time
+out.  ``{"op": "stats"}`` reports throughput and latency counters.
+SIGTERM or Ctrl-C stops the server together with its AI worker processes.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import secrets
+import signal
+import sys
+import time
+import traceback
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from bitboard import BitBoard
+
+MAX_BOARD_CELLS = 400  # Largest board a client may ask for (20x20)
+LATENCY_SAMPLES = 10000  # Recent move latencies kept for the percentiles
+MOVE_CACHE_SIZE = 100000  # AI moves each worker process remembers
+LISTEN_BACKLOG = 1024  # Connections the OS queues before accept()
+
+_move_cache = {}  # Per worker: (shape, stones, ai, algorithm) -> move, so common positions skip the search
+
+
+def _ai_move(shape, bits, ai_symbol, player_symbol, time_budget_ms, algorithm):
+    """Pool task: the AI's reply for one position, from a tablebase, a proof file or a budgeted search."""
+    from dfpn import proof_move
+    from mcts import mcts_move  # Imported in the worker, where the search runs
+    from search import iterative_move
+    from tablebase import tablebase_move
+    key = (shape, tuple(sorted(bits.items())), ai_symbol, algorithm)
+    move = _move_cache.get(key)
+    if move is not None:
+        return move
+    rows, cols, n_to_win = shape
+    board = BitBoard(rows, cols, n_to_win)
+    for symbol, mask in bits.items():
+        board.bits[symbol] = mask
+        board.occupied |= mask
+    move = tablebase_move(board, ai_symbol, player_symbol)
+    if move is None:
+        move = proof_move(board, ai_symbol, player_symbol)
+    if move is None and algorithm == 'mcts':
+        move = mcts_move(board, ai_symbol, player_symbol, time_budget_ms=time_budget_ms)
+    elif move is None:
+        move = iterative_move(board, ai_symbol, player_symbol, time_budget_ms)
+    if len(_move_cache) < MOVE_CACHE_SIZE:
+        _move_cache[key] = move
+    return move
+
+
+class RequestError(Exception):
+    """A request the server refuses; the message is sent back to the client."""
+
+
+class Session:
+    """One game between a client and the AI."""
+
+    def __init__(self, session_id, board, player_symbol, ai_symbol, algorithm):
+        self.id = session_id
+        self.board = board
+        self.player_symbol = player_symbol
+        self.ai_symbol = ai_symbol
+        self.algorithm = algorithm
+        self.status = 'playing'  # 'playing', 'win', 'loss' or 'draw' from the client's side
+        self.lock = asyncio.Lock()  # One move at a time, even from several connections
+        self.last_used = time.monotonic()
+
+    def snapshot(self):
+        """The session's state as sent to clients."""
+        return {
+            'session': self.id,
+            'board': [''.join(row) for row in self.board.grid],
+            'you': self.player_symbol,
+            'status': self.status,
+        }
+
+    def update_status(self, symbol):
+        """Record the result if ``symbol``'s last move ended the game."""
+        if self.board.last_move_won():
+            self.status = 'win' if symbol == self.player_symbol else 'loss'
+        elif self.board.is_full():
+            self.status = 'draw'
+
+
+class ServerStats:
+    """Throughput and latency counters for the ``stats`` request."""
+
+    def __init__(self):
+        self.started = time.monotonic()
+        self.connections = 0  # Open connections
+        self.requests = 0
+        self.moves = 0  # Player moves answered
+        self.ai_moves = 0
+        self.errors = 0  # Requests answered with ok=false
+        self.busy = 0  # Moves refused because the AI queue was full
+        self.timeouts = 0  # AI moves that took longer than ai_timeout
+        self.sessions_created = 0
+        self.sessions_expired = 0
+        self.latencies = deque(maxlen=LATENCY_SAMPLES)  # Seconds per move request, newest last
+
+    def percentile(self, fraction):
+        if not self.latencies:
+            return 0.0
+        ordered = sorted(self.latencies)
+        return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+    def report(self, server):
+        uptime = time.monotonic() - self.started
+        return {
+            'uptime_s': round(uptime, 3),
+            'connections': self.connections,
+            'sessions': len(server.sessions),
+            'sessions_created': self.sessions_created,
+            'sessions_expired': self.sessions_expired,
+            'requests': self.requests,
+            'moves': self.moves,
+            'ai_moves': self.ai_moves,
+            'moves_per_s': round(self.moves / uptime, 3) if uptime else 0.0,
+            'errors': self.errors,
+            'busy': self.busy,
+            'timeouts': self.timeouts,
+            'ai_queue': server.ai_waiting,
+            'latency_ms': {
+                'p50': round(self.percentile(0.50) * 1000, 3),
+                'p90': round(self.percentile(0.90) * 1000, 3),
+                'p99': round(self.percentile(0.99) * 1000, 3),
+            },
+        }
+
+
+class GameServer:
+    """Sessions, the AI pool and the request handlers."""
+
+    def __init__(self, workers=None, max_sessions=10000, max_queue=None, session_timeout=600.0, idle_timeout=300.0,
+                 ai_time_ms=200, ai_timeout=10.0):
+        self.workers = workers or os.cpu_count() or 1
+        self.max_sessions = max_sessions
+        self.max_queue = max_queue if max_queue is not None else 1000  # AI moves allowed to wait for a worker
+        self.session_timeout = session_timeout  # Seconds a session may go unused before it is dropped
+        self.idle_timeout = idle_timeout  # Seconds a connection may stay silent
+        self.ai_time_ms = ai_time_ms  # Search budget per AI move
+        self.ai_timeout = ai_timeout  # Hard limit on waiting for the pool
+        self.sessions = {}
+        self.stats = ServerStats()
+        self.pool = None
+        self.ai_slots = None  # Semaphore: AI moves running on the pool
+        self.ai_waiting = 0  # AI moves running or waiting for a slot
+
+    async def start(self, host='127.0.0.1', port=8765, unix_path=None):
+        """Start listening; returns the asyncio server."""
+        self.pool = ProcessPoolExecutor(max_workers=self.workers)
+        self.ai_slots = asyncio.Semaphore(self.workers)
+        asyncio.get_running_loop().create_task(self.expire_sessions())
+        if unix_path:
+            return await asyncio.start_unix_server(self.handle_client, path=unix_path, backlog=LISTEN_BACKLOG)
+        return await asyncio.start_server(self.handle_client, host, port, backlog=LISTEN_BACKLOG)
+
+    def close(self):
+        """Stop the AI worker processes."""
+        if self.pool is not None:
+            self.pool.shutdown(cancel_futures=True)
+            self.pool = None
+
+    async def expire_sessions(self):
+        """Drop sessions nobody has used for session_timeout seconds."""
+        while True:
+            await asyncio.sleep(min(self.session_timeout, 30.0))
+            cutoff = time.monotonic() - self.session_timeout
+            for session_id in [sid for sid, s in self.sessions.items() if s.last_used < cutoff and not s.lock.locked()]:
+                del self.sessions[session_id]
+                self.stats.sessions_expired += 1
+
+    async def handle_client(self, reader, writer):
+        """Serve one connection: read a line, answer it, repeat."""
+        self.stats.connections += 1
+        try:
+            while True:
+                try:
+                    line = await asyncio.wait_for(reader.readline(), self.idle_timeout)
+                except (asyncio.TimeoutError, ValueError):  # Silent too long, or a line over the stream limit
+                    break
+                if not line:
+                    break
+                reply = await self.handle_line(line)
+                writer.write(json.dumps(reply, separators=(',', ':')).encode() + b'\n')
+                await writer.drain()  # Do not read more while the client is not reading our replies
+        except (ConnectionError, asyncio.CancelledError):  # Client gone, or the server is shutting down
+            pass
+        finally:
+            self.stats.connections -= 1
+            writer.close()
+
+    async def handle_line(self, line):
+        """Parse and answer one request line."""
+        self.stats.requests += 1
+        request_id = None
+        try:
+            try:
+                request = json.loads(line)
+            except ValueError:
+                raise RequestError("invalid JSON")
+            if not isinstance(request, dict):
+                raise RequestError("request must be a JSON object")
+            request_id = request.get('id')
+            handler = getattr(self, f"op_{request.get('op')}", None)
+            if handler is None:
+                raise RequestError(f"unknown op: {request.get('op')!r}")
+            reply = await handler(request)
+            reply['ok'] = True
+        except RequestError as exc:
+            self.stats.errors += 1
+            reply = {'ok': False, 'error': str(exc)}
+        except Exception as exc:  # A bug or a crashed worker must not leave the client without an answer
+            traceback.print_exc()
+            self.stats.errors += 1
+            reply = {'ok': False, 'error': f"internal error: {type(exc).__name__}"}
+        if request_id is not None:
+            reply['id'] = request_id
+        return reply
+
+    def get_session(self, request):
+        session = self.sessions.get(request.get('session'))
+        if session is None:
+            raise RequestError("unknown or expired session")
+        session.last_used = time.monotonic()
+        return session
+
+    async def op_new(self, request):
+        if len(self.sessions) >= self.max_sessions:
+            raise RequestError("busy: too many sessions")
+        try:
+            rows = int(request.get('rows', 3))
+            cols = int(request.get('cols', 3))
+            n_to_win = int(request.get('n_to_win', min(3, rows, cols)))
+        except (TypeError, ValueError):
+            raise RequestError("rows, cols and n_to_win must be integers")
+        if rows < 1 or cols < 1 or rows * cols > MAX_BOARD_CELLS or not 1 <= n_to_win <= max(rows, cols):
+            raise RequestError("unsupported board size")
+        algorithm = request.get('algorithm', 'iterative')
+        if algorithm not in ('iterative', 'mcts'):
+            raise RequestError("algorithm must be 'iterative' or 'mcts'")
+        session_id = secrets.token_hex(8)
+        session = Session(session_id, BitBoard(rows, cols, n_to_win), 'X', 'O', algorithm)
+        if request.get('ai_first'):
+            session.player_symbol, session.ai_symbol = 'O', 'X'
+        reply = {}
+        if request.get('ai_first'):  # Nobody else knows the session yet, so no lock is needed
+            reply['ai_move'] = await self.ai_turn(session)
+        self.sessions[session_id] = session  # Only once it is ready: a failed opening move leaves nothing behind
+        self.stats.sessions_created += 1
+        reply.update(session.snapshot())
+        return reply
+
+    async def op_move(self, request):
+        start = time.perf_counter()
+        session = self.get_session(request)
+        async with session.lock:
+            if session.status != 'playing':
+                raise RequestError("game is over")
+            try:
+                row, col = int(request['row']), int(request['col'])
+            except (KeyError, TypeError, ValueError):
+                raise RequestError("row and col must be integers")
+            if not session.board.place_move(row, col, session.player_symbol):
+                raise RequestError("illegal move")
+            session.update_status(session.player_symbol)
+            reply = {}
+            if session.status == 'playing':
+                try:
+                    reply['ai_move'] = await self.ai_turn(session)
+                except Exception:
+                    session.board.undo_move()  # Let the client retry the same move
+                    session.status = 'playing'
+                    raise
+        self.stats.moves += 1
+        self.stats.latencies.append(time.perf_counter() - start)
+        reply.update(session.snapshot())
+        return reply
+
+    async def ai_turn(self, session):
+        """Run the AI's move on the pool and play it; returns [row, col].
+
+        The pool slot is held until the worker is really done, even when the
+        client stops waiting for it after ai_timeout seconds, so timed-out
+        searches still count against max_queue.
+        """
+        if self.ai_waiting >= self.workers + self.max_queue:
+            self.stats.busy += 1
+            raise RequestError("busy: AI queue full, retry later")
+        self.ai_waiting += 1
+        try:
+            await self.ai_slots.acquire()
+        except BaseException:  # Cancelled while waiting for a slot
+            self.ai_waiting -= 1
+            raise
+        board = session.board
+        pool = self.pool
+        try:
+            job = asyncio.get_running_loop().run_in_executor(
+                pool, _ai_move, (board.rows, board.cols, board.n_to_win), dict(board.bits),
+                session.ai_symbol, session.player_symbol, self.ai_time_ms, session.algorithm)
+        except BaseException as exc:  # Nothing was started, e.g. a broken pool refusing work
+            self.finish_ai_job(None)
+            if isinstance(exc, BrokenProcessPool):
+                self.restart_pool(pool)
+                raise RequestError("AI worker crashed, retry later")
+            raise
+        job.add_done_callback(self.finish_ai_job)  # The slot is freed when the worker is done, not when we give up
+        try:
+            row, col = await asyncio.wait_for(asyncio.shield(job), self.ai_timeout)
+        except asyncio.TimeoutError:
+            self.stats.timeouts += 1
+            raise RequestError("AI move timed out")
+        except BrokenProcessPool:
+            self.restart_pool(pool)
+            raise RequestError("AI worker crashed, retry later")
+        session.board.place_move(row, col, session.ai_symbol)
+        session.update_status(session.ai_symbol)
+        self.stats.ai_moves += 1
+        return [row, col]
+
+    def finish_ai_job(self, job):
+        """Give back the pool slot of an AI move whose worker has finished."""
+        self.ai_slots.release()
+        self.ai_waiting -= 1
+        if job is not None and not job.cancelled():
+            job.exception()  # Retrieved, so a timed-out move that failed later is not reported as lost
+
+    def restart_pool(self, broken):
+        """Replace the pool after a worker died; every move running on it has failed already."""
+        if self.pool is broken:  # Only the first move to notice starts a new one
+            self.pool = ProcessPoolExecutor(max_workers=self.workers)
+            broken.shutdown(wait=False, cancel_futures=True)
+
+    async def op_state(self, request):
+        return self.get_session(request).snapshot()
+
+    async def op_close(self, request):
+        session = self.get_session(request)
+        del self.sessions[session.id]
+        return {'session': session.id}
+
+    async def op_stats(self, request):
+        return self.stats.report(self)
+
+
+async def serve(args):
+    server = GameServer(args.workers, args.max_sessions, args.max_queue, args.session_timeout, args.idle_timeout,
+                        args.ai_time_ms, args.ai_timeout)
+    listener = await server.start(args.host, args.port, args.unix)
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for signum in (signal.SIGINT, signal.SIGTERM):
+        try:
+            loop.add_signal_handler(signum, stop.set)  # Shut down cleanly, taking the AI workers with us
+        except NotImplementedError:  # Windows event loops have no signal handlers; Ctrl-C still works
+            pass
+    where = args.unix or f"{args.host}:{args.port}"
+    print(f"Serving Tic-Tac-Toe on {where} with {server.workers} AI workers", flush=True)
+    try:
+        await stop.wait()
+    finally:
+        listener.close()
+        server.close()
+        if args.unix and os.path.exists(args.unix):
+            os.unlink(args.unix)
+        print("Server stopped", file=sys.stderr, flush=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Host Tic-Tac-Toe games over line-delimited JSON.")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--unix', metavar='PATH', help="listen on a Unix socket instead of TCP")
+    parser.add_argument('--workers', type=int, default=None, help="AI processes (default: one per CPU)")
+    parser.add_argument('--max-sessions', type=int, default=10000)
+    parser.add_argument('--max-queue', type=int, default=None, help="AI moves allowed to wait (default: 1000)")
+    parser.add_argument('--session-timeout', type=float, default=600.0, help="seconds before an unused game is dropped")
+    parser.add_argument('--idle-timeout', type=float, default=300.0, help="seconds before a silent connection is closed")
+    parser.add_argument('--ai-time-ms', type=int, default=200, help="search time per AI move")
+    parser.add_argument('--ai-timeout', type=float, default=10.0, help="seconds before an AI move is given up")
+    args = parser.parse_args()
+    try:
+        asyncio.run(serve(args))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -1,7 +1,29 @@
 # Import necessary libraries
+import argparse  # Board size from the command line
 import tkinter as tk  # For creating the GUI
 from tkinter import messagebox  # For displaying message boxes
+from tkinter import ttk  # For the AI progress bar
+import os  # Reads TICTAC_SEARCH_LOG
+import queue  # Hands AI results from the worker thread to the Tk thread
 import random  # For random operations (used in fallback AI move selection)
+import threading  # Runs the AI search off the Tk main thread
+from bitboard import BitBoard  # Bitmask board used for the live game (faster AI search)
+from gamelog import log_game  # Appends finished games to the TICTAC_GAME_LOG record file
+from ponder import Ponderer  # Searches the AI's replies while the player decides
+from search import SearchStats, choose_move  # Search statistics and the AI's search dispatch
+from transposition import TranspositionTable  # Remembers searched positions between AI moves
+
+AI_TIME_BUDGET_MS = 1000  # How long the AI may think per move
+AI_POLL_MS = 50  # How often the GUI checks for a finished AI search
+SHOW_SEARCH_STATS = os.environ.get('TICTAC_SEARCH_LOG') == '1'  # Print a search summary line per AI move
+PONDER = os.environ.get('TICTAC_PONDER') != '0'  # Think during the player's turn; TICTAC_PONDER=0 turns it off
+CELL_PX = 100  # Size of a cell on small boards, in pixels
+MAX_BOARD_PX = 760  # Bigger boards shrink their cells to fit in this many pixels...
+MIN_CELL_PX = 16  # ...down to this size
+BOARD_COLOR = "#0000FF"  # Blue background, as the old buttons had
+LINE_COLOR = "white"
+SYMBOL_COLOR = "red"
+LAST_MOVE_COLOR = "yellow"  # Outline around the latest move
 
 # Define the Board class to manage the game state
 class Board:
@@ -11,11 +33,13 @@ class Board:
         self.cols = cols
         self.grid = [[' ' for _ in range(cols)] for _ in range(rows)]
         self.n_to_win = min(3, rows, cols)  # Number of consecutive symbols needed to win
+        self.move_history = []  # Moves made so far as (row, col), newest last
 
     def place_move(self, row, col, symbol):
         """Place a move on the board if the cell is valid and empty."""
         if self.is_valid_move(row, col):
             self.grid[row][col] = symbol
+            self.move_history.append((row, col))
             return True
         return False
 
@@ -27,6 +51,33 @@ class Board:
         """Return all empty cells as (row, col) tuples."""
         return [(r, c) for r in range(self.rows) for c in range(self.cols) if self.grid[r][c] == ' ']
 
+    def make_move(self, row, col, symbol):
+        """Place a move during search (no validation); take it back with undo_move."""
+        self.grid[row][col] = symbol
+        self.move_history.append((row, col))
+
+    def undo_move(self):
+        """Take back the most recent move."""
+        row, col = self.move_history.pop()
+        self.grid[row][col] = ' '
+
+    def last_move_won(self):
+        """Check whether the last move won, looking only at the four lines through its cell."""
+        if not self.move_history:
+            return False
+        row, col = self.move_history[-1]
+        symbol = self.grid[row][col]
+        for dr, dc in ((0, 1), (1, 0), (1, 1), (1, -1)):
+            count = 1
+            for step in (1, -1):
+                r, c = row + step * dr, col + step * dc
+                while 0 <= r < self.rows and 0 <= c < self.cols and self.grid[r][c] == symbol:
+                    count += 1
+                    r, c = r + step * dr, c + step * dc
+            if count >= self.n_to_win:
+                return True
+        return False
+
     def check_win(self, symbol):
         """Check if the given symbol has won the game."""
         def check_line(line):
@@ -63,11 +114,58 @@ class Board:
 
         return False
 
+# Draws the board for the GUI
+class BoardCanvas:
+    def __init__(self, parent, rows, cols, on_click):
+        """One tk.Canvas for a board of any size: grid lines drawn once, one text item per stone."""
+        self.rows = rows
+        self.cols = cols
+        self.cell = max(MIN_CELL_PX, min(CELL_PX, MAX_BOARD_PX // max(rows, cols)))  # Cell size in pixels
+        self.on_click = on_click  # Called with (row, col) of the clicked cell
+        width, height = cols * self.cell, rows * self.cell
+        self.canvas = tk.Canvas(parent, width=width, height=height, bg=BOARD_COLOR, highlightthickness=0)
+        for c in range(1, cols):  # rows + cols lines instead of a widget per cell
+            self.canvas.create_line(c * self.cell, 0, c * self.cell, height, fill=LINE_COLOR)
+        for r in range(1, rows):
+            self.canvas.create_line(0, r * self.cell, width, r * self.cell, fill=LINE_COLOR)
+        self.font = ("Arial", -(self.cell * 3 // 5), "bold")  # Negative size: pixels, so symbols fit any cell
+        self.items = {}  # (row, col) -> text item of the stone shown there
+        self.last_move = self.canvas.create_rectangle(0, 0, 0, 0, outline=LAST_MOVE_COLOR, width=2, state='hidden')
+        self.canvas.bind('<Button-1>', self.click)
+
+    def grid(self, **options):
+        self.canvas.grid(**options)
+
+    def click(self, event):
+        """Map a click to its cell by division (no per-cell widgets or hit tests)."""
+        row, col = int(self.canvas.canvasy(event.y)) // self.cell, int(self.canvas.canvasx(event.x)) // self.cell
+        if 0 <= row < self.rows and 0 <= col < self.cols:
+            self.on_click(row, col)
+
+    def set_cell(self, row, col, symbol):
+        """Show ``symbol`` (or nothing for ' ') in one cell; nothing else is redrawn."""
+        item = self.items.pop((row, col), None)
+        if item is not None:
+            self.canvas.delete(item)
+        if symbol == ' ':
+            return
+        x, y = col * self.cell, row * self.cell
+        self.items[(row, col)] = self.canvas.create_text(x + self.cell // 2, y + self.cell // 2, text=symbol,
+                                                         fill=SYMBOL_COLOR, font=self.font, tags='stone')
+        self.canvas.coords(self.last_move, x + 1, y + 1, x + self.cell - 1, y + self.cell - 1)
+        self.canvas.itemconfigure(self.last_move, state='normal')
+
+    def clear(self):
+        """Remove every stone (one canvas call, however many there are)."""
+        self.canvas.delete('stone')
+        self.items.clear()
+        self.canvas.itemconfigure(self.last_move, state='hidden')
+
 # Define the TicTacToeGUI class for the graphical interface
 class TicTacToeGUI:
-    def __init__(self):
-        """Initialize the GUI components."""
-        self.board = Board()  # Create a new game board
+    def __init__(self, rows=3, cols=3, n_to_win=None):
+        """Initialize the GUI components for a rows x cols board (n_to_win in a row wins)."""
+        self.board = BitBoard(rows, cols, n_to_win)  # Create a new game board
         self.current_symbol = 'X'  # Player's symbol
         self.ai_symbol = 'O'  # AI's symbol
         self.player_symbol = 'X'  # Player's symbol
@@ -75,26 +173,30 @@ class TicTacToeGUI:
         self.scores = {"Player 1": 0, "Player 2": 0, "AI": 0}  # Initialize scores
         self.root = tk.Tk()  # Create the root window
         self.root.title("🎮 Tic-Tac-Toe Battle")  # Set the window title
-        self.buttons = [[None for _ in range(3)] for _ in range(3)]  # Create a 3x3 grid of buttons
         self.build_grid()  # Build the game grid
         self.status_label = tk.Label(self.root, text="Player 1's turn (X)", font=("Arial", 18))
-        self.status_label.grid(row=3, column=0, columnspan=3)  # Add the status label
+        self.status_label.grid(row=1, column=0)  # Add the status label
         self.score_label = tk.Label(self.root, text=self.get_score_text(), font=("Arial", 14))
-        self.score_label.grid(row=4, column=0, columnspan=3)  # Add the score label
+        self.score_label.grid(row=2, column=0)  # Add the score label
         self.mode_button = tk.Button(self.root, text="Switch to Human vs AI", command=self.switch_mode, font=("Arial", 12))
-        self.mode_button.grid(row=5, column=0, columnspan=3, pady=5)  # Add the mode switch button
+        self.mode_button.grid(row=3, column=0, pady=5)  # Add the mode switch button
+        self.progress = ttk.Progressbar(self.root, mode='indeterminate')  # Shown while the AI is thinking
+        self.progress.grid(row=4, column=0, sticky='ew', padx=10, pady=5)
+        self.progress.grid_remove()
+        self.ai_results = queue.Queue()  # (search id, move, stats, error) from the AI worker thread
+        self.search_id = 0  # Increases with every AI search; stale results are ignored
+        self.cancel_event = None  # Set to stop the running AI search
+        self.pending_ai = None  # Tk 'after' id of an AI move that has not started yet
+        self.ponderer = None  # Searches the AI's answers during the player's turn
+        if PONDER:
+            self.ponderer = Ponderer(self.search_ai_move, AI_TIME_BUDGET_MS)
         self.reset_board()  # Reset the board for a new game
         self.root.mainloop()  # Start the main event loop
 
     def build_grid(self):
-        """Build the game grid with buttons."""
-        for r in range(3):
-            for c in range(3):
-                btn = tk.Button(self.root, text='', width=8, height=4, font=("Arial", 32, "bold"),
-                                bg="#0000FF",  # Blue background color for buttons
-                                command=lambda row=r, col=c: self.player_move(row, col))  # Bind player move to button
-                btn.grid(row=r, column=c, padx=10, pady=10)  # Place the button in the grid
-                self.buttons[r][c] = btn  # Store the button reference
+        """Build the game grid: one canvas whose clicks become player moves."""
+        self.view = BoardCanvas(self.root, self.board.rows, self.board.cols, self.player_move)
+        self.view.grid(row=0, column=0, padx=10, pady=10)  # Place the board above the labels
 
     def switch_mode(self):
         """Switch between Human vs Human and Human vs AI modes."""
@@ -106,8 +208,10 @@ class TicTacToeGUI:
 
     def player_move(self, row, col):
         """Handle the player's move."""
+        if not self.is_human_vs_human and self.current_symbol == self.ai_symbol:
+            return  # Ignore clicks while the AI is thinking
         if self.board.place_move(row, col, self.current_symbol):  # Place the player's move
-            self.update_button(row, col)  # Update the button
+            self.update_cell(row, col)  # Draw the new stone
             if self.check_game_over():  # Check if the game is over
                 return
             if self.is_human_vs_human:  # Switch turns in Human vs Human mode
@@ -116,26 +220,82 @@ class TicTacToeGUI:
             else:  # AI's turn in Human vs AI mode
                 self.current_symbol = self.ai_symbol
                 self.status_label.config(text="AI's turn (O)")
-                self.root.after(500, self.ai_move)  # Delay AI move by 500ms
+                pondered = self.ponderer is not None and self.ponderer.ready((row, col))
+                delay = 0 if pondered else 500  # Delay AI move by 500ms unless its answer is already known
+                self.pending_ai = self.root.after(delay, self.ai_move, (row, col))
+
+    def ai_move(self, reply=None):
+        """Start the AI search on a worker thread so the window keeps responding; reply is the player's last move."""
+        self.pending_ai = None
+        self.search_id += 1
+        self.cancel_event = threading.Event()
+        worker = threading.Thread(target=self.run_ai_search, daemon=True,
+                                  args=(self.search_id, self.board.copy(), self.table, self.cancel_event, reply))
+        worker.start()
+        self.status_label.config(text="AI is thinking...")
+        self.progress.grid()
+        self.progress.start(10)
+        self.root.after(AI_POLL_MS, self.poll_ai_move, self.search_id)
+
+    def run_ai_search(self, search_id, board, table, cancel_event, reply=None):
+        """Worker thread: search a copy of the board and queue the result (no Tk calls here)."""
+        try:
+            result, thought_ms = None, 0
+            if self.ponderer is not None and reply is not None:
+                result, thought_ms = self.ponderer.answer(reply)  # Reuse the search run while the player decided
+            if result is None:
+                result = self.search_ai_move(board, AI_TIME_BUDGET_MS - thought_ms, cancel_event, table)
+            move, stats = result
+        except Exception as exc:  # Always answer, or the GUI would wait for this search forever
+            self.ai_results.put((search_id, None, None, exc))
+            return
+        self.ai_results.put((search_id, move, stats, None))
+
+    def search_ai_move(self, board, time_budget_ms, cancel_event, table=None):
+        """The AI's search as (move, stats), with the game's table unless another is given; runs off the Tk thread."""
+        stats = SearchStats() if SHOW_SEARCH_STATS else None
+        table = self.table if table is None else table
+        move = get_minimax_ai_move(board, self.ai_symbol, self.player_symbol, table=table, stats=stats,
+                                   time_budget_ms=time_budget_ms, cancel_event=cancel_event)
+        return move, stats
 
-    def ai_move(self):
-        """Handle the AI's move."""
-        row, col = get_minimax_ai_move(self.board, self.ai_symbol, self.player_symbol)  # Get the AI's move
+    def start_pondering(self):
+        """Search the AI's answers while the player decides (Human vs AI only)."""
+        if self.ponderer is not None and not self.is_human_vs_human:
+            self.ponderer.start(self.board, self.player_symbol, self.ai_symbol)
+
+    def poll_ai_move(self, search_id):
+        """Apply the AI's move once its worker has finished; keep polling until then."""
+        if search_id != self.search_id:
+            return  # This search was cancelled
+        while True:
+            try:
+                result_id, move, stats, error = self.ai_results.get_nowait()
+            except queue.Empty:
+                self.root.after(AI_POLL_MS, self.poll_ai_move, search_id)  # Still searching
+                return
+            if result_id == search_id:
+                break  # Anything else left in the queue came from a cancelled search
+        self.cancel_event = None
+        self.progress.stop()
+        self.progress.grid_remove()
+        if error is not None:  # Keep the game going rather than leave the AI's turn hanging
+            move = random.choice(self.board.get_empty_cells())
+            messagebox.showerror("AI error", f"The AI search failed: {error}\nIt plays {move[0]},{move[1]} instead.")
+        elif stats is not None:
+            print(stats.log_line(move))  # Search summary for this move
+        row, col = move
         self.board.place_move(row, col, self.current_symbol)  # Place the AI's move
-        self.update_button(row, col)  # Update the button
+        self.update_cell(row, col)  # Draw the new stone
         if self.check_game_over():  # Check if the game is over
             return
         self.current_symbol = self.player_symbol  # Switch back to the player's turn
         self.status_label.config(text="Player's turn (X)")
+        self.start_pondering()
 
-    def update_button(self, row, col):
-        """Update the button text and color."""
-        symbol = self.board.grid[row][col]  # Get the symbol (X or O) for the cell
-        self.buttons[row][col].config(
-            text=symbol,  # Set the text to the symbol
-            fg="red",  # Set the text color to red
-            state='disabled'  # Disable the button after the move
-        )
+    def update_cell(self, row, col):
+        """Redraw one cell after a move."""
+        self.view.set_cell(row, col, self.board.grid[row][col])
 
     def check_game_over(self):
         """Check if the game is over."""
@@ -143,6 +303,7 @@ class TicTacToeGUI:
             winner = "Player 1" if self.current_symbol == 'X' else ("Player 2" if self.is_human_vs_human else "AI")
             self.scores[winner] += 3  # Award 3 points for a win
             self.update_scores()  # Update the score label
+            log_game(self.board, 'X', 'O')  # X always moves first
             self.show_end_prompt(f"{winner} wins!")  # Show the winner
             return True
         elif not self.board.get_empty_cells():  # Check if the board is full
@@ -153,6 +314,7 @@ class TicTacToeGUI:
             else:
                 self.scores["AI"] += 2
             self.update_scores()  # Update the score label
+            log_game(self.board, 'X', 'O')
             self.show_end_prompt("It's a tie!")  # Show a tie message
             return True
         return False  # Return False if the game is not over
@@ -165,15 +327,30 @@ class TicTacToeGUI:
         else:
             self.root.quit()  # Quit the game
 
+    def cancel_search(self):
+        """Stop a scheduled or running AI search; its result will be ignored."""
+        if self.pending_ai is not None:
+            self.root.after_cancel(self.pending_ai)
+            self.pending_ai = None
+        if self.cancel_event is not None:
+            self.cancel_event.set()
+            self.cancel_event = None
+        self.search_id += 1
+        if self.ponderer is not None:
+            self.ponderer.stop()  # Its answers are for the old position
+        self.progress.stop()
+        self.progress.grid_remove()
+
     def reset_board(self):
         """Reset the board for a new game."""
-        self.board = Board()  # Create a new board
+        self.cancel_search()  # An AI search for the old board must not play on the new one
+        self.board = BitBoard(self.board.rows, self.board.cols, self.board.n_to_win)  # Create a new board of the same size
+        self.table = TranspositionTable()  # Fresh AI search cache for the new game
         self.current_symbol = 'X'  # Reset the current symbol to X
-        for r in range(3):  # Reset all buttons
-            for c in range(3):
-                self.buttons[r][c].config(text='', state='normal', bg="#0000FF")  # Reset button properties with blue background
+        self.view.clear()  # Empty every cell
         mode = "Player 1's turn (X)" if self.is_human_vs_human else "Player's turn (X)"
         self.status_label.config(text=mode)  # Update the status label
+        self.start_pondering()
 
     def update_scores(self):
         """Update the score label."""
@@ -196,41 +373,91 @@ def evaluate(board, ai_symbol, player_symbol):
     else:
         return 0
 
-def minimax(board, depth, is_maximizing, ai_symbol, player_symbol):
-    """Recursive minimax function with depth limit."""
-    score = evaluate(board, ai_symbol, player_symbol)
-    if abs(score) == 10 or depth == 0 or not board.get_empty_cells():
-        return score
+def minimax(board, depth, is_maximizing, ai_symbol, player_symbol, empty_cells=None, evaluator=None, ply=1,
+            stats=None):
+    """Recursive minimax function with depth limit.
+
+    The move that led here must have been made with board.make_move, so only the
+    lines through that cell need checking for a win (stones written straight into
+    board.grid are not in move_history and are not seen).  Children are handed
+    their empty cells, so no position scans the whole board.  A search.py evaluator,
+    attached to the (Bit)board, scores wins and depth-limit positions instead of
+    +-10 and 0; ply counts moves from the root.  A search.SearchStats as stats
+    counts the positions visited per ply.
+    """
+    if stats is not None:
+        stats.nodes += 1
+        stats.nodes_by_depth[ply] += 1
+    if board.last_move_won():
+        if stats is not None:
+            stats.terminal_hits += 1
+        score = 10 if evaluator is None else evaluator.win(ply)
+        return -score if is_maximizing else score
+    if empty_cells is None:
+        empty_cells = board.get_empty_cells()
+    if depth == 0 or not empty_cells:
+        if stats is not None and not empty_cells:
+            stats.terminal_hits += 1
+        if evaluator is None or not empty_cells:
+            return 0
+        mover, waiting = (player_symbol, ai_symbol) if is_maximizing else (ai_symbol, player_symbol)
+        score = evaluator.leaf(board, mover, waiting)
+        return -score if is_maximizing else score
+    if depth == 1 and evaluator is not None and evaluator.batched:  # All children are leaves: one call scores them
+        mover, waiting = (ai_symbol, player_symbol) if is_maximizing else (player_symbol, ai_symbol)
+        best = max(evaluator.score_children(board, [r * board.cols + c for r, c in empty_cells], mover, waiting,
+                                            ply + 1, stats))
+        return best if is_maximizing else -best
     if is_maximizing:
         best_score = -float('inf')
-        for (r, c) in board.get_empty_cells():
-            board.grid[r][c] = ai_symbol
-            current_score = minimax(board, depth - 1, False, ai_symbol, player_symbol)
-            board.grid[r][c] = ' '
+        for i, (r, c) in enumerate(empty_cells):
+            board.make_move(r, c, ai_symbol)
+            current_score = minimax(board, depth - 1, False, ai_symbol, player_symbol,
+                                    empty_cells[:i] + empty_cells[i + 1:], evaluator, ply + 1, stats)
+            board.undo_move()
             best_score = max(best_score, current_score)
         return best_score
     else:
         best_score = float('inf')
-        for (r, c) in board.get_empty_cells():
-            board.grid[r][c] = player_symbol
-            current_score = minimax(board, depth - 1, True, ai_symbol, player_symbol)
-            board.grid[r][c] = ' '
+        for i, (r, c) in enumerate(empty_cells):
+            board.make_move(r, c, player_symbol)
+            current_score = minimax(board, depth - 1, True, ai_symbol, player_symbol,
+                                    empty_cells[:i] + empty_cells[i + 1:], evaluator, ply + 1, stats)
+            board.undo_move()
             best_score = min(best_score, current_score)
         return best_score
 
-def get_minimax_ai_move(board, ai_symbol='O', player_symbol='X', depth=9):
-    """AI chooses the best move using minimax algorithm."""
+def best_minimax_move(board, ai_symbol, player_symbol, depth, evaluator=None, stats=None):
+    """Plain minimax at the root: the first best-scoring empty cell in row-major order."""
+    if stats is not None:
+        stats.reserve_depth(depth)
     best_score = -float('inf')
     best_move = None
-    for (r, c) in board.get_empty_cells():
-        board.grid[r][c] = ai_symbol
-        score = minimax(board, depth - 1, False, ai_symbol, player_symbol)
-        board.grid[r][c] = ' '
+    empty_cells = board.get_empty_cells()
+    for i, (r, c) in enumerate(empty_cells):
+        board.make_move(r, c, ai_symbol)
+        score = minimax(board, depth - 1, False, ai_symbol, player_symbol, empty_cells[:i] + empty_cells[i + 1:],
+                        evaluator, 1, stats)
+        board.undo_move()
         if score > best_score:
             best_score = score
             best_move = (r, c)
     return best_move if best_move else random.choice(board.get_empty_cells())
 
+def get_minimax_ai_move(board, ai_symbol='O', player_symbol='X', depth=9, algorithm=None, **options):
+    """AI chooses the best move using minimax algorithm.
+
+    Other algorithms, time and node budgets, tablebases and search statistics are
+    handled by search.choose_move, which takes the same keyword options (stats,
+    table, time_budget_ms, node_budget, use_tablebase, cancel_event, evaluator,
+    tree, threats) and documents them; this file supplies the plain minimax.
+    """
+    return choose_move(board, ai_symbol, player_symbol, depth, algorithm, best_minimax_move, **options)
+
 # Run the GUI
 if __name__ == "__main__":
-    TicTacToeGUI()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Play Tic-Tac-Toe in a window.")
+    parser.add_argument('--board', nargs=3, type=int, default=(3, 3, 3), metavar=('ROWS', 'COLS', 'N_TO_WIN'),
+                        help="board size and how many in a row win (default: 3 3 3)")
+    args = parser.parse_args()
+    TicTacToeGUI(*args.board)
\ No newline at end of file
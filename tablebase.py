@@ -0,0 +1,229 @@
+"""Solved-position tablebases for small boards.
+
+``generate`` enumerates every position reachable from the empty board, then
+works backwards from the finished games (retrograde analysis) to give each
+position its game-theoretic value and a best move.  The result is written as
+one byte per position, indexed by the position's base-3 rank, so a lookup
+through ``mmap`` is a single read and the file's pages are shared by every
+process that opens it.
+
+Positions are stored from the side to move's point of view (digit 1 = a stone
+of the player to move, digit 2 = an opponent stone), so one file serves the
+AI whichever symbol it plays and whether it moved first or second.
+
+Generate a file with e.g. ``python tablebase.py 3 3 3``.
+"""
+
+import argparse
+import mmap
+import os
+import struct
+import time
+from array import array
+
+from bitboard import BitBoard, geometry
+
+MAGIC = b'TTTB'
+VERSION = 1
+HEADER = struct.Struct('<4sBBBB8x')  # magic, version, rows, cols, n_to_win
+MAX_CELLS = 16  # 3**16 bytes (43 MB) is the largest table we build
+LOSS, DRAW, WIN = 1, 2, 3  # Value for the side to move, in the low two bits
+TERMINAL_CELL = 63  # Move field of finished positions (no board has that many cells)
+SEEN = TERMINAL_CELL << 2  # Marks a reachable position before its value is known
+DEFAULT_DIR = os.environ.get('TICTAC_TABLEBASE_DIR', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'tablebases'))
+
+_OPEN_TABLES = {}  # (directory, rows, cols, n_to_win) -> Tablebase or None
+
+
+def tablebase_path(rows, cols, n_to_win, directory=DEFAULT_DIR):
+    """File name used for a board configuration."""
+    return os.path.join(directory, f"{rows}x{cols}_{n_to_win}.ttb")
+
+
+class _Ranker:
+    """Base-3 rank of a (to-move stones, opponent stones) pair via per-byte lookup tables."""
+
+    def __init__(self, size):
+        self.chunks = []
+        for start in range(0, size, 8):
+            table = []
+            for byte in range(256):
+                total = 0
+                for b in range(8):
+                    if byte >> b & 1 and start + b < size:
+                        total += 3 ** (start + b)
+                table.append(total)
+            self.chunks.append((start, table))
+
+    def digits(self, bits):
+        """Sum of 3**i over the set bits i of ``bits``."""
+        total = 0
+        for start, table in self.chunks:
+            total += table[(bits >> start) & 0xFF]
+        return total
+
+    def rank(self, mover, other):
+        return self.digits(mover) + 2 * self.digits(other)
+
+
+def _has_win(bits, masks):
+    for mask in masks:
+        if bits & mask == mask:
+            return True
+    return False
+
+
+def solve(rows, cols, n_to_win, verbose=False):
+    """Return the tablebase for a configuration as a bytearray indexed by position rank."""
+    size = rows * cols
+    if size > MAX_CELLS:
+        raise ValueError(f"{rows}x{cols} has {size} cells; tablebases support at most {MAX_CELLS}")
+    geo = geometry(rows, cols, n_to_win)
+    masks, cell_masks, full = geo.masks, geo.cell_masks, geo.full
+    ranker = _Ranker(size)
+    pow3 = [3 ** i for i in range(size)]
+    table = bytearray(3 ** size)
+
+    # Forward pass: every reachable position, grouped by the number of stones.
+    layers = [(array('I', [0]), array('I', [0]))]
+    table[0] = SEEN
+    for stones in range(size):
+        movers, others = layers[stones]
+        next_movers, next_others = array('I'), array('I')
+        for mover, other in zip(movers, others):
+            occupied = mover | other
+            if occupied == full or _has_win(other, masks):
+                continue  # Game over; nothing follows
+            base = ranker.digits(other) + 2 * ranker.digits(mover)  # The roles swap after a move
+            free = full & ~occupied
+            while free:
+                low = free & -free
+                free ^= low
+                child = base + 2 * pow3[low.bit_length() - 1]
+                if not table[child]:
+                    table[child] = SEEN
+                    next_movers.append(other)
+                    next_others.append(mover | low)
+        layers.append((next_movers, next_others))
+        if verbose:
+            print(f"{stones + 1} stones: {len(next_movers)} positions")
+
+    # Backward pass: value every position from its (already valued) children.
+    for movers, others in reversed(layers):
+        for mover, other in zip(movers, others):
+            occupied = mover | other
+            here = ranker.rank(mover, other)
+            if _has_win(other, masks):
+                table[here] = TERMINAL_CELL << 2 | LOSS  # The opponent's last move won
+                continue
+            if occupied == full:
+                table[here] = TERMINAL_CELL << 2 | DRAW
+                continue
+            base = ranker.digits(other) + 2 * ranker.digits(mover)
+            best_value, best_cell = 0, 0
+            free = full & ~occupied
+            while free:
+                low = free & -free
+                free ^= low
+                idx = low.bit_length() - 1
+                placed = mover | low
+                if any(placed & mask == mask for mask in cell_masks[idx]):
+                    best_value, best_cell = WIN, idx  # Winning on the spot beats any slower win
+                    break
+                value = 4 - (table[base + 2 * pow3[idx]] & 3)  # Child's LOSS is our WIN and so on
+                if value > best_value:
+                    best_value, best_cell = value, idx
+            table[here] = best_cell << 2 | best_value
+    return table
+
+
+def generate(rows, cols, n_to_win, directory=DEFAULT_DIR, verbose=False):
+    """Solve a configuration and write its tablebase file; returns the file path."""
+    table = solve(rows, cols, n_to_win, verbose)
+    os.makedirs(directory, exist_ok=True)
+    path = tablebase_path(rows, cols, n_to_win, directory)
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'wb') as f:
+        f.write(HEADER.pack(MAGIC, VERSION, rows, cols, n_to_win))
+        f.write(table)
+    os.replace(tmp_path, path)  # Readers never see a half-written file
+    return path
+
+
+class Tablebase:
+    """Read-only, memory-mapped view of one tablebase file."""
+
+    def __init__(self, path):
+        with open(path, 'rb') as f:
+            self.data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, self.rows, self.cols, self.n_to_win = HEADER.unpack_from(self.data)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError(f"{path} is not a version {VERSION} tablebase")
+        size = self.rows * self.cols
+        if len(self.data) != HEADER.size + 3 ** size:
+            raise ValueError(f"{path} is truncated")
+        self.ranker = _Ranker(size)
+
+    def probe(self, board, to_move, opponent):
+        """Return (value, (row, col)) for ``to_move`` or None if the position is not in the table.
+
+        value is 1 for a forced win, 0 for a draw and -1 for a loss.
+        """
+        if not isinstance(board, BitBoard):
+            board = BitBoard.from_board(board)
+        mover = board.bits.get(to_move, 0)
+        other = board.bits.get(opponent, 0)
+        if mover | other != board.occupied:
+            return None  # A third symbol on the board
+        entry = self.data[HEADER.size + self.ranker.rank(mover, other)]
+        value = entry & 3
+        cell = entry >> 2
+        if not value or cell == TERMINAL_CELL:
+            return None  # Unreachable position, or the game is already over
+        return value - 2, (cell // self.cols, cell % self.cols)
+
+    def close(self):
+        self.data.close()
+
+
+def open_tablebase(rows, cols, n_to_win, directory=DEFAULT_DIR):
+    """Return the Tablebase for a configuration, or None if no file has been generated."""
+    key = (directory, rows, cols, n_to_win)
+    if key not in _OPEN_TABLES:
+        path = tablebase_path(rows, cols, n_to_win, directory)
+        _OPEN_TABLES[key] = Tablebase(path) if os.path.exists(path) else None
+    return _OPEN_TABLES[key]
+
+
+def tablebase_move(board, ai_symbol='O', player_symbol='X', directory=DEFAULT_DIR, stats=None):
+    """Best move for the AI from a tablebase, or None if the position is not covered.
+
+    A search.SearchStats passed as stats is filled in only when the tablebase answers.
+    """
+    tablebase = open_tablebase(board.rows, board.cols, board.n_to_win, directory)
+    if tablebase is None:
+        return None
+    start = time.perf_counter()
+    result = tablebase.probe(board, ai_symbol, player_symbol)
+    if result is None:
+        return None
+    if stats is not None:
+        stats.method = 'tablebase'
+        stats.elapsed = time.perf_counter() - start
+        stats.pv = [result[1]]
+    return result[1]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build a solved-position tablebase.")
+    parser.add_argument('rows', type=int)
+    parser.add_argument('cols', type=int)
+    parser.add_argument('n_to_win', type=int)
+    parser.add_argument('--dir', default=DEFAULT_DIR, help="output directory (default: %(default)s)")
+    args = parser.parse_args()
+    path = generate(args.rows, args.cols, args.n_to_win, args.dir, verbose=True)
+    print(f"Wrote {path}")
+
+
+if __name__ == "__main__":
+    main()
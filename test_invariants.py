@@ -0,0 +1,438 @@
+"""Invariants the faster boards and searches must keep; run with ``python -m pytest``.
+
+Every optimisation here promises to give the same answer as the simple code
+it replaces, so each test checks one of them against that simple code on
+seeded random positions.
+"""
+
+import os
+import random
+import re
+
+import pytest
+
+import analysis
+import dfpn
+import gamelog
+import npboard
+import render
+import threats
+import tictac
+from bitboard import BitBoard
+from parallel import ParallelStats, parallel_move
+from ponder import Ponderer
+from search import AlphaBetaSearch, HeuristicEvaluator, SearchStats, TerminalEvaluator, alphabeta_move
+from tablebase import Tablebase, generate
+from transposition import TranspositionTable
+
+SHAPES = [(3, 3, 3), (3, 4, 3), (4, 4, 3), (5, 5, 4)]
+
+
+def random_position(rng, rows, cols, n_to_win, stones, board_class=BitBoard):
+    """Play up to ``stones`` random moves, stopping early if someone wins."""
+    board = board_class(rows, cols) if board_class is tictac.Board else board_class(rows, cols, n_to_win)
+    board.n_to_win = n_to_win
+    for i in range(stones):
+        row, col = rng.choice(board.get_empty_cells())
+        board.make_move(row, col, 'XO'[i % 2])
+        if board.last_move_won():
+            break
+    return board
+
+
+def same_position(board):
+    """Copy any board into a tictac.Board, the original list-of-lists version."""
+    copy = tictac.Board(board.rows, board.cols)
+    copy.n_to_win = board.n_to_win
+    for r in range(board.rows):
+        for c in range(board.cols):
+            copy.grid[r][c] = board.grid[r][c]
+    return copy
+
+
+def unfinished_positions(rows, cols, n_to_win, count, stones, seed):
+    rng = random.Random(seed)
+    positions = []
+    while len(positions) < count:
+        board = random_position(rng, rows, cols, n_to_win, rng.randint(0, stones))
+        if not board.check_win('X') and not board.check_win('O') and not board.is_full():
+            positions.append(board)
+    return positions
+
+
+@pytest.mark.parametrize('rows, cols, n_to_win', SHAPES)
+def test_bitboard_matches_list_board(rows, cols, n_to_win):
+    rng = random.Random(rows * 100 + cols)
+    for _ in range(200):
+        board = BitBoard(rows, cols, n_to_win)
+        reference = tictac.Board(rows, cols)
+        reference.n_to_win = n_to_win
+        for i in range(rng.randint(1, rows * cols)):
+            row, col = rng.choice(reference.get_empty_cells())
+            board.make_move(row, col, 'XO'[i % 2])
+            reference.make_move(row, col, 'XO'[i % 2])
+            assert board.last_move_won() == reference.last_move_won()
+            for symbol in 'XO':
+                assert board.check_win(symbol) == reference.check_win(symbol)
+            assert sorted(board.get_empty_cells()) == sorted(reference.get_empty_cells())
+            if reference.last_move_won():
+                break
+
+
+@pytest.mark.parametrize('rows, cols', [(3, 3), (3, 4)])
+def test_fast_searches_match_minimax(rows, cols):
+    shared = TranspositionTable()  # Reused across positions, as in a game
+    for board in unfinished_positions(rows, cols, 3, 12, rows * cols - 3, seed=rows * cols):
+        for depth in (2, 4):
+            expected = tictac.best_minimax_move(same_position(board), 'O', 'X', depth)
+            assert alphabeta_move(board, 'O', 'X', depth) == expected
+            assert alphabeta_move(board, 'O', 'X', depth, table=TranspositionTable()) == expected
+        # A reused table may hold deeper results, which only agree with minimax at full depth
+        depth = len(board.get_empty_cells())
+        if depth <= 7:
+            expected = tictac.best_minimax_move(same_position(board), 'O', 'X', depth)
+            assert alphabeta_move(board, 'O', 'X', depth, table=shared) == expected
+    for board in unfinished_positions(rows, cols, 3, 3, rows * cols - 3, seed=1):
+        expected = tictac.best_minimax_move(same_position(board), 'O', 'X', 3)
+        assert parallel_move(board, 'O', 'X', 3, workers=2) == expected
+        assert parallel_move(board, 'O', 'X', 3, workers=2, split_depth=2, stats=ParallelStats()) == expected
+        assert parallel_move(board, 'O', 'X', 3, workers=2, stats=SearchStats()) == expected
+
+
+def recomputed(board):
+    """A fresh BitBoard holding the same stones, with every tracker rebuilt from scratch."""
+    fresh = BitBoard(board.rows, board.cols, board.n_to_win)
+    for idx, symbol in board.move_history:
+        fresh.set_cell(idx // board.cols, idx % board.cols, symbol)
+    fresh.enable_hashing()
+    fresh.enable_line_counts()
+    fresh.enable_locality(board.locality_radius)
+    return fresh
+
+
+@pytest.mark.parametrize('rows, cols, n_to_win', SHAPES + [(7, 6, 4)])
+def test_incremental_trackers_match_recompute(rows, cols, n_to_win):
+    rng = random.Random(rows * cols * n_to_win)
+    board = BitBoard(rows, cols, n_to_win)
+    board.enable_hashing()
+    board.enable_line_counts()
+    board.enable_locality(2)
+    for _ in range(400):
+        if board.move_history and (board.is_full() or rng.random() < 0.4):
+            board.undo_move()
+        else:
+            row, col = rng.choice(board.get_empty_cells())
+            board.make_move(row, col, rng.choice('XO'))
+        fresh = recomputed(board)
+        assert board.hashes == fresh.hashes
+        assert board.canonical_hash() == fresh.canonical_hash()
+        for symbol in 'XO':
+            assert board.open_line_counts(symbol) == fresh.open_line_counts(symbol)
+        assert board.near == fresh.near
+        assert board.move_mask() == fresh.move_mask()
+
+
+def test_set_cell_keeps_history_and_trackers_in_step():
+    rng = random.Random(7)
+    board = BitBoard(4, 4, 3)
+    board.enable_hashing()
+    board.enable_line_counts()
+    board.enable_locality(1)
+    for _ in range(300):
+        row, col = rng.randrange(4), rng.randrange(4)
+        board.grid[row][col] = rng.choice('XO ')
+        fresh = recomputed(board)
+        assert sorted(board.move_history) == sorted(fresh.move_history)
+        assert board.hashes == fresh.hashes
+        assert board.near == fresh.near
+
+
+def minimax_value(board, to_move, opponent):
+    """Game value for ``to_move`` by a full search: 1 win, 0 draw, -1 loss."""
+    best = -1
+    for row, col in board.get_empty_cells():
+        board.make_move(row, col, to_move)
+        if board.last_move_won():
+            value = 1
+        elif board.is_full():
+            value = 0
+        else:
+            value = -minimax_value(board, opponent, to_move)
+        board.undo_move()
+        if value > best:
+            best = value
+            if best == 1:
+                break
+    return best
+
+
+@pytest.mark.parametrize('rows, cols', [(3, 3), (3, 4)])
+def test_tablebase_matches_full_search(tmp_path, rows, cols):
+    tablebase = Tablebase(generate(rows, cols, 3, str(tmp_path)))
+    try:
+        for board in unfinished_positions(rows, cols, 3, 40, rows * cols - 1, seed=rows + cols):
+            to_move, opponent = ('X', 'O') if len(board.move_history) % 2 == 0 else ('O', 'X')
+            value, (row, col) = tablebase.probe(board, to_move, opponent)
+            assert value == minimax_value(board, to_move, opponent)
+            board.make_move(row, col, to_move)  # The stored move must keep that value
+            if board.last_move_won():
+                assert value == 1
+            elif not board.is_full():
+                assert -minimax_value(board, opponent, to_move) == value
+    finally:
+        tablebase.close()
+
+
+@pytest.mark.parametrize('max_entries', [100, dfpn.DEFAULT_MAX_ENTRIES])
+def test_proof_search_matches_full_search(tmp_path, max_entries):
+    path = str(tmp_path / 'proofs.pns')
+    solver = dfpn.ProofSolver(3, 4, 3, max_entries, checkpoint_path=path)  # 100 entries forces collections
+    for board in unfinished_positions(3, 4, 3, 30, 12, seed=11):
+        if len(board.get_empty_cells()) > 8:
+            continue
+        to_move, opponent = ('X', 'O') if len(board.move_history) % 2 == 0 else ('O', 'X')
+        value = solver.solve_position(board, to_move, opponent)
+        assert value == minimax_value(board, to_move, opponent)
+        settled = solver.probe(board, to_move, opponent)
+        if settled is not None and settled[1] is not None:
+            assert settled[0] == value
+            board.make_move(*settled[1], to_move)  # The stored move must keep that value
+            if not board.last_move_won() and not board.is_full():
+                assert -minimax_value(board, opponent, to_move) == value
+    resumed = dfpn.ProofSolver(3, 4, 3, checkpoint_path=path)
+    assert resumed.table == solver.table
+    assert resumed.solve() == 1 and solver.solve() == 1
+
+
+@pytest.mark.parametrize('rows, cols, n_to_win', SHAPES + [(6, 9, 5), (2, 7, 2)])
+def test_numpy_board_matches_bitboard(rows, cols, n_to_win):
+    pytest.importorskip('numpy')
+    rng = random.Random(rows * cols + n_to_win)
+    boards = []
+    for _ in range(60):
+        board = npboard.NumpyBoard(rows, cols, n_to_win)
+        reference = BitBoard(rows, cols, n_to_win)
+        for i in range(rng.randint(1, rows * cols)):
+            row, col = rng.choice(reference.get_empty_cells())
+            board.make_move(row, col, 'XO'[i % 2])
+            reference.make_move(row, col, 'XO'[i % 2])
+            assert board.last_move_won() == reference.last_move_won()
+            for symbol in 'XO':
+                assert board.check_win(symbol) == reference.check_win(symbol)
+            assert board.get_empty_cells() == reference.get_empty_cells()
+        assert board.to_bitboard().bits == reference.bits
+        boards.append(board)
+    assert npboard.check_wins(boards, 'O').tolist() == [board.check_win('O') for board in boards]
+
+
+@pytest.mark.parametrize('rows, cols, n_to_win', [(3, 3, 3), (20, 20, 5)])
+def test_game_records_read_back_as_written(tmp_path, rows, cols, n_to_win):
+    rng = random.Random(rows)
+    path = str(tmp_path / 'games.ttr')
+    boards = [random_position(rng, rows, cols, n_to_win, rng.randint(0, rows * cols)) for _ in range(50)]
+    with gamelog.GameRecordWriter(path) as writer:
+        for board in boards[:25]:
+            writer.write_board(board, 'X', 'O')
+    with gamelog.GameRecordWriter(path) as writer:  # Appending keeps the earlier games
+        for board in boards[25:]:
+            writer.write_board(board, 'X', 'O')
+    with open(path, 'ab') as f:
+        f.write(gamelog.RECORD_HEADER.pack(rows, cols, n_to_win, gamelog.UNFINISHED, b'X', b'O', 5))  # Cut short
+    records = list(gamelog.read_games(path))
+    assert len(records) == len(boards)
+    for board, record in zip(boards, records):
+        assert list(record.moves) == [idx for idx, _ in board.move_history]
+        if board.last_move_won():
+            assert record.winner() == board.move_history[-1][1]
+        else:
+            assert record.result == (gamelog.DRAW if board.is_full() else gamelog.UNFINISHED)
+
+
+def test_threat_search_wins_are_real():
+    rng = random.Random(4)
+    checked = 0
+    while checked < 40:
+        board = random_position(rng, 5, 5, 4, rng.randint(4, 12))
+        if board.last_move_won() or board.is_full():
+            continue
+        to_move, opponent = ('X', 'O') if len(board.move_history) % 2 == 0 else ('O', 'X')
+        line = threats.find_vcf(board, to_move, opponent, None)
+        if line is None or len(line) > 5:
+            continue
+        assert line[0] in board.get_empty_cells()
+        _, score = AlphaBetaSearch(board.copy(), to_move, opponent).search_root(len(line))
+        assert score > 0  # A full-width search of the same depth sees the same forced win
+        checked += 1
+
+
+def test_pondered_answers_match_fresh_searches():
+    search = lambda board, time_budget_ms, cancel_event: alphabeta_move(board, 'O', 'X', 4)
+    ponderer = Ponderer(search, time_budget_ms=1000, max_replies=3)
+    for board in unfinished_positions(3, 3, 3, 5, 4, seed=3):
+        if len(board.move_history) % 2:
+            continue  # Pondering starts with the player (X) to move
+        for reply in board.get_empty_cells():  # Pondered or not, the answer is what a fresh search gives
+            ponderer.start(board, 'X', 'O')
+            ponderer.thread.join()  # Let it finish its three replies, as a slow player would
+            result, thought_ms = ponderer.answer(reply)
+            if result is None:
+                board.make_move(*reply, 'X')
+                result = search(board, 1000 - thought_ms, None)
+                board.undo_move()
+            board.make_move(*reply, 'X')
+            assert result == alphabeta_move(board, 'O', 'X', 4)
+            board.undo_move()
+    assert ponderer.hits and ponderer.misses
+    assert ponderer.thread is None
+
+
+@pytest.mark.parametrize('rows, cols, n_to_win', SHAPES + [(6, 6, 4)])
+def test_batched_leaf_scores_match_one_by_one(tmp_path, rows, cols, n_to_win):
+    np = pytest.importorskip('numpy')
+    import learned
+    path = str(tmp_path / 'weights.ttw')
+    rng = np.random.default_rng(rows * cols + n_to_win)
+    learned.save_weights({n_to_win: rng.normal(size=learned.feature_count(n_to_win))}, path)
+    batched = learned.LearnedEvaluator(path=path)
+    one_by_one = learned.LearnedEvaluator(path=path)
+    one_by_one.batched = False
+    heuristic = HeuristicEvaluator()
+    threat = heuristic._weights_for(n_to_win)[1]
+    for board in unfinished_positions(rows, cols, n_to_win, 15, rows * cols - 1, seed=n_to_win):
+        batched.attach(board)
+        mover, waiting = ('X', 'O') if len(board.move_history) % 2 else ('O', 'X')  # Who moved last
+        for symbol, other in ((mover, waiting), (waiting, mover)):
+            cells = [r * cols + c for r, c in board.get_empty_cells()]
+            fast, slow = SearchStats(), SearchStats()
+            fast.reserve_depth(2)
+            slow.reserve_depth(2)
+            assert (batched.score_children(board, cells, symbol, other, 2, fast)
+                    == TerminalEvaluator.score_children(batched, board, cells, symbol, other, 2, slow))
+            assert fast.counters() == slow.counters()
+        # Threats are scored exactly as the heuristic scores them
+        expected = heuristic.leaf(board, mover, waiting)
+        value = batched.leaf(board, mover, waiting)
+        assert (abs(value) == learned.THREAT_SCALE) == (abs(expected) == threat)
+        if abs(expected) == threat:
+            assert (value > 0) == (expected > 0)
+        depth = min(2, len(board.get_empty_cells()))
+        work = board.copy()
+        assert (tictac.best_minimax_move(work, 'O', 'X', depth, batched)
+                == tictac.best_minimax_move(work, 'O', 'X', depth, one_by_one))
+        assert (alphabeta_move(board, 'O', 'X', depth, evaluator=batched)
+                == alphabeta_move(board, 'O', 'X', depth, evaluator=one_by_one))
+
+
+class FakeTerminal:
+    """A stream that counts writes and applies the ANSI codes render.Renderer uses to a screen of characters."""
+
+    def __init__(self):
+        self.writes = 0
+        self.screen = {}  # (line, column) -> character, 1-based
+        self.line, self.column = 1, 1
+        self.saved = None
+
+    def isatty(self):
+        return True
+
+    def flush(self):
+        pass
+
+    def write(self, text):
+        self.writes += 1
+        for params, command, cursor, char in re.findall(r'\x1b\[([0-9;]*)([HJr])|\x1b([78])|([^\x1b])', text):
+            if char == '\n':
+                self.line, self.column = self.line + 1, 1
+            elif char:
+                self.screen[self.line, self.column] = char
+                self.column += 1
+            elif cursor:
+                if cursor == '7':
+                    self.saved = (self.line, self.column)
+                else:
+                    self.line, self.column = self.saved
+            elif command == 'J':
+                self.screen = {}
+            elif command == 'H':
+                self.line, self.column = map(int, params.split(';')) if params else (1, 1)
+            else:  # Setting the scroll region moves the cursor home
+                self.line, self.column = 1, 1
+
+    def lines(self, count):
+        width = max(column for _, column in self.screen)
+        return [''.join(self.screen.get((line, column), ' ') for column in range(1, width + 1)).rstrip()
+                for line in range(1, count + 1)]
+
+
+@pytest.mark.parametrize('rows, cols, n_to_win', SHAPES + [(12, 12, 5)])
+def test_rendered_frames_match_display(capsys, monkeypatch, rows, cols, n_to_win):
+    monkeypatch.setattr(render.shutil, 'get_terminal_size', lambda: os.terminal_size((120, 40)))
+    rng = random.Random(rows + cols)
+    board = BitBoard(rows, cols, n_to_win)
+    numpy_board = npboard.NumpyBoard(rows, cols, n_to_win)
+    terminal = FakeTerminal()
+    renderer = render.Renderer('ansi', terminal)
+    for i in range(rows * cols):
+        row, col = rng.choice(board.get_empty_cells())
+        board.make_move(row, col, 'XO'[i % 2])
+        numpy_board.make_move(row, col, 'XO'[i % 2])
+        # The original display(): one print per line
+        expected = "    " + "   ".join(str(c) for c in range(cols)) + "\n" + "  +" + "---+" * cols + "\n"
+        for r in range(rows):
+            expected += f"{r} | {' | '.join(board.grid[r])} |\n" + "  +" + "---+" * cols + "\n"
+        for shown in (board, same_position(board), numpy_board):
+            shown.display()
+            assert capsys.readouterr().out == expected
+        writes = terminal.writes
+        renderer.render(board)
+        assert terminal.writes == writes + 1  # One write per frame
+        assert terminal.lines(2 * rows + 2) == [line.rstrip() for line in expected.splitlines()]
+    renderer.close()
+    monkeypatch.setattr(render.shutil, 'get_terminal_size', lambda: os.terminal_size((120, 2 * rows + 2)))
+    small = FakeTerminal()
+    render.Renderer('ansi', small).render(board)  # No room below the board: the plain frame instead
+    assert small.writes == 1 and small.lines(2 * rows + 2) == terminal.lines(2 * rows + 2)
+    quiet = FakeTerminal()
+    render.Renderer('quiet', quiet).render(board)
+    assert quiet.writes == 0
+
+
+def search_value(board, to_move, opponent, depth=9):
+    """Score of the position for ``to_move`` by a fresh alpha-beta search."""
+    return AlphaBetaSearch(BitBoard.from_board(board), to_move, opponent).search_root(depth)[1]
+
+
+def mirrored(board):
+    """The board flipped left to right, as a tictac.Board."""
+    copy = same_position(board)
+    copy.grid = [row[::-1] for row in copy.grid]
+    return copy
+
+
+@pytest.mark.parametrize('workers', [1, 2])
+def test_batch_analysis_matches_search(tmp_path, workers):
+    rng = random.Random(11)
+    boards = unfinished_positions(3, 3, 3, 40, 5, 11) + unfinished_positions(3, 4, 3, 12, 6, 12)
+    positions = boards + [mirrored(board) for board in boards] + rng.sample(boards, 20)  # Images and copies
+    finished = random_position(random.Random(3), 3, 3, 3, 9)
+    positions.append(finished)
+    cache = str(tmp_path / 'analysis.sqlite')
+    for run in range(2):  # The second run reads everything back from the cache
+        stats = analysis.AnalysisStats()
+        results = list(analysis.analyze_positions(iter(positions), workers=workers, cache=cache, chunk_size=8,
+                                                  max_pending=16, stats=stats))
+        assert sorted(map(id, (position for position, _, _ in results))) == sorted(map(id, positions))
+        assert stats.positions == len(positions) == stats.searched + stats.duplicates + stats.cached + 1
+        assert stats.finished == 1
+        assert stats.searched < len(boards) if run == 0 else stats.searched == 0
+    for position, move, value in results:  # Answers read back from the cache are the searches' answers
+        board = BitBoard.from_board(position)
+        to_move, opponent = analysis.side_to_move(board)
+        if position is finished:
+            assert move is None
+            continue
+        assert value == search_value(position, to_move, opponent)
+        assert board.is_valid_move(*move)
+        board.make_move(*move, to_move)  # The move keeps the value
+        assert value == (10 if board.last_move_won() else 0 if board.is_full()
+                         else -search_value(board, opponent, to_move, 8))
@@ -0,0 +1,170 @@
+"""Threat-space search: forced wins made only of threats (victory by continuous fours).
+
+A *four* is a winning window holding n_to_win - 1 of a player's stones and
+nothing else, so its last cell wins on the next move.  ``find_vcf`` looks for
+a win where every attacking move makes a four: the defender's reply is then
+forced (block the single winning cell, or lose at once), so the tree has one
+defender move per level and forced wins far deeper than a full-width search
+can see are found in milliseconds.  A move that makes two fours at once (or a
+four the defender cannot block) wins outright.  The defender's own fours are
+respected: while the defender has one, the attacker may only play a four that
+also blocks it.
+
+``threat_move`` is the stage ``search.choose_move`` runs before the main
+search on boards with n_to_win >= 4: it plays an immediate win, a forced win
+found by ``find_vcf``, the block of the opponent's four, or a defence against
+the opponent's forced win, and returns None when none applies.  Everything
+runs under a strict time cap; running out just means "nothing found".
+"""
+
+import time
+
+from bitboard import BitBoard
+
+THREAT_TIME_MS = 50  # Default cap on one threat_move call
+MAX_VCF_MOVES = 40  # Attacking moves in the longest sequence tried
+CHECK_INTERVAL = 64  # Nodes between clock checks
+
+
+class ThreatTimeout(Exception):
+    """Raised inside the search when the time cap is reached."""
+
+
+class ThreatSearch:
+    """VCF search on one position; ``nodes`` counts the attacking moves tried."""
+
+    def __init__(self, board, deadline=None):
+        self.masks = board.lines.masks
+        self.cols = board.cols
+        self.n_to_win = board.n_to_win
+        self.full = board.lines.full
+        self.deadline = deadline  # perf_counter() time at which the search gives up
+        self.nodes = 0
+        self.failed = set()  # (attacker bits, defender bits) where no VCF was found; either side may attack
+
+    def completions(self, own, other):
+        """Cells that complete one of ``own``'s fours (as a mask)."""
+        needed = self.n_to_win - 1
+        cells = 0
+        for mask in self.masks:
+            if not other & mask and (own & mask).bit_count() == needed:
+                cells |= mask & ~own
+        return cells
+
+    def four_moves(self, own, other):
+        """Cells that make a four for ``own``: empty cells of windows one stone short of a four."""
+        needed = self.n_to_win - 2
+        cells = 0
+        for mask in self.masks:
+            if not other & mask and (own & mask).bit_count() == needed:
+                cells |= mask & ~own
+        return cells
+
+    def vcf(self, own, other, moves_left):
+        """A list of cell indices (our moves and forced replies, alternating) that wins by fours, or None."""
+        win = self.completions(own, other)
+        if win:  # A four already on the board: complete it
+            return [(win & -win).bit_length() - 1]
+        if moves_left <= 0 or (own, other) in self.failed:
+            return None
+        self.nodes += 1
+        if self.deadline is not None and self.nodes % CHECK_INTERVAL == 0 and time.perf_counter() > self.deadline:
+            raise ThreatTimeout
+        threats = self.completions(other, own)  # The defender's fours: we must block them
+        if threats & (threats - 1):
+            return None  # Two of them cannot both be blocked
+        candidates = self.four_moves(own, other)
+        if threats:
+            candidates &= threats
+        while candidates:
+            low = candidates & -candidates
+            candidates ^= low
+            idx = low.bit_length() - 1
+            mine = own | low
+            replies = self.completions(mine, other)
+            if replies & (replies - 1):  # Two winning cells: the defender can block only one
+                return [idx, (replies & -replies).bit_length() - 1, (replies & (replies - 1)).bit_length() - 1]
+            if self.completions(other, mine):
+                continue  # The defender still has a four of their own and wins first
+            reply = replies & -replies
+            line = self.vcf(mine, other | reply, moves_left - 1)
+            if line is not None:
+                return [idx, reply.bit_length() - 1] + line
+        self.failed.add((own, other))
+        return None
+
+
+def find_vcf(board, attacker, defender, time_budget_ms=THREAT_TIME_MS, max_moves=MAX_VCF_MOVES):
+    """Forced win for ``attacker`` (to move) by continuous fours, as a list of (row, col) moves, or None.
+
+    The list alternates the attacker's moves and the defender's forced replies
+    and ends with the winning move.  None means no such win was found within
+    ``max_moves`` attacking moves and ``time_budget_ms`` (None: no time cap).
+    """
+    work = board if isinstance(board, BitBoard) else BitBoard.from_board(board)
+    deadline = None if time_budget_ms is None else time.perf_counter() + time_budget_ms / 1000.0
+    search = ThreatSearch(work, deadline)
+    try:
+        line = search.vcf(work.bits.get(attacker, 0), work.bits.get(defender, 0), max_moves)
+    except ThreatTimeout:
+        return None
+    return None if line is None else [divmod(idx, work.cols) for idx in line]
+
+
+def threat_move(board, ai_symbol='O', player_symbol='X', time_budget_ms=THREAT_TIME_MS, stats=None):
+    """Move forced by the threats on the board, or None to leave the choice to the main search.
+
+    In order: win now; start a forced win found by find_vcf; block the
+    opponent's four; play a defence that leaves the opponent without a forced
+    win (preferring one that makes a four of our own).  A search.SearchStats
+    passed as stats is filled in only when a move is returned.
+    """
+    start = time.perf_counter()
+    work = board.copy() if isinstance(board, BitBoard) else BitBoard.from_board(board)
+    deadline = None if time_budget_ms is None else start + time_budget_ms / 1000.0
+    search = ThreatSearch(work, deadline)
+    own = work.bits.get(ai_symbol, 0)
+    other = work.bits.get(player_symbol, 0)
+    line = None
+    try:
+        line = search.vcf(own, other, MAX_VCF_MOVES)
+        if line is None:
+            blocks = search.completions(other, own)
+            if blocks:  # Not winning first, so the opponent's four must be blocked
+                line = [(blocks & -blocks).bit_length() - 1]
+            else:
+                line = _defence(search, own, other)
+    except ThreatTimeout:
+        line = None
+    if line is None:
+        return None
+    move = divmod(line[0], work.cols)
+    if stats is not None:
+        stats.method = 'threats'
+        stats.nodes = search.nodes
+        stats.elapsed = time.perf_counter() - start
+        stats.pv = [divmod(idx, work.cols) for idx in line]
+    return move
+
+
+def _defence(search, own, other):
+    """[move] that stops the opponent's forced win, or None if they have none (or every defence fails)."""
+    attack = search.vcf(other, own, MAX_VCF_MOVES)
+    if attack is None:
+        return None
+    cells = 0
+    for idx in attack:  # A defence has to take one of the cells the attack relies on
+        cells |= 1 << idx
+    cells |= search.four_moves(own, other) & ~(own | other)  # Our own fours force replies and can break it too
+    cells &= search.full & ~(own | other)
+    ordered = []
+    fours = search.four_moves(own, other)
+    while cells:
+        low = cells & -cells
+        cells ^= low
+        ordered.append((not fours & low, low.bit_length() - 1))  # Defences that make our own four first
+    for _, idx in sorted(ordered):
+        mine = own | 1 << idx
+        if search.vcf(other, mine, MAX_VCF_MOVES) is None:
+            return [idx]
+    return None
@@ -1,5 +1,17 @@
 #Names: Acquah Yaw, Cephas Asamoah, Blake Bothmer
+import os  # Read the TICTAC_SEARCH_LOG setting
 import random  # Import the random module for AI move selection
+import sys  # Board.display writes the whole board at once
+from bitboard import BitBoard  # Fast bitmask board used by the game loop
+from gamelog import log_game  # Appends finished games to a record file
+from ponder import Ponderer  # Searches the AI's replies while the player types
+from render import Renderer, board_frame  # Draws the board in one write per frame
+from search import SearchStats, choose_move  # Search statistics and the AI's choice of search
+from transposition import TranspositionTable  # Remembers searched positions between AI moves
+
+AI_TIME_BUDGET_MS = 1000  # How long the AI may think per move in the game loop
+SHOW_SEARCH_STATS = os.environ.get('TICTAC_SEARCH_LOG') == '1'  # Print a search summary line after each AI move
+PONDER = os.environ.get('TICTAC_PONDER') != '0'  # Think during the player's turn; TICTAC_PONDER=0 turns it off
 
 class Board:
     def __init__(self, rows=3, cols=3):
@@ -8,20 +20,17 @@ class Board:
         self.cols = cols  # Number of columns in the board
         self.grid = [[' ' for _ in range(cols)] for _ in range(rows)]  # Initialize the board as a grid of empty spaces
         self.n_to_win = min(3, rows, cols)  # Number of consecutive symbols needed to win
+        self.move_history = []  # Moves made so far as (row, col), newest last
 
     def display(self):
         """Displays the board with column numbers and row labels."""
-        print("    " + "   ".join(str(c) for c in range(self.cols)))  # Print column numbers
-        print("  +" + "---+" * self.cols)  # Print the top border of the board
-        for r in range(self.rows):  # Loop through each row
-            row_str = " | ".join(self.grid[r])  # Join the row elements with vertical bars
-            print(f"{r} | {row_str} |")  # Print the row with its label
-            print("  +" + "---+" * self.cols)  # Print the row separator
+        sys.stdout.write(board_frame(self))  # The whole board in one write instead of a print per line
 
     def place_move(self, row, col, symbol):
         """Place a move if the cell is valid and empty."""
         if self.is_valid_move(row, col):  # Check if the move is valid
             self.grid[row][col] = symbol  # Place the symbol in the specified cell
+            self.move_history.append((row, col))  # Remember the move for last_move_won
             return True  # Return True if the move was successful
         return False  # Return False if the move was invalid
 
@@ -33,6 +42,33 @@ class Board:
         """Return all empty cells as (row, col) tuples."""
         return [(r, c) for r in range(self.rows) for c in range(self.cols) if self.grid[r][c] == ' ']  # Find all empty cells
 
+    def make_move(self, row, col, symbol):
+        """Place a move during search (no validation); take it back with undo_move."""
+        self.grid[row][col] = symbol  # Place the symbol
+        self.move_history.append((row, col))  # Remember the move so it can be undone
+
+    def undo_move(self):
+        """Take back the most recent move."""
+        row, col = self.move_history.pop()  # Forget the last move
+        self.grid[row][col] = ' '  # Empty its cell again
+
+    def last_move_won(self):
+        """Check whether the last move won, looking only at the four lines through its cell."""
+        if not self.move_history:  # No move made yet
+            return False
+        row, col = self.move_history[-1]  # Cell of the last move
+        symbol = self.grid[row][col]  # Symbol that was placed there
+        for dr, dc in ((0, 1), (1, 0), (1, 1), (1, -1)):  # Row, column and both diagonals
+            count = 1  # The last move itself
+            for step in (1, -1):  # Walk both ways from the last move
+                r, c = row + step * dr, col + step * dc
+                while 0 <= r < self.rows and 0 <= c < self.cols and self.grid[r][c] == symbol:
+                    count += 1  # Another matching symbol in the line
+                    r, c = r + step * dr, c + step * dc
+            if count >= self.n_to_win:  # Enough in a row through the last move
+                return True
+        return False
+
     def check_win(self, symbol):
         """Check if the given symbol has won the game."""
         def check_line(line):
@@ -94,40 +130,79 @@ def evaluate(board, ai_symbol, player_symbol):
         return 0  # Return 0 if no one has won
 
 
-def minimax(board, depth, is_maximizing, ai_symbol, player_symbol):
-    """Recursive minimax function with depth limit."""
-    score = evaluate(board, ai_symbol, player_symbol)  # Evaluate the board
-
-    if abs(score) == 10 or depth == 0 or not board.get_empty_cells():  # Stop if game is over or depth limit is reached
-        return score  # Return the score
+def minimax(board, depth, is_maximizing, ai_symbol, player_symbol, empty_cells=None, evaluator=None, ply=1,
+            stats=None):
+    """Recursive minimax function with depth limit.
+
+    The move that led here must have been made with board.make_move, so only the
+    lines through that cell need checking instead of re-evaluating the whole board.
+    Stones written straight into board.grid are not in move_history, so a win made
+    that way is not seen here.  Each call hands its children their empty cells
+    (its own minus the move tried), so no position scans the whole board.
+    With a search.py evaluator (attached to the BitBoard being searched), wins and
+    unfinished positions at the depth limit are scored by it instead of +-10 and 0;
+    ply counts the moves made since the root.  A search.SearchStats passed as
+    stats counts the positions visited at each ply.
+    """
+    if stats is not None:  # This position is one node, ply moves below the root
+        stats.nodes += 1
+        stats.nodes_by_depth[ply] += 1
+    if board.last_move_won():  # Only the move just made can have ended the game
+        if stats is not None:
+            stats.terminal_hits += 1
+        score = 10 if evaluator is None else evaluator.win(ply)  # Value of the win for whoever made it
+        return -score if is_maximizing else score  # The player moved last on the AI's turn, and vice versa
+
+    if empty_cells is None:  # Top of the search: find the moves once
+        empty_cells = board.get_empty_cells()
+    if depth == 0 or not empty_cells:  # Stop if the board is full or depth limit is reached
+        if stats is not None and not empty_cells:
+            stats.terminal_hits += 1  # A full board ends the game too
+        if evaluator is None or not empty_cells:
+            return 0  # Nobody has won
+        mover, waiting = (player_symbol, ai_symbol) if is_maximizing else (ai_symbol, player_symbol)  # Who just moved
+        score = evaluator.leaf(board, mover, waiting)  # Estimate for the player who just moved
+        return -score if is_maximizing else score  # Seen from the AI's side
+
+    if depth == 1 and evaluator is not None and evaluator.batched:  # Every child is a leaf: score them in one call
+        mover, waiting = (ai_symbol, player_symbol) if is_maximizing else (player_symbol, ai_symbol)  # Who moves now
+        cells = [r * board.cols + c for r, c in empty_cells]  # Cell indices, as the evaluator takes them
+        best = max(evaluator.score_children(board, cells, mover, waiting, ply + 1, stats))  # Mover's best child
+        return best if is_maximizing else -best  # Seen from the AI's side
 
     if is_maximizing:  # If it's the AI's turn
         best_score = -float('inf')  # Initialize the best score to negative infinity
-        for (r, c) in board.get_empty_cells():  # Loop through all empty cells
-            board.grid[r][c] = ai_symbol  # Try the move
-            current_score = minimax(board, depth - 1, False, ai_symbol, player_symbol)  # Recursively evaluate
-            board.grid[r][c] = ' '  # Undo the move
+        for i, (r, c) in enumerate(empty_cells):  # Loop through all empty cells
+            board.make_move(r, c, ai_symbol)  # Try the move
+            rest = empty_cells[:i] + empty_cells[i + 1:]  # Empty cells left after this move
+            current_score = minimax(board, depth - 1, False, ai_symbol, player_symbol, rest, evaluator, ply + 1, stats)  # Recursively evaluate
+            board.undo_move()  # Undo the move
             best_score = max(best_score, current_score)  # Update the best score
         return best_score  # Return the best score
     else:  # If it's the player's turn
         best_score = float('inf')  # Initialize the best score to positive infinity
-        for (r, c) in board.get_empty_cells():  # Loop through all empty cells
-            board.grid[r][c] = player_symbol  # Try the move
-            current_score = minimax(board, depth - 1, True, ai_symbol, player_symbol)  # Recursively evaluate
-            board.grid[r][c] = ' '  # Undo the move
+        for i, (r, c) in enumerate(empty_cells):  # Loop through all empty cells
+            board.make_move(r, c, player_symbol)  # Try the move
+            rest = empty_cells[:i] + empty_cells[i + 1:]  # Empty cells left after this move
+            current_score = minimax(board, depth - 1, True, ai_symbol, player_symbol, rest, evaluator, ply + 1, stats)  # Recursively evaluate
+            board.undo_move()  # Undo the move
             best_score = min(best_score, current_score)  # Update the best score
         return best_score  # Return the best score
 
 
-def get_minimax_ai_move(board, ai_symbol='O', player_symbol='X', depth=9):
-    """AI chooses the best move using minimax algorithm."""
+def best_minimax_move(board, ai_symbol, player_symbol, depth, evaluator=None, stats=None):
+    """Plain minimax at the root: the first best-scoring empty cell in row-major order."""
+    if stats is not None:
+        stats.reserve_depth(depth)  # One nodes_by_depth entry per ply searched
     best_score = -float('inf')  # Initialize the best score to negative infinity
     best_move = None  # Initialize the best move
 
-    for (r, c) in board.get_empty_cells():  # Loop through all empty cells
-        board.grid[r][c] = ai_symbol  # Try the move
-        score = minimax(board, depth - 1, False, ai_symbol, player_symbol)  # Evaluate the move
-        board.grid[r][c] = ' '  # Undo the move
+    empty_cells = board.get_empty_cells()  # Found once; each level hands the rest down
+    for i, (r, c) in enumerate(empty_cells):  # Loop through all empty cells
+        board.make_move(r, c, ai_symbol)  # Try the move
+        rest = empty_cells[:i] + empty_cells[i + 1:]  # Empty cells left after this move
+        score = minimax(board, depth - 1, False, ai_symbol, player_symbol, rest, evaluator, 1, stats)  # Evaluate the move
+        board.undo_move()  # Undo the move
         if score > best_score:  # Update the best move if the score is better
             best_score = score
             best_move = (r, c)
@@ -135,10 +210,35 @@ def get_minimax_ai_move(board, ai_symbol='O', player_symbol='X', depth=9):
     return best_move if best_move else random.choice(board.get_empty_cells())  # Return the best move or a random move
 
 
-def play_one_round():
-    board = Board(3, 3)  # Create a 3x3 board
+def get_minimax_ai_move(board, ai_symbol='O', player_symbol='X', depth=9, algorithm=None, **options):
+    """AI chooses the best move using minimax algorithm.
+
+    Other algorithms, time and node budgets, tablebases and search statistics are
+    handled by search.choose_move, which takes the same keyword options (stats,
+    table, time_budget_ms, node_budget, use_tablebase, cancel_event, evaluator,
+    tree, threats) and documents them; this file supplies the plain minimax above.
+    """
+    return choose_move(board, ai_symbol, player_symbol, depth, algorithm, best_minimax_move, **options)  # Shared by all three games
+
+
+def ai_search(board, ai_symbol, table, time_budget_ms=AI_TIME_BUDGET_MS, cancel_event=None):
+    """The game loop's AI search: (move, stats), stats being None unless search logging is on."""
+    stats = SearchStats() if SHOW_SEARCH_STATS else None  # Only collected when asked for
+    move = get_minimax_ai_move(board, ai_symbol, 'X', table=table, stats=stats, time_budget_ms=time_budget_ms,
+                               cancel_event=cancel_event)  # Get the AI's move within the time budget
+    return move, stats
+
+
+def play_one_round(renderer=None):
+    """Play one game against the AI; ``renderer`` (a render.Renderer, e.g. Renderer('quiet')) draws the board."""
+    board = BitBoard(3, 3)  # Create a 3x3 board (bitmask-backed for a faster AI)
     current_symbol = 'X'  # Player's symbol
     ai_symbol = 'O'  # AI's symbol
+    table = TranspositionTable()  # Search results kept for the rest of this game
+    ponderer = None
+    if PONDER:  # The AI thinks about its answers while the player types
+        ponderer = Ponderer(lambda position, budget, cancel: ai_search(position, ai_symbol, table, budget, cancel),
+                            AI_TIME_BUDGET_MS)
 
     # Score tracking for just one round
     player_score = 0  # Initialize player score
@@ -147,17 +247,23 @@ def play_one_round():
 
     print(f"🎮 Welcome to {board.rows}x{board.cols} Tic-Tac-Toe! Get {board.n_to_win}-in-a-row to win.")  # Welcome message
     print("You are X. The AI is O.\n")  # Inform the player of their symbol
-    board.display()  # Display the initial board
+    renderer = renderer or Renderer()  # TICTAC_RENDER picks full frames, changed cells only, or nothing
+    renderer.render(board)  # Display the initial board
 
     while True:  # Game loop
         if current_symbol == 'X':  # If it's the player's turn
+            if ponderer is not None:
+                ponderer.start(board, 'X', ai_symbol)  # Search the AI's answers while the player types
             row, col = get_player_move(board)  # Get the player's move
         else:  # If it's the AI's turn
-            row, col = get_minimax_ai_move(board, ai_symbol, 'X', depth=9)  # Get the AI's move
+            result, thought_ms = ponderer.answer((row, col)) if ponderer is not None else (None, 0)  # row, col: the player's move
+            (row, col), stats = result or ai_search(board, ai_symbol, table, AI_TIME_BUDGET_MS - thought_ms)  # Finish the search
             print(f"🤖 AI chooses: {row},{col}")  # Inform the player of the AI's move
+            if stats is not None:
+                print(stats.log_line((row, col)))  # Search summary for this move
 
         board.place_move(row, col, current_symbol)  # Place the move on the board
-        board.display()  # Display the updated board
+        renderer.render(board)  # Display the updated board
 
         if board.check_win(current_symbol):  # Check if the current player has won
             if current_symbol == 'X':  # If the player has won
@@ -175,6 +281,11 @@ def play_one_round():
 
         current_symbol = 'O' if current_symbol == 'X' else 'X'  # Switch turns
 
+    if ponderer is not None:
+        ponderer.stop()  # The player's last move may have ended the game mid-ponder
+    renderer.close()  # Lets text scroll over the whole screen again in ANSI mode
+    log_game(board, 'X', ai_symbol)  # Appended to the TICTAC_GAME_LOG file when that is set
+
     # Display score summary for this round
     print(f"\n📊 Round Score - You: {player_score} | AI: {ai_score} | Ties: {tie_score}")
 
@@ -0,0 +1,121 @@
+"""Zobrist hashing and a transposition table for the alpha-beta search.
+
+A BitBoard with hashing enabled keeps one Zobrist hash per board symmetry
+(8 for square boards, 4 otherwise) and updates all of them on every move, so
+the canonical hash of a position (the smallest of them) costs nothing extra.
+Rotated and mirrored positions therefore share one table entry.
+"""
+
+import random
+from collections import OrderedDict
+
+EXACT, LOWER, UPPER = 0, 1, 2  # Bound type of a stored value
+ENTRY_BYTES = 200  # Rough memory for one entry: key, value tuple and dict slot
+
+_KEYS_CACHE = {}  # (rows, cols, n_to_win) -> ZobristKeys
+
+
+def board_symmetries(rows, cols):
+    """Return each symmetry of the board as a permutation of cell indices."""
+    maps = [
+        lambda r, c: (r, c),
+        lambda r, c: (r, cols - 1 - c),  # Mirror left-right
+        lambda r, c: (rows - 1 - r, c),  # Mirror top-bottom
+        lambda r, c: (rows - 1 - r, cols - 1 - c),  # Rotate 180
+    ]
+    if rows == cols:  # Rotations by 90 degrees and the diagonal mirrors only fit square boards
+        n = rows
+        maps += [
+            lambda r, c: (c, n - 1 - r),
+            lambda r, c: (n - 1 - c, r),
+            lambda r, c: (c, r),
+            lambda r, c: (n - 1 - c, n - 1 - r),
+        ]
+    perms = []
+    for transform in maps:
+        perm = []
+        for idx in range(rows * cols):
+            r, c = transform(idx // cols, idx % cols)
+            perm.append(r * cols + c)
+        perms.append(tuple(perm))
+    return perms
+
+
+class ZobristKeys:
+    """Random 64-bit keys per (symbol, cell), pre-permuted for every board symmetry."""
+
+    def __init__(self, rows, cols, n_to_win):
+        self.rows = rows
+        self.cols = cols
+        self.seed = f"zobrist:{rows}x{cols}:{n_to_win}"  # Same keys in every process and run
+        self.transforms = board_symmetries(rows, cols)
+        self._cell_keys = {}  # symbol -> per cell, a tuple with the key under each symmetry
+        self._side_keys = {}  # symbol -> key mixed in for the side to move
+
+    def cell_keys(self, symbol):
+        """Per-cell key tuples for ``symbol``; entry t is the key of the cell's image under symmetry t."""
+        keys = self._cell_keys.get(symbol)
+        if keys is None:
+            rng = random.Random(f"{self.seed}:{symbol}")
+            base = [rng.getrandbits(64) for _ in range(self.rows * self.cols)]
+            keys = [tuple(base[perm[idx]] for perm in self.transforms) for idx in range(self.rows * self.cols)]
+            self._cell_keys[symbol] = keys
+        return keys
+
+    def side_key(self, symbol):
+        """Key that marks ``symbol`` as the side to move."""
+        key = self._side_keys.get(symbol)
+        if key is None:
+            key = random.Random(f"{self.seed}:to-move:{symbol}").getrandbits(64)
+            self._side_keys[symbol] = key
+        return key
+
+
+def zobrist_keys(rows, cols, n_to_win):
+    """Return the shared ZobristKeys for a board shape."""
+    key = (rows, cols, n_to_win)
+    keys = _KEYS_CACHE.get(key)
+    if keys is None:
+        keys = ZobristKeys(rows, cols, n_to_win)
+        _KEYS_CACHE[key] = keys
+    return keys
+
+
+class TranspositionTable:
+    """Search results by position hash, capped in memory and evicted least-recently-used first.
+
+    Entries are (value, depth, bound) tuples.  Keep one table per game and pass
+    it to every search so later moves reuse earlier work.
+    """
+
+    def __init__(self, max_bytes=64 * 1024 * 1024):
+        self.max_entries = max(1, max_bytes // ENTRY_BYTES)
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.evictions = 0
+
+    def __len__(self):
+        return len(self.entries)
+
+    def lookup(self, key):
+        """Return the (value, depth, bound) entry for ``key``, or None."""
+        entry = self.entries.get(key)
+        if entry is not None:
+            self.entries.move_to_end(key)  # Recently used entries are evicted last
+            self.hits += 1
+        return entry
+
+    def store(self, key, value, depth, bound):
+        """Save a result, keeping an existing entry that was searched deeper."""
+        entries = self.entries
+        old = entries.get(key)
+        if old is None or old[1] <= depth:
+            entries[key] = (value, depth, bound)
+        entries.move_to_end(key)
+        if len(entries) > self.max_entries:
+            entries.popitem(last=False)  # Drop the least recently used position
+            self.evictions += 1
+
+    def clear(self):
+        """Forget every stored position."""
+        self.entries.clear()